@@ -1,11 +1,30 @@
 from django.contrib import admin
 
-from .models import Author, Book, Borrow, Genre, Log
+from .models import Author, Book, Borrow, Borrower, Genre, Log
 
 # Register your models here.
 
 admin.site.register(Book)
 admin.site.register(Author)
 admin.site.register(Genre)
-admin.site.register(Log)
+
+
+@admin.register(Log)
+class LogAdmin(admin.ModelAdmin):
+    # The audit log is append-only
+    list_display = ("datetime", "actor", "action", "book_id", "description")
+    list_filter = ("action",)
+    search_fields = ("actor", "description")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Borrow)
+admin.site.register(Borrower)
@@ -0,0 +1,165 @@
+import math
+from collections import defaultdict
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Book, CirculationRollup, LoanDurationBucket
+
+# Loan durations are histogrammed in buckets growing by a factor of 2^(1/4)
+# (about 19%) from one minute up, which bounds percentile error to that factor
+BUCKETS_PER_DOUBLING = 4
+BUCKET_BASE_SECONDS = 60
+
+
+def duration_bucket(seconds: float) -> int:
+    """Return the histogram bucket of a loan lasting `seconds`."""
+    if seconds < BUCKET_BASE_SECONDS:
+        return 0
+    return 1 + int(math.log2(seconds / BUCKET_BASE_SECONDS) * BUCKETS_PER_DOUBLING)
+
+
+def bucket_midpoint(bucket: int) -> float:
+    """Return a representative duration (in seconds) for a histogram bucket."""
+    if bucket == 0:
+        return BUCKET_BASE_SECONDS / 2
+    low = BUCKET_BASE_SECONDS * 2 ** ((bucket - 1) / BUCKETS_PER_DOUBLING)
+    high = BUCKET_BASE_SECONDS * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+    return math.sqrt(low * high)
+
+
+def percentiles(histogram: dict[int, int], points: list[float]) -> dict[str, float]:
+    """
+    Estimate duration percentiles from a bucket histogram.
+
+    Args:
+        histogram (dict[int, int]): Loan count per bucket.
+        points (list[float]): Percentiles to compute, e.g. [50, 90, 99].
+
+    Returns:
+        dict[str, float]: Estimated duration in seconds keyed by 'p50', 'p90', ...
+                          Empty if there are no loans.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return {}
+
+    result = {}
+    buckets = sorted(histogram.items())
+    for point in points:
+        rank = point / 100 * total
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                result[f"p{point:g}"] = round(bucket_midpoint(bucket), 1)
+                break
+    return result
+
+
+def _dimension_keys(book_id: int, author_id: int | None, genre_ids) -> list:
+    keys = [(CirculationRollup.TOTAL, 0), (CirculationRollup.BOOK, book_id)]
+    if author_id:
+        keys.append((CirculationRollup.AUTHOR, author_id))
+    keys += [(CirculationRollup.GENRE, genre_id) for genre_id in genre_ids]
+    return keys
+
+
+def _bump(day: date, keys: list, **increments) -> None:
+    # Make sure every row exists, then increment them all in one UPDATE
+    CirculationRollup.objects.bulk_create(
+        [
+            CirculationRollup(date=day, dimension=dimension, key=key)
+            for dimension, key in keys
+        ],
+        ignore_conflicts=True,
+    )
+    CirculationRollup.objects.filter(date=day).filter(
+        reduce(or_, [Q(dimension=dimension, key=key) for dimension, key in keys])
+    ).update(**{field: F(field) + value for field, value in increments.items()})
+
+
+def _book_dimensions(book_id: int) -> tuple[int | None, list[int]]:
+    book = Book.objects.only("author_id").get(pk=book_id)
+    return book.author_id, list(book.genres.values_list("id", flat=True))
+
+
+def record_loan(book_id: int, borrowed_date: datetime) -> None:
+    """Count a new loan in the rollups of the day it was made."""
+    author_id, genre_ids = _book_dimensions(book_id)
+    _bump(
+        timezone.localdate(borrowed_date),
+        _dimension_keys(book_id, author_id, genre_ids),
+        loans=1,
+    )
+
+
+def record_return(
+    book_id: int, borrowed_date: datetime, returned_date: datetime
+) -> None:
+    """Count a return, and its loan duration, in the rollups of its day."""
+    loan_seconds = (returned_date - borrowed_date).total_seconds()
+    author_id, genre_ids = _book_dimensions(book_id)
+    _bump(
+        timezone.localdate(returned_date),
+        _dimension_keys(book_id, author_id, genre_ids),
+        returns=1,
+        loan_seconds=loan_seconds,
+    )
+
+    bucket = duration_bucket(loan_seconds)
+    LoanDurationBucket.objects.get_or_create(bucket=bucket)
+    LoanDurationBucket.objects.filter(bucket=bucket).update(count=F("count") + 1)
+
+
+class RollupBuilder:
+    """
+    Accumulates rollups for a batch of borrow rows in memory, to be written in
+    bulk. Used to rebuild the rollups from the full borrow history.
+    """
+
+    def __init__(self):
+        self.rows: dict[tuple, list] = defaultdict(lambda: [0, 0, 0.0])
+        self.histogram: dict[int, int] = defaultdict(int)
+
+    def add(self, borrowed_date, returned_date, book_id, author_id, genre_ids):
+        keys = _dimension_keys(book_id, author_id, genre_ids)
+
+        loan_day = timezone.localdate(borrowed_date)
+        for dimension, key in keys:
+            self.rows[(loan_day, dimension, key)][0] += 1
+
+        if returned_date is not None:
+            loan_seconds = (returned_date - borrowed_date).total_seconds()
+            return_day = timezone.localdate(returned_date)
+            for dimension, key in keys:
+                row = self.rows[(return_day, dimension, key)]
+                row[1] += 1
+                row[2] += loan_seconds
+            self.histogram[duration_bucket(loan_seconds)] += 1
+
+    def save(self, batch_size: int = 1000) -> int:
+        rollups = []
+        for (day, dimension, key), (loans, returns, seconds) in self.rows.items():
+            rollups.append(
+                CirculationRollup(
+                    date=day,
+                    dimension=dimension,
+                    key=key,
+                    loans=loans,
+                    returns=returns,
+                    loan_seconds=seconds,
+                )
+            )
+        CirculationRollup.objects.bulk_create(rollups, batch_size=batch_size)
+        LoanDurationBucket.objects.bulk_create(
+            [
+                LoanDurationBucket(bucket=bucket, count=count)
+                for bucket, count in self.histogram.items()
+            ],
+            batch_size=batch_size,
+        )
+        return len(self.rows)
@@ -4,3 +4,60 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.signals import user_logged_out
+        from django.db.models.signals import (m2m_changed, post_delete,
+                                              post_save, pre_delete)
+
+        from . import auth_cache, fuzzy, sync
+        from .models import Author, Book, Genre
+
+        # Keep the authenticated user cache coherent
+        user_model = get_user_model()
+        user_logged_out.connect(
+            auth_cache.invalidate_on_logout, dispatch_uid="api_auth_cache_logout"
+        )
+        post_save.connect(
+            auth_cache.invalidate_on_save,
+            sender=user_model,
+            dispatch_uid="api_auth_cache_save",
+        )
+        post_delete.connect(
+            auth_cache.invalidate_on_save,
+            sender=user_model,
+            dispatch_uid="api_auth_cache_delete",
+        )
+
+        # Deletions and genre changes are visible to the sync endpoint
+        for model in (Book, Author, Genre):
+            post_delete.connect(
+                sync.record_tombstone,
+                sender=model,
+                dispatch_uid=f"api_sync_tombstone_{model._meta.model_name}",
+            )
+        m2m_changed.connect(
+            sync.touch_books_on_genre_change,
+            sender=Book.genres.through,
+            dispatch_uid="api_sync_book_genres",
+        )
+        for model in (Author, Genre):
+            pre_delete.connect(
+                sync.touch_books_on_delete,
+                sender=model,
+                dispatch_uid=f"api_sync_touch_books_{model._meta.model_name}",
+            )
+
+        # Titles and author names are indexed for fuzzy search as they are written
+        for model in (Book, Author):
+            post_save.connect(
+                fuzzy.index_on_save,
+                sender=model,
+                dispatch_uid=f"api_fuzzy_index_{model._meta.model_name}",
+            )
+            post_delete.connect(
+                fuzzy.unindex_on_delete,
+                sender=model,
+                dispatch_uid=f"api_fuzzy_unindex_{model._meta.model_name}",
+            )
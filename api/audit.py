@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import Log
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """
+    In-process buffer of audit entries, written to the `Log` table in batches.
+
+    Entries are flushed with a single `bulk_create` once `batch_size` entries are
+    pending or the oldest one is older than `flush_interval` seconds. Flushing
+    happens when a request finishes (after the response has been handed to the
+    client) and when a gunicorn worker exits (see `gunicorn.conf.py`), so
+    recording adds no write to the request.
+    """
+
+    def __init__(self):
+        self._entries: list[Log] = []
+        self._oldest: float | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: Log) -> None:
+        with self._lock:
+            if not self._entries:
+                self._oldest = time.monotonic()
+            self._entries.append(entry)
+
+    def should_flush(self) -> bool:
+        if not self._entries:
+            return False
+        return (
+            len(self._entries) >= settings.AUDIT_LOG_BATCH_SIZE
+            or time.monotonic() - self._oldest >= settings.AUDIT_LOG_FLUSH_INTERVAL
+        )
+
+    def flush(self) -> int:
+        """Write every pending entry. Returns the number of entries written."""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._oldest = None
+
+        if not entries:
+            return 0
+
+        try:
+            Log.objects.bulk_create(entries, batch_size=500)
+        except Exception:
+            # Keep what was lost in the server log rather than dropping it
+            logger.exception(
+                "Could not write %d audit log entries: %s",
+                len(entries),
+                [entry.description for entry in entries],
+            )
+            return 0
+        return len(entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = []
+            self._oldest = None
+
+
+buffer = AuditBuffer()
+
+
+def record(
+    request: HttpRequest,
+    action: str,
+    book_id: int | None = None,
+    payload: dict | None = None,
+    description: str = "",
+) -> None:
+    """
+    Queue an audit entry for a write made through the API.
+
+    Args:
+        request (HttpRequest): The request that made the write, for the actor.
+        action (str): What happened, e.g. 'book.create' or 'book.borrow'.
+        book_id (int, optional): The book that was written, if any.
+        payload (dict, optional): JSON-serializable details of the write.
+        description (str, optional): Human readable summary.
+    """
+    user = getattr(request, "user", None)
+    actor = user.get_username() if user is not None and user.is_authenticated else ""
+
+    buffer.add(
+        Log(
+            datetime=timezone.now(),
+            actor=actor,
+            action=action,
+            book_id=book_id,
+            payload=payload or {},
+            description=description or f"{actor or 'anonymous'}: {action}",
+        )
+    )
+
+
+def flush() -> int:
+    """Write all pending audit entries now."""
+    return buffer.flush()
+
+
+def _flush_if_due(**kwargs) -> None:
+    if buffer.should_flush():
+        buffer.flush()
+
+
+request_finished.connect(_flush_if_due, dispatch_uid="api_audit_flush")
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import router
+from django.http import HttpRequest
+from django.utils.crypto import constant_time_compare
+
+
+def user_cache_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def _cached_fields(user_model) -> list[str]:
+    # What request handling reads off the user; never the password hash, which
+    # stays out of the (on-disk) cache
+    return [
+        user_model._meta.pk.attname,
+        user_model.USERNAME_FIELD,
+        "is_active",
+        "is_staff",
+        "is_superuser",
+    ]
+
+
+def _user_record(user) -> dict:
+    record = {name: getattr(user, name) for name in _cached_fields(type(user))}
+    record["auth_hash"] = user.get_session_auth_hash()
+    return record
+
+
+def _user_from_record(record: dict):
+    """
+    A user with only the cached fields loaded. The others are deferred: they
+    are read from the database if accessed and left alone by `save()`.
+    """
+    user_model = get_user_model()
+    cached = set(_cached_fields(user_model))
+    fields = [
+        field.attname
+        for field in user_model._meta.concrete_fields
+        if field.attname in cached
+    ]
+    return user_model.from_db(
+        router.db_for_read(user_model),
+        fields,
+        [record[name] for name in fields],
+    )
+
+
+def get_cached_user(request: HttpRequest):
+    """
+    Return the user of the request's session, from the user cache if possible.
+
+    The cache holds a small record per user (id, username, the `is_*` flags
+    and the session auth hash) rather than the user itself. It is only trusted
+    if the session's auth hash still matches the cached one; otherwise (and on
+    a cache miss) this falls back to Django's own `auth.get_user`, which
+    verifies the session against the database.
+    """
+    try:
+        user_id = auth._get_user_session_key(request)
+    except (KeyError, ValueError):
+        return AnonymousUser()
+
+    cache = caches[settings.AUTH_USER_CACHE_ALIAS]
+    key = user_cache_key(user_id)
+
+    record = cache.get(key)
+    if record is not None:
+        session_hash = request.session.get(auth.HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, record["auth_hash"]):
+            return _user_from_record(record)
+
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, _user_record(user), settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user(user_id) -> None:
+    caches[settings.AUTH_USER_CACHE_ALIAS].delete(user_cache_key(user_id))
+
+
+def invalidate_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
+
+
+def invalidate_on_save(sender, instance, **kwargs):
+    # Covers password changes, deactivation and permission changes alike
+    invalidate_user(instance.pk)
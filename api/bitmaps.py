@@ -0,0 +1,146 @@
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Sequence
+from itertools import chain, compress
+
+# A set is kept as an array of positions while that is smaller than its bitmap:
+# 64 bits per position in the array against one bit per catalog position
+SPARSE_RATIO = 64
+
+
+def _dense(count: int, size: int) -> bool:
+    """Whether `count` positions out of `size` are stored as a bitmap."""
+    return count >= SPARSE_RATIO and count * SPARSE_RATIO > size
+
+
+def from_positions(positions: Iterable[int], size: int) -> int:
+    """
+    The bitmap of `positions` (all below `size`): an int with bit `p` set for
+    each position `p`.
+    """
+    packed = bytearray((size + 7) // 8)
+    for position in positions:
+        packed[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(packed, "little")
+
+
+def pack(bits: int, size: int) -> bytes:
+    """
+    The bytes of a bitmap, to test many positions without shifting the whole
+    int each time: position `p` is bit `p & 7` of byte `p >> 3`.
+    """
+    return bits.to_bytes((size + 7) // 8, "little")
+
+
+_DIGITS = bytes.maketrans(b"01", b"\0\1")
+
+
+def unpack(bits: int, size: int) -> bytes:
+    """One byte (0 or 1) per position of a bitmap, to look many positions up."""
+    return format(bits, f"0{size}b").encode().translate(_DIGITS)[::-1]
+
+
+class BitmapIndex:
+    """
+    Sets of positions by key (one per genre, one per author, ...).
+
+    Bitmaps are ints, so intersections and unions are single big-integer
+    operations and counts are `int.bit_count()`. Sets holding a small share of
+    the positions (most authors and borrowers) are kept as arrays of positions
+    instead, like the array containers of compressed bitmaps, and turned into
+    bits when a query reads them. A set is converted to a bitmap once it grows
+    past that share.
+    """
+
+    def __init__(self):
+        self._sets: dict[int, int | array] = {}
+
+    @classmethod
+    def build(cls, keys: Iterable[Iterable[int]], size: int) -> "BitmapIndex":
+        """Index the keys of each position, given in position order."""
+        groups = defaultdict(list)
+        for position, position_keys in enumerate(keys):
+            for key in position_keys:
+                groups[key].append(position)
+
+        index = cls()
+        for key, positions in groups.items():
+            index._sets[key] = (
+                from_positions(positions, size)
+                if _dense(len(positions), size)
+                else array("q", positions)
+            )
+        return index
+
+    def copy(self) -> "BitmapIndex":
+        """A copy that `add` and `discard` can change on its own."""
+        index = BitmapIndex()
+        index._sets = {
+            key: bits if isinstance(bits, int) else array("q", bits)
+            for key, bits in self._sets.items()
+        }
+        return index
+
+    def add(self, key: int, position: int) -> None:
+        current = self._sets.get(key)
+        if current is None:
+            self._sets[key] = array("q", [position])
+        elif isinstance(current, int):
+            self._sets[key] = current | 1 << position
+        else:
+            current.append(position)
+            size = max(current) + 1
+            if _dense(len(current), size):
+                self._sets[key] = from_positions(current, size)
+
+    def discard(self, key: int, position: int) -> None:
+        current = self._sets.get(key)
+        if isinstance(current, int):
+            current &= ~(1 << position)
+        elif current is not None and position in current:
+            current.remove(position)
+
+        if current:
+            self._sets[key] = current
+        else:
+            self._sets.pop(key, None)
+
+    def bits(self, keys: Iterable[int], size: int) -> int:
+        """The union of the sets of `keys`, as a bitmap."""
+        result = 0
+        sparse = []
+        for key in keys:
+            current = self._sets.get(key)
+            if isinstance(current, int):
+                result |= current
+            elif current is not None:
+                sparse.append(current)
+        if sparse:
+            result |= from_positions(chain.from_iterable(sparse), size)
+        return result
+
+    def counts(
+        self, mask: int, size: int, keys: Sequence[int] | None = None
+    ) -> dict[int, int]:
+        """
+        The number of positions of `mask` in each set, leaving out zeros.
+
+        `keys` can give the key of each position when positions have at most
+        one (0 for none), as authors do; the counts then take a single pass
+        over it instead of a lookup per position of each set.
+        """
+        if keys is not None:
+            counts = Counter(compress(keys, unpack(mask, size)))
+            counts.pop(0, None)
+            return dict(counts)
+
+        lookup = unpack(mask, size).__getitem__
+        counts = {}
+        for key, current in self._sets.items():
+            if isinstance(current, int):
+                count = (mask & current).bit_count()
+            else:
+                count = sum(map(lookup, current))
+            if count:
+                counts[key] = count
+        return counts
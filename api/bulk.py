@@ -0,0 +1,197 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import events, fuzzy
+from .models import Book, Borrow, BulkJob, SearchTrigram, Tombstone
+
+
+def delete_books(
+    book_ids: list[int],
+    chunk_size: int | None = None,
+    on_progress: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Delete books with their borrows and genre links, `chunk_size` books per
+    transaction.
+
+    Each chunk is removed with plain set-based DELETE statements instead of
+    Django's deletion collector, which would first load every related borrow
+    into memory. Transactions stay small, so the SQLite write lock is released
+    between chunks and other requests can get in (after an optional
+    `BULK_DELETE_PAUSE`).
+
+    Tombstones, change events and the search trigrams are handled here since
+    raw deletes send no signals.
+
+    Args:
+        book_ids (list[int]): The books to delete.
+        chunk_size (int, optional): Books per transaction. Defaults to
+                                    `BULK_DELETE_CHUNK_SIZE`.
+        on_progress (callable, optional): Called with the number of ids
+                                          processed so far after each chunk.
+
+    Returns:
+        int: The number of books deleted.
+    """
+    chunk_size = chunk_size or settings.BULK_DELETE_CHUNK_SIZE
+    through = Book.genres.through
+    deleted = 0
+
+    for start in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[start : start + chunk_size]
+
+        with transaction.atomic():
+            # Nothing references borrows or book-genre rows, so they can go
+            # without the collector
+            Borrow.objects.filter(book_id__in=chunk)._raw_delete(Borrow.objects.db)
+            through.objects.filter(book_id__in=chunk)._raw_delete(through.objects.db)
+            count = Book.objects.filter(pk__in=chunk)._raw_delete(Book.objects.db)
+
+            Tombstone.objects.bulk_create(
+                [Tombstone(kind=Tombstone.BOOK, object_id=book_id) for book_id in chunk]
+            )
+            fuzzy.unindex(SearchTrigram.BOOK, chunk)
+            events.emit(events.BOOKS_DELETED, data={"ids": chunk})
+
+        deleted += count
+        if on_progress is not None:
+            on_progress(start + len(chunk))
+
+        if settings.BULK_DELETE_PAUSE and start + chunk_size < len(book_ids):
+            time.sleep(settings.BULK_DELETE_PAUSE)
+
+    return deleted
+
+
+class JobInterrupted(Exception):
+    """Raised in a job's thread when its process is shutting down."""
+
+
+# Set when the process shuts down, so running jobs stop after their chunk
+_stopping = threading.Event()
+_threads: set[threading.Thread] = set()
+
+
+def _resumable() -> Q:
+    """Jobs that are pending, or running without a recent heartbeat."""
+    stale = timezone.now() - timedelta(seconds=settings.BULK_JOB_STALE_AFTER)
+    return (
+        Q(status=BulkJob.PENDING)
+        | Q(status=BulkJob.RUNNING, heartbeat_at__lt=stale)
+        | Q(status=BulkJob.RUNNING, heartbeat_at__isnull=True)
+    )
+
+
+def claim_job(job_id: int) -> bool:
+    """
+    Mark a job as running by this process, if it is pending or was left
+    running by a dead one. A conditional update, so only one process can win.
+    """
+    return bool(
+        BulkJob.objects.filter(_resumable(), pk=job_id).update(
+            status=BulkJob.RUNNING, heartbeat_at=timezone.now()
+        )
+    )
+
+
+def run_job(job_id: int) -> None:
+    """
+    Run a pending `BulkJob`, recording its progress as it goes. A job resumes
+    after the books it already processed, which are deleted and committed
+    chunk by chunk. Does nothing if another process has claimed the job.
+    """
+    try:
+        if not claim_job(job_id):
+            return
+        job = BulkJob.objects.get(pk=job_id)
+
+        def on_progress(processed: int) -> None:
+            BulkJob.objects.filter(pk=job_id).update(
+                processed=job.processed + processed, heartbeat_at=timezone.now()
+            )
+            if _stopping.is_set():
+                raise JobInterrupted
+
+        if job.action == "book.bulk_delete":
+            delete_books(job.book_ids[job.processed :], on_progress=on_progress)
+        else:
+            raise ValueError(f"Unknown bulk action: {job.action}")
+
+        BulkJob.objects.filter(pk=job_id).update(
+            status=BulkJob.DONE, finished_at=timezone.now()
+        )
+    except JobInterrupted:
+        # Left for the next process to resume right away
+        BulkJob.objects.filter(pk=job_id, status=BulkJob.RUNNING).update(
+            status=BulkJob.PENDING
+        )
+    except Exception as e:
+        print(f"Unexpected error in bulk job {job_id}: {e}")
+        BulkJob.objects.filter(pk=job_id).update(
+            status=BulkJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+    finally:
+        # The thread's connection isn't managed by the request cycle
+        connection.close()
+
+
+def _run_in_thread(job_id: int) -> None:
+    try:
+        run_job(job_id)
+    finally:
+        _threads.discard(threading.current_thread())
+
+
+def start_job(job_id: int) -> threading.Thread:
+    """Run a `BulkJob` in a background thread of this process."""
+    thread = threading.Thread(
+        target=_run_in_thread, args=(job_id,), name=f"bulk-job-{job_id}", daemon=True
+    )
+    _threads.add(thread)
+    thread.start()
+    return thread
+
+
+def resumable_job_ids() -> list[int]:
+    """Jobs that are pending, or running with a stale heartbeat, oldest first."""
+    return list(
+        BulkJob.objects.filter(_resumable()).order_by("id").values_list("id", flat=True)
+    )
+
+
+def is_resumable(job: BulkJob) -> bool:
+    """Whether `job` is pending, or running with a stale heartbeat."""
+    stale = timezone.now() - timedelta(seconds=settings.BULK_JOB_STALE_AFTER)
+    return job.status == BulkJob.PENDING or (
+        job.status == BulkJob.RUNNING
+        and (job.heartbeat_at is None or job.heartbeat_at < stale)
+    )
+
+
+def resume_jobs() -> list[int]:
+    """
+    Start the jobs a previous process didn't finish, in background threads.
+    Run by each worker as it starts (see `gunicorn.conf.py`).
+    """
+    job_ids = resumable_job_ids()
+    for job_id in job_ids:
+        start_job(job_id)
+    return job_ids
+
+
+def stop_jobs(timeout: float = 10) -> None:
+    """
+    Stop this process's jobs after their current chunk and hand them back as
+    pending, waiting up to `timeout` seconds. Run when a worker exits.
+    """
+    _stopping.set()
+    deadline = time.monotonic() + timeout
+    for thread in list(_threads):
+        thread.join(max(deadline - time.monotonic(), 0))
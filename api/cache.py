@@ -0,0 +1,171 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded in-process map that evicts the least recently used entry when full.
+
+    Entries expire after their own timeout. Hits, misses and evictions are
+    counted for `stats()`.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[1] is not None
+                and entry[1] <= time.monotonic()
+            ):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, timeout: float | None) -> None:
+        """Store `value` for `timeout` seconds (None for no expiry)."""
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend with a small in-process tier in front of a shared cache.
+
+    `LOCATION` is the alias of the shared cache (e.g. a file-based cache that all
+    workers on the host can see). Reads are served from the in-process tier (an
+    `LRUCache`) when possible; entries only live there for `LOCAL_TIMEOUT`
+    seconds, which bounds how long another worker's delete can go unnoticed.
+    Writes and deletes go to both tiers. Keys that embed a version that changes
+    on every write (see `api.read_cache`) never go stale in either tier.
+
+    OPTIONS:
+        - `LOCAL_TIMEOUT` (int): Seconds an entry may be served from the
+          in-process tier. Defaults to 5.
+        - `LOCAL_MAX_ENTRIES` (int): Size of the in-process tier. Defaults to
+          1000.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = location
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._local = LRUCache(options.get("LOCAL_MAX_ENTRIES", 1000))
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, timeout) -> float:
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _local_get(self, key, version):
+        # Pickled like in LocMemCache, so callers can't change a cached value
+        value = self._local.get(self.make_and_validate_key(key, version), _MISSING)
+        return value if value is _MISSING else pickle.loads(value)
+
+    def _local_set(self, key, value, timeout, version) -> None:
+        self._local.set(
+            self.make_and_validate_key(key, version),
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self._local_ttl(timeout),
+        )
+
+    def get(self, key, default=None, version=None):
+        value = self._local_get(key, version)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.shared_hits += 1
+            self._local_set(key, value, self._local_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version=version):
+            return False
+        self._local_set(key, value, timeout, version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Re-read from the shared tier next time, with the new timeout
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self._local_get(key, version) is not _MISSING or self.shared.has_key(
+            key, version=version
+        )
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def stats(self) -> dict:
+        """Hit counts of both tiers, and the size of the in-process one."""
+        return {
+            "local": self._local.stats(),
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,756 @@
+import bisect
+import threading
+import time
+from array import array
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.utils import timezone
+
+from .bitmaps import BitmapIndex, from_positions, pack
+from .models import Author, Book, Borrow, Borrower, Tombstone
+from .text import fold_text
+
+# Permutation kept for each sort; `dateAdded` has one per direction
+SORTS = {"title": "by_title", "author": "by_author", "dateAdded": "by_date"}
+# Sorts left to the ORM, along with fuzzy search
+BORROW_SORTS = ("borrowerName", "borrowDate", "returnDate")
+# More changed books than this since the last refresh and the engine reloads
+MAX_DELTA = 5000
+# Rows changed this long before the last refresh are read again, in case
+# their transaction committed after it
+REFRESH_OVERLAP = timedelta(seconds=5)
+# Deep pages skip whole blocks of an order: at most this many blocks, of at
+# least this many books
+MAX_BLOCKS = 64
+MIN_BLOCK_SIZE = 1024
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def _micros(value: datetime) -> int:
+    # Exact, unlike float timestamps, so ties sort as they do in the database
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _ids(values: list[str]) -> set[int] | None:
+    """Parse `filter_author`/`filter_genre` values, None if one isn't an id."""
+    try:
+        return {int(value) for value in values if value.strip()}
+    except ValueError:
+        return None
+
+
+class _Matches:
+    """
+    The ids of the matching books in order, as a sequence for `Paginator`.
+
+    A page past the first counts the matches in each block of the order (the
+    popcount of the mask and the block's bitmap, see `CatalogSnapshot._blocks`)
+    to skip the blocks before it, and only walks the order from the block it
+    starts in.
+    """
+
+    def __init__(
+        self,
+        ids: array,
+        order: array,
+        desc: bool,
+        mask: int,
+        blocks: Callable[[], tuple[int, list[int]]],
+    ):
+        self._ids = ids
+        self._order = order
+        self._desc = desc
+        self._mask = mask
+        self._blocks = blocks
+        self._packed = pack(mask, len(ids))
+        self._count = mask.bit_count()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: slice) -> list[int]:
+        order, packed = self._order, self._packed
+        # The part of the order left to walk, and the matches to skip in it
+        start, end, skip = 0, len(order), index.start
+        if skip:
+            block_size, blocks = self._blocks()
+            numbers = range(len(blocks))
+            for number in reversed(numbers) if self._desc else numbers:
+                count = (self._mask & blocks[number]).bit_count()
+                if count > skip:
+                    break
+                skip -= count
+                if self._desc:
+                    end = number * block_size
+                else:
+                    start = (number + 1) * block_size
+
+        walk = range(end - 1, start - 1, -1) if self._desc else range(start, end)
+        positions = islice(
+            (p for p in map(order.__getitem__, walk) if packed[p >> 3] >> (p & 7) & 1),
+            skip,
+            skip + index.stop - index.start,
+        )
+        return [self._ids[position] for position in positions]
+
+
+class CatalogSnapshot:
+    """
+    In-memory, column-oriented copy of what `filter_books`, `sort_books` and
+    `paginate_books` read, answering the same queries without the database.
+
+    Every book has a position; its columns are compact arrays indexed by
+    position. Filters are bitmaps over positions (see `api.bitmaps`): one per
+    genre, author and borrower, and one each for the books that exist, are
+    borrowed, can be borrowed and have an author. A combination of filters is
+    a few big-integer ANDs and ORs, and a count is a popcount. Each supported
+    sort is a permutation of positions kept in order, so a page is read off the
+    permutation.
+
+    A snapshot is never changed once queries can read it: `ColumnarCatalog`
+    applies the rows written since to a copy and swaps it in. Results match
+    the ORM path exactly; queries it can't answer (fuzzy search, borrow sorts)
+    return None.
+    """
+
+    def __init__(self):
+        self._watermark = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids = array("q")
+        self.positions: dict[int, int] = {}
+        # Folded title and the stored sort keys (see `Book.save`)
+        self.titles: list[str] = []
+        self.title_keys: list[str] = []
+        self.author_keys: list[str] = []
+        # All titles joined by newlines, which folded text never contains, so
+        # a search is one scan; rebuilt on the first search after a change
+        self._title_text: str | None = None
+        self._title_starts = array("q")
+        self.author_ids = array("q")  # 0 for no author
+        self.dates = array("q")  # date_added, in microseconds
+        self.active_borrower = array("q")  # 0 when not borrowed
+        self.borrower_ids: list[tuple[int, ...]] = []  # Everyone who borrowed it
+        self.genre_ids: list[frozenset[int]] = []
+        # Bitmaps of positions
+        self.live = 0
+        self.allowed = 0
+        self.lent = 0
+        self.authored = 0
+        self.by_genre = BitmapIndex()
+        self.by_author = BitmapIndex()
+        self.by_borrower = BitmapIndex()  # Everyone who borrowed the book
+        self.by_holder = BitmapIndex()  # The current borrower
+        # Folded names by id
+        self.author_names: dict[int, str] = {}
+        self.borrower_names: dict[int, str] = {}
+        # Live positions in each order
+        self.orders = {name: array("q") for name in self._order_keys()}
+        # Built by `_blocks` on the first deep page
+        self._order_blocks: dict[str, tuple[int, list[int]]] = {}
+
+    def copy(self) -> "CatalogSnapshot":
+        """A copy whose columns, bitmaps and orders can be changed on their own."""
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot.ids = array("q", self.ids)
+        snapshot.positions = dict(self.positions)
+        for name in (
+            "titles",
+            "title_keys",
+            "author_keys",
+            "borrower_ids",
+            "genre_ids",
+        ):
+            setattr(snapshot, name, list(getattr(self, name)))
+        for name in ("author_ids", "dates", "active_borrower"):
+            setattr(snapshot, name, array("q", getattr(self, name)))
+        for name in ("by_genre", "by_author", "by_borrower", "by_holder"):
+            setattr(snapshot, name, getattr(self, name).copy())
+        snapshot.author_names = dict(self.author_names)
+        snapshot.borrower_names = dict(self.borrower_names)
+        snapshot.orders = {
+            name: array("q", order) for name, order in self.orders.items()
+        }
+        snapshot._order_blocks = {}
+        return snapshot
+
+    def _order_keys(self) -> dict:
+        """Sort key of a position in each order, matching `sort_books`."""
+        ids = self.ids
+        return {
+            "by_id": lambda p: ids[p],
+            "by_title": lambda p: (self.title_keys[p], ids[p]),
+            "by_author": lambda p: (self.author_keys[p], ids[p]),
+            # `-date_added, id` is not the reverse of `date_added, id`
+            "by_date": lambda p: (self.dates[p], ids[p]),
+            "by_date_desc": lambda p: (-self.dates[p], ids[p]),
+        }
+
+    def _in_order(self, name: str, position: int) -> bool:
+        # Books without an author are left out of the author sort
+        return name != "by_author" or self.author_ids[position] != 0
+
+    # --- Loading ---
+
+    def _fetch(self, book_ids=None) -> dict[int, tuple]:
+        """Read the rows of `book_ids` (or of every book) from the database."""
+        books = Book.objects.values_list(
+            "id",
+            "title_search",
+            "title_sort_key",
+            "author_sort_key",
+            "author_id",
+            "date_added",
+            "allow_borrow",
+        )
+        genres = Book.genres.through.objects.values_list("book_id", "genre_id")
+        borrows = Borrow.objects.values_list("book_id", "borrower_id", "is_borrowed")
+        if book_ids is not None:
+            books = books.filter(pk__in=book_ids)
+            genres = genres.filter(book_id__in=book_ids)
+            borrows = borrows.filter(book_id__in=book_ids)
+
+        book_genres = defaultdict(set)
+        for book_id, genre_id in genres.iterator():
+            book_genres[book_id].add(genre_id)
+
+        book_borrowers = defaultdict(set)
+        active = {}
+        for book_id, borrower_id, is_borrowed in borrows.iterator():
+            if borrower_id is not None:
+                book_borrowers[book_id].add(borrower_id)
+            if is_borrowed:
+                active[book_id] = borrower_id or 0
+
+        missing = {
+            borrower_id
+            for borrowers in book_borrowers.values()
+            for borrower_id in borrowers
+            if borrower_id not in self.borrower_names
+        }
+        if missing:
+            self.borrower_names.update(
+                Borrower.objects.filter(pk__in=missing).values_list("id", "search_name")
+            )
+
+        rows = {}
+        for (
+            book_id,
+            title,
+            title_key,
+            author_key,
+            author_id,
+            date_added,
+            allow,
+        ) in books.iterator():
+            rows[book_id] = (
+                title,
+                title_key,
+                author_key,
+                author_id or 0,
+                _micros(date_added),
+                allow,
+                book_id in active,
+                active.get(book_id, 0),
+                tuple(sorted(book_borrowers.get(book_id, ()))),
+                frozenset(book_genres.get(book_id, ())),
+            )
+        return rows
+
+    def _row(self, position: int) -> tuple:
+        return (
+            self.titles[position],
+            self.title_keys[position],
+            self.author_keys[position],
+            self.author_ids[position],
+            self.dates[position],
+            bool(self.allowed >> position & 1),
+            bool(self.lent >> position & 1),
+            self.active_borrower[position],
+            self.borrower_ids[position],
+            self.genre_ids[position],
+        )
+
+    def _write(self, position: int, row: tuple) -> None:
+        self._title_text = None
+        (
+            self.titles[position],
+            self.title_keys[position],
+            self.author_keys[position],
+            self.author_ids[position],
+            self.dates[position],
+            _,
+            _,
+            self.active_borrower[position],
+            self.borrower_ids[position],
+            self.genre_ids[position],
+        ) = row
+
+    def _index(self, position: int, row: tuple, add: bool) -> None:
+        """Add the position to the bitmaps of `row`, or remove it."""
+        _, _, _, author_id, _, allow, lent, holder, borrowers, genres = row
+        bit = 1 << position
+        flags = ["live"]
+        if allow:
+            flags.append("allowed")
+        if lent:
+            flags.append("lent")
+        if author_id:
+            flags.append("authored")
+        for flag in flags:
+            value = getattr(self, flag)
+            setattr(self, flag, value | bit if add else value & ~bit)
+
+        entries = [(self.by_genre, genre_id) for genre_id in genres]
+        entries += [(self.by_borrower, borrower_id) for borrower_id in borrowers]
+        if author_id:
+            entries.append((self.by_author, author_id))
+        if holder:
+            entries.append((self.by_holder, holder))
+        for index, key in entries:
+            if add:
+                index.add(key, position)
+            else:
+                index.discard(key, position)
+
+    def _append(self, book_id: int, row: tuple) -> int:
+        position = len(self.ids)
+        self.ids.append(book_id)
+        self.positions[book_id] = position
+        for column in (self.titles, self.title_keys, self.author_keys):
+            column.append("")
+        for column in (self.author_ids, self.dates, self.active_borrower):
+            column.append(0)
+        self.borrower_ids.append(())
+        self.genre_ids.append(frozenset())
+        self._write(position, row)
+        self._index(position, row, True)
+        return position
+
+    def _build(self) -> None:
+        self._reset()
+        self._watermark = timezone.now()
+        self.author_names = dict(Author.objects.values_list("id", "name_search"))
+        self.borrower_names = dict(Borrower.objects.values_list("id", "search_name"))
+        self._load(self._fetch())
+
+    def _load(self, rows: dict[int, tuple]) -> None:
+        """Fill an empty catalog with `rows`, as returned by `_fetch`."""
+        book_ids = sorted(rows)
+        size = len(book_ids)
+        (
+            titles,
+            title_keys,
+            author_keys,
+            author_ids,
+            dates,
+            allow_borrow,
+            borrowed,
+            active_borrower,
+            borrower_ids,
+            genre_ids,
+        ) = (
+            zip(*map(rows.__getitem__, book_ids)) if rows else [()] * 10
+        )
+
+        self.ids = array("q", book_ids)
+        self.positions = {book_id: p for p, book_id in enumerate(book_ids)}
+        self.titles = list(titles)
+        self.title_keys = list(title_keys)
+        self.author_keys = list(author_keys)
+        self.author_ids = array("q", author_ids)
+        self.dates = array("q", dates)
+        self.active_borrower = array("q", active_borrower)
+        self.borrower_ids = list(borrower_ids)
+        self.genre_ids = list(genre_ids)
+
+        positions = range(size)
+        self.live = (1 << size) - 1
+        self.allowed = from_positions((p for p in positions if allow_borrow[p]), size)
+        self.lent = from_positions((p for p in positions if borrowed[p]), size)
+        self.authored = from_positions((p for p in positions if author_ids[p]), size)
+        self.by_genre = BitmapIndex.build(self.genre_ids, size)
+        self.by_author = BitmapIndex.build(
+            ((author_id,) if author_id else () for author_id in author_ids), size
+        )
+        self.by_borrower = BitmapIndex.build(self.borrower_ids, size)
+        self.by_holder = BitmapIndex.build(
+            ((holder,) if holder else () for holder in active_borrower), size
+        )
+
+        for name, key in self._order_keys().items():
+            self.orders[name] = array(
+                "q",
+                sorted((p for p in positions if self._in_order(name, p)), key=key),
+            )
+
+    # --- Deltas ---
+
+    def _unlink(self, position: int) -> None:
+        for name, key in self._order_keys().items():
+            if not self._in_order(name, position):
+                continue
+            order = self.orders[name]
+            i = bisect.bisect_left(order, key(position), key=key)
+            if i < len(order) and order[i] == position:
+                del order[i]
+
+    def _link(self, position: int) -> None:
+        for name, key in self._order_keys().items():
+            if self._in_order(name, position):
+                bisect.insort(self.orders[name], position, key=key)
+
+    def _upsert(self, book_id: int, row: tuple) -> None:
+        position = self.positions.get(book_id)
+        if position is None:
+            self._link(self._append(book_id, row))
+            return
+
+        old_row = self._row(position)
+        if old_row != row:
+            self._unlink(position)
+            self._index(position, old_row, False)
+            self._write(position, row)
+            self._index(position, row, True)
+            self._link(position)
+
+    def _delete(self, book_id: int) -> None:
+        position = self.positions.pop(book_id, None)
+        if position is not None:
+            self._unlink(position)
+            self._index(position, self._row(position), False)
+
+    def _changes(self) -> tuple | None:
+        """
+        Read the rows written since the snapshot was taken, without changing
+        it. None if there are more than `MAX_DELTA`.
+
+        Returns:
+            tuple: The new watermark, the ids of the changed and of the deleted
+                   books, the folded names of the changed authors, and the ids
+                   of the deleted ones.
+        """
+        since = self._watermark - REFRESH_OVERLAP
+        watermark = timezone.now()
+
+        changed = set(
+            Book.objects.filter(updated_at__gte=since).values_list("id", flat=True)[
+                : MAX_DELTA + 1
+            ]
+        )
+        changed.update(
+            Borrow.objects.filter(updated_at__gte=since).values_list(
+                "book_id", flat=True
+            )[: MAX_DELTA + 1]
+        )
+        authors = {
+            author_id: name
+            for author_id, name in Author.objects.filter(
+                updated_at__gte=since
+            ).values_list("id", "name_search")
+            if self.author_names.get(author_id) != name
+        }
+        deleted = set()
+        deleted_authors = set()
+        touched_genres = set()
+        for kind, object_id in Tombstone.objects.filter(
+            deleted_at__gte=since
+        ).values_list("kind", "object_id")[: MAX_DELTA + 1]:
+            if kind == Tombstone.BOOK:
+                deleted.add(object_id)
+            elif kind == Tombstone.AUTHOR and object_id in self.author_names:
+                # Its books were set to no author
+                deleted_authors.add(object_id)
+            elif kind == Tombstone.GENRE:
+                touched_genres.add(object_id)
+
+        # Renaming or deleting an author or genre changes their books without
+        # touching them
+        touched_authors = set(authors) | deleted_authors
+        if touched_authors or touched_genres:
+            size = len(self.ids)
+            touched = self.by_author.bits(touched_authors, size)
+            touched |= self.by_genre.bits(touched_genres, size)
+            packed = pack(touched & self.live, size)
+            changed.update(
+                book_id
+                for book_id, p in self.positions.items()
+                if packed[p >> 3] >> (p & 7) & 1
+            )
+        if len(changed) + len(deleted) > MAX_DELTA:
+            return None
+        return watermark, changed, deleted, authors, deleted_authors
+
+    def _apply(self, changed, deleted, authors, deleted_authors) -> None:
+        """Apply `_changes` to this snapshot, before any query can read it."""
+        for author_id in deleted_authors:
+            self.author_names.pop(author_id, None)
+        self.author_names.update(authors)
+        rows = self._fetch(changed) if changed else {}
+        for book_id in changed | deleted:
+            if book_id in rows:
+                self._upsert(book_id, rows[book_id])
+            else:
+                self._delete(book_id)
+
+    def refreshed(self) -> "CatalogSnapshot | None":
+        """
+        A snapshot with the rows written since this one was taken: itself if
+        nothing changed, an updated copy otherwise. None if too much did.
+        """
+        changes = self._changes()
+        if changes is None:
+            return None
+
+        watermark, changed, deleted, authors, deleted_authors = changes
+        snapshot = self
+        if changed or deleted or authors or deleted_authors:
+            snapshot = self.copy()
+            snapshot._apply(changed, deleted, authors, deleted_authors)
+        snapshot._watermark = watermark
+        return snapshot
+
+    # --- Queries ---
+
+    def _filters(self, filters: dict) -> dict[str, int] | None:
+        """
+        A bitmap per filter in use, keyed as in `filters`; the matching books
+        are the live ones in all of them. None if a filter is unsupported.
+        """
+        query = filters.get("query")
+        search_scope = filters.get("search_scope", "all")
+        authors = _ids(filters.get("authors", []))
+        genres = _ids(filters.get("genres", []))
+        if authors is None or genres is None:
+            return None
+
+        size = len(self.ids)
+        bitmaps = {}
+
+        if query and query.strip():
+            if filters.get("search_mode") == "fuzzy":
+                return None
+            query = fold_text(query)
+            matching_authors = [
+                author_id
+                for author_id, name in self.author_names.items()
+                if query in name
+            ]
+            matching_borrowers = [
+                borrower_id
+                for borrower_id, name in self.borrower_names.items()
+                if query in name
+            ]
+
+            if search_scope == "title":
+                hits = self._title_hits(query)
+            elif search_scope == "author":
+                hits = self.by_author.bits(matching_authors, size)
+            elif search_scope == "borrower":
+                hits = self.by_borrower.bits(matching_borrowers, size)
+            else:
+                # The title, the author or the current borrower
+                hits = (
+                    self._title_hits(query)
+                    | self.by_author.bits(matching_authors, size)
+                    | self.by_holder.bits(matching_borrowers, size)
+                )
+            bitmaps["query"] = hits
+
+        if authors:
+            bitmaps["authors"] = self.by_author.bits(authors, size)
+        if genres:
+            bitmaps["genres"] = self.by_genre.bits(genres, size)
+
+        borrowed = filters.get("borrowed")
+        if borrowed is not None:
+            bitmaps["borrowed"] = self.lent if borrowed else self.live & ~self.lent
+
+        allow_borrow = filters.get("allowborrow")
+        if allow_borrow is not None:
+            bitmaps["allowborrow"] = (
+                self.allowed if allow_borrow else self.live & ~self.allowed
+            )
+        return bitmaps
+
+    def _mask(self, bitmaps: dict[str, int], leave_out: str = "") -> int:
+        """The live books in every bitmap but `leave_out`."""
+        mask = self.live
+        for name, bits in bitmaps.items():
+            if name != leave_out:
+                mask &= bits
+        return mask
+
+    def _title_hits(self, query: str) -> int:
+        """The bitmap of the titles containing `query`."""
+        if self._title_text is None:
+            self._title_text = "\n".join(self.titles)
+            self._title_starts = array(
+                "q", accumulate((len(title) + 1 for title in self.titles), initial=0)
+            )
+        text, starts = self._title_text, self._title_starts
+        hits = []
+        i = text.find(query)
+        while i != -1:
+            position = bisect.bisect_right(starts, i) - 1
+            hits.append(position)
+            # Carry on from the next title
+            i = text.find(query, starts[position + 1])
+        return from_positions(hits, len(self.titles))
+
+    def _order(self, sort_by: str, desc: bool) -> tuple[str, bool]:
+        """The permutation for a sort, and whether to walk it backwards."""
+        if sort_by == "dateAdded":
+            return "by_date_desc" if desc else "by_date", False
+        if sort_by in SORTS:
+            # `-key, -id` is the exact reverse of `key, id`
+            return SORTS[sort_by], desc
+        # `sort_books` leaves other sorts unordered, and `paginate_books` then
+        # orders by id
+        return "by_id", False
+
+    def _blocks(self, name: str) -> tuple[int, list[int]]:
+        """
+        The block size of an order, and the bitmap of the positions in each
+        block, so the matches in a block are a popcount.
+        """
+        blocks = self._order_blocks.get(name)
+        if blocks is None:
+            order, size = self.orders[name], len(self.ids)
+            block_size = max(MIN_BLOCK_SIZE, -(-len(order) // MAX_BLOCKS))
+            blocks = block_size, [
+                from_positions(order[i : i + block_size], size)
+                for i in range(0, len(order), block_size)
+            ]
+            self._order_blocks[name] = blocks
+        return blocks
+
+    def page(
+        self, filters: dict, sort_by: str, desc: bool, number: int, per_page: int
+    ) -> Page | None:
+        """
+        The equivalent of `paginate_books(sort_books(filter_books(...)))`, with
+        book ids in `object_list`. None if the query is not supported.
+
+        Raises:
+            EmptyPage: If the page number is out of range.
+        """
+        if sort_by in BORROW_SORTS:
+            return None
+        bitmaps = self._filters(filters)
+        if bitmaps is None:
+            return None
+        mask = self._mask(bitmaps)
+        if sort_by == "author":
+            mask &= self.authored
+        name, desc = self._order(sort_by, desc)
+        matches = _Matches(
+            self.ids,
+            self.orders[name],
+            desc,
+            mask,
+            lambda: self._blocks(name),
+        )
+        return Paginator(matches, per_page).page(number)
+
+    def count(self, filters: dict) -> int | None:
+        """The number of books matching `filters`. None if not supported."""
+        bitmaps = self._filters(filters)
+        return None if bitmaps is None else self._mask(bitmaps).bit_count()
+
+    def facets(self, filters: dict) -> dict | None:
+        """The equivalent of `count_book_facets`. None if not supported."""
+        bitmaps = self._filters(filters)
+        if bitmaps is None:
+            return None
+
+        size = len(self.ids)
+        # Each facet leaves its own filter out
+        genres = self.by_genre.counts(self._mask(bitmaps, "genres"), size)
+        authors = self.by_author.counts(
+            self._mask(bitmaps, "authors"), size, self.author_ids
+        )
+        borrowed = self._mask(bitmaps, "borrowed")
+        lent = (borrowed & self.lent).bit_count()
+        allow_borrow = self._mask(bitmaps, "allowborrow")
+        allowed = (allow_borrow & self.allowed).bit_count()
+
+        return {
+            "genres": [{"id": k, "count": v} for k, v in sorted(genres.items())],
+            "authors": [{"id": k, "count": v} for k, v in sorted(authors.items())],
+            "borrowed": {"true": lent, "false": borrowed.bit_count() - lent},
+            "allowBorrow": {
+                "true": allowed,
+                "false": allow_borrow.bit_count() - allowed,
+            },
+        }
+
+
+class ColumnarCatalog:
+    """
+    The catalog snapshot of a worker process (see `CatalogSnapshot`).
+
+    It is loaded on first use, then brought up to date with the rows written
+    since (books and borrows by `updated_at`, author renames, and tombstones)
+    at most every `CATALOG_REFRESH_INTERVAL` seconds, so every worker sees the
+    writes of the others. Queries in between read the current snapshot without
+    the database or a lock. One thread refreshes at a time, on a copy, while
+    the others carry on reading the snapshot it replaces.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: CatalogSnapshot | None = None
+        self._checked_at = float("-inf")
+
+    def _build(self) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot()
+        snapshot._build()
+        return snapshot
+
+    def refresh(self, force: bool = False) -> CatalogSnapshot:
+        """The current snapshot, brought up to date if it is due."""
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and not force
+            and time.monotonic() - self._checked_at < settings.CATALOG_REFRESH_INTERVAL
+        ):
+            return snapshot
+
+        # Only the first load and forced refreshes wait for another thread
+        if not self._lock.acquire(blocking=snapshot is None or force):
+            return snapshot
+        try:
+            if self._snapshot is snapshot or force:
+                self._checked_at = time.monotonic()
+                refreshed = self._snapshot and self._snapshot.refreshed()
+                self._snapshot = refreshed or self._build()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def page(
+        self, filters: dict, sort_by: str, desc: bool, number: int, per_page: int
+    ) -> Page | None:
+        """See `CatalogSnapshot.page`."""
+        return self.refresh().page(filters, sort_by, desc, number, per_page)
+
+    def count(self, filters: dict) -> int | None:
+        """See `CatalogSnapshot.count`."""
+        return self.refresh().count(filters)
+
+    def facets(self, filters: dict) -> dict | None:
+        """See `CatalogSnapshot.facets`."""
+        return self.refresh().facets(filters)
+
+
+catalog = ColumnarCatalog()
@@ -0,0 +1,103 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings() -> list[str]:
+    """Supported content codings, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+    Parse an Accept-Encoding header into `{coding: qvalue}`.
+
+    >>> parse_accept_encoding("gzip, br;q=0.5, identity;q=0")
+    {'gzip': 1.0, 'br': 0.5, 'identity': 0.0}
+    """
+    codings: dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                qvalue = float(params[2:])
+            except ValueError:
+                qvalue = 0.0
+        codings[coding] = qvalue
+    return codings
+
+
+def negotiate_encoding(header: str) -> str | None:
+    """
+    Pick the content coding to use for a response, or None to send it as is.
+
+    Brotli is preferred over gzip when the client accepts both equally.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        qvalue = accepted.get(coding, accepted.get("*", 0.0))
+        if qvalue > best_q:
+            best, best_q = coding, qvalue
+    return best
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for streaming responses. Each chunk is flushed as
+    soon as it has been compressed, so clients receive data as it is produced.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_stream(chunks, encoding: str):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding: str):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
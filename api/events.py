@@ -0,0 +1,255 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+
+from .models import Book, Borrow, ChangeEvent
+from .responses import dumps
+
+BOOK_CREATED = "book.created"
+BOOK_UPDATED = "book.updated"
+BOOK_DELETED = "book.deleted"
+BOOK_BORROWED = "book.borrowed"
+BOOK_RETURNED = "book.returned"
+# Several books changed by the same patch, sent as `{"ids": [...], "patch": {...}}`
+BOOKS_UPDATED = "books.updated"
+# Several books deleted by `delete_books`, sent as `{"ids": [...]}`
+BOOKS_DELETED = "books.deleted"
+# Authors and genres added, sent as `{"id": ..., "name": ...}`
+AUTHOR_CREATED = "author.created"
+GENRE_CREATED = "genre.created"
+
+
+def book_data(book: Book) -> dict:
+    """
+    Render a book the way `get_books` does, for events that carry a whole book.
+    """
+    borrower_name = (
+        Borrow.objects.filter(book=book, is_borrowed=True)
+        .values_list("borrower_name", flat=True)
+        .first()
+    )
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": (
+            {"id": book.author.id, "name": book.author.name} if book.author else None
+        ),
+        "dateAdded": book.date_added.isoformat(),
+        "genres": [{"id": genre.id, "name": genre.name} for genre in book.genres.all()],
+        "borrowerName": borrower_name,
+        "allowBorrow": book.allow_borrow,
+    }
+
+
+def emit(type: str, book_id: int | None = None, data: dict | None = None) -> int:
+    """
+    Publish a catalog change on the change feed.
+
+    The event is a row in the `ChangeEvent` table, so it is part of the current
+    transaction: a write that is rolled back never announces itself.
+
+    Args:
+        type (str): One of the `BOOK_*` event types.
+        book_id (int, optional): The book that changed.
+        data (dict, optional): JSON-serializable details, kept small.
+
+    Returns:
+        int: The id of the event, which is also the new catalog version.
+    """
+    return ChangeEvent.objects.create(type=type, book_id=book_id, data=data or {}).id
+
+
+def latest_id() -> int:
+    """The id of the latest event (the catalog version), 0 if there is none."""
+    return ChangeEvent.objects.aggregate(latest=Max("id"))["latest"] or 0
+
+
+def serialize(event: ChangeEvent) -> dict:
+    return {
+        "id": event.id,
+        "type": event.type,
+        "bookId": event.book_id,
+        "data": event.data,
+        "datetime": event.datetime.isoformat(),
+    }
+
+
+def fetch_since(last_id: int, limit: int) -> list[dict]:
+    """Return up to `limit` events with an id above `last_id`, oldest first."""
+    events = ChangeEvent.objects.filter(id__gt=last_id).order_by("id")[:limit]
+    return [serialize(event) for event in events]
+
+
+def format_sse(event: dict) -> bytes:
+    """Encode an event as a server-sent event message."""
+    return (
+        f"id: {event['id']}\nevent: {event['type']}\ndata: ".encode()
+        + dumps(event)
+        + b"\n\n"
+    )
+
+
+def format_reset(last_id: int) -> bytes:
+    """
+    Tell the client it missed too many events to replay and should refetch.
+    """
+    return f"id: {last_id}\nevent: reset\ndata: {{}}\n\n".encode()
+
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        # Set when the client fell too far behind and was dropped
+        self.overflowed = False
+
+
+class Broadcaster:
+    """
+    In-process fan-out of change events to the open feed connections.
+
+    A single polling task per process reads new rows from the `ChangeEvent`
+    table and hands them to every subscriber, so the number of queries does not
+    grow with the number of connected clients. The task only runs while there
+    are subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._last_id = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self) -> Subscription:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # State from another event loop (e.g. a previous server) is unusable
+            self._subscribers = set()
+            self._task = None
+            self._loop = loop
+
+        subscription = Subscription(settings.CHANGE_FEED_QUEUE_SIZE)
+        self._subscribers.add(subscription)
+
+        if self._task is None or self._task.done():
+            self._last_id = await sync_to_async(latest_id)()
+            self._task = loop.create_task(self._poll())
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, events: list[dict]) -> None:
+        for subscription in list(self._subscribers):
+            for event in events:
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    subscription.overflowed = True
+                    self._subscribers.discard(subscription)
+                    break
+
+    async def _poll(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(settings.CHANGE_FEED_POLL_INTERVAL)
+            try:
+                events = await sync_to_async(fetch_since)(
+                    self._last_id, settings.CHANGE_FEED_REPLAY_LIMIT
+                )
+            except Exception as e:
+                print(f"Unexpected error polling change events: {e}")
+                continue
+
+            if events:
+                self._last_id = events[-1]["id"]
+                self.publish(events)
+
+
+broadcaster = Broadcaster()
+
+
+async def astream(last_id: int | None):
+    """
+    Server-sent event stream for ASGI: replays the events after `last_id`, then
+    follows the broadcaster until the client goes away.
+    """
+    yield f"retry: {settings.CHANGE_FEED_RETRY_MS}\n\n".encode()
+
+    # Subscribe before replaying so nothing falls between the two
+    subscription = await broadcaster.subscribe()
+    try:
+        if last_id is None:
+            last_id = await sync_to_async(latest_id)()
+        else:
+            events = await sync_to_async(fetch_since)(
+                last_id, settings.CHANGE_FEED_REPLAY_LIMIT
+            )
+            if len(events) == settings.CHANGE_FEED_REPLAY_LIMIT:
+                last_id = await sync_to_async(latest_id)()
+                yield format_reset(last_id)
+            else:
+                for event in events:
+                    last_id = event["id"]
+                    yield format_sse(event)
+
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), settings.CHANGE_FEED_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+
+            # Already sent during the replay
+            if event["id"] <= last_id:
+                continue
+            last_id = event["id"]
+            yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def stream(last_id: int | None):
+    """
+    Server-sent event stream for WSGI, where there is no event loop to share:
+    the connection polls the table itself and ends after
+    `CHANGE_FEED_MAX_DURATION` seconds to give its worker back. Clients
+    reconnect on their own and resume from their Last-Event-ID.
+    """
+    yield f"retry: {settings.CHANGE_FEED_RETRY_MS}\n\n".encode()
+
+    if last_id is None:
+        last_id = latest_id()
+
+    deadline = time.monotonic() + settings.CHANGE_FEED_MAX_DURATION
+    idle_since = time.monotonic()
+    while True:
+        events = fetch_since(last_id, settings.CHANGE_FEED_REPLAY_LIMIT)
+        if len(events) == settings.CHANGE_FEED_REPLAY_LIMIT:
+            last_id = latest_id()
+            yield format_reset(last_id)
+        else:
+            for event in events:
+                last_id = event["id"]
+                yield format_sse(event)
+
+        now = time.monotonic()
+        if events:
+            idle_since = now
+        elif now - idle_since >= settings.CHANGE_FEED_KEEPALIVE:
+            idle_since = now
+            yield KEEPALIVE
+
+        if now >= deadline:
+            return
+        time.sleep(settings.CHANGE_FEED_POLL_INTERVAL)
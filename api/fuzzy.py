@@ -0,0 +1,171 @@
+import math
+import re
+
+from django.db.models import Count
+
+from .models import Author, Book, SearchTrigram
+from .text import fold_text
+
+# Fraction of the query's trigrams a title or name must contain to match
+SIMILARITY_THRESHOLD = 0.5
+# Most titles and names scored per search, taken by number of shared trigrams
+MAX_CANDIDATES = 500
+# Most books returned by a search
+MAX_RESULTS = 500
+# Trigrams in more titles (or names) than this are too common to narrow a
+# search down, and are not used to look candidates up
+MAX_GRAM_FREQUENCY = 2000
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Return the trigrams of `text`, after folding case and accents.
+
+    Each word is padded like PostgreSQL's pg_trgm does (two spaces before, one
+    after), so word starts weigh more than their middle.
+
+    >>> sorted(trigrams("Cat"))
+    ['  c', ' ca', 'at ', 'cat']
+    """
+    grams: set[str] = set()
+    for word in re.findall(r"\w+", fold_text(text)):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index(kind: str, object_id: int, text: str) -> None:
+    """
+    Bring the trigrams of one title or name up to date, writing only the ones
+    that changed.
+    """
+    new = trigrams(text)
+    old = set(
+        SearchTrigram.objects.filter(kind=kind, object_id=object_id).values_list(
+            "gram", flat=True
+        )
+    )
+    if old - new:
+        SearchTrigram.objects.filter(
+            kind=kind, object_id=object_id, gram__in=old - new
+        ).delete()
+    if new - old:
+        SearchTrigram.objects.bulk_create(
+            [
+                SearchTrigram(kind=kind, object_id=object_id, gram=gram)
+                for gram in new - old
+            ]
+        )
+
+
+def unindex(kind: str, object_ids: list[int]) -> None:
+    SearchTrigram.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def index_on_save(sender, instance, **kwargs) -> None:
+    """`post_save` receiver for Book and Author."""
+    if sender is Book:
+        index(SearchTrigram.BOOK, instance.pk, instance.title)
+    else:
+        index(SearchTrigram.AUTHOR, instance.pk, instance.name)
+
+
+def unindex_on_delete(sender, instance, **kwargs) -> None:
+    """`post_delete` receiver for Book and Author."""
+    kind = SearchTrigram.BOOK if sender is Book else SearchTrigram.AUTHOR
+    unindex(kind, [instance.pk])
+
+
+def _rare_grams(kind: str, grams: set[str]) -> set[str]:
+    """
+    The trigrams of `grams` found in at most `MAX_GRAM_FREQUENCY` titles or
+    names. Each is checked by seeking past that many postings in the index, so
+    the cost is bounded however common a trigram is.
+    """
+    return {
+        gram
+        for gram in grams
+        if not SearchTrigram.objects.filter(kind=kind, gram=gram)[
+            MAX_GRAM_FREQUENCY : MAX_GRAM_FREQUENCY + 1
+        ].exists()
+    }
+
+
+def _score(kind: str, grams: set[str], texts) -> dict[int, tuple[float, float]]:
+    """
+    Score the titles or names sharing enough trigrams with the query.
+
+    Candidates are found from the posting lists of the query's less common
+    trigrams only, so the cost depends on how rare those are, not on the size
+    of the catalog. They are then scored on all of the query's trigrams.
+
+    Returns:
+        dict: `{object_id: (score, similarity)}`, where `score` is the fraction
+              of the query's trigrams in the text (so a misspelled word matches
+              a long title containing it) and `similarity` the fraction of the
+              trigrams of both that are shared, to rank closer texts first.
+    """
+    min_shared = max(1, math.ceil(SIMILARITY_THRESHOLD * len(grams)))
+    # A query made only of common trigrams has to use them
+    lookup = _rare_grams(kind, grams) or grams
+    # A candidate may have every dropped trigram, so it needs fewer of the rest
+    min_lookup = max(1, min_shared - (len(grams) - len(lookup)))
+    candidates = (
+        SearchTrigram.objects.filter(kind=kind, gram__in=lookup)
+        .values("object_id")
+        .annotate(shared=Count("object_id"))
+        .filter(shared__gte=min_lookup)
+        .order_by("-shared")
+        .values_list("object_id", flat=True)[:MAX_CANDIDATES]
+    )
+
+    scores = {}
+    for object_id, text in texts(list(candidates)):
+        text_grams = trigrams(text)
+        count = len(grams & text_grams)
+        if count < min_shared:
+            continue
+        scores[object_id] = (
+            count / len(grams),
+            count / (len(grams) + len(text_grams) - count),
+        )
+    return scores
+
+
+def search(query: str, scope: str = "all") -> list[tuple[int, float]]:
+    """
+    Find books whose title or author name resembles `query`, despite typos.
+
+    Args:
+        query (str): The search query.
+        scope (str, optional): 'all' (default), 'title' or 'author'.
+
+    Returns:
+        list[tuple[int, float]]: Up to `MAX_RESULTS` `(book_id, score)` pairs,
+                                 best match first. Scores are between
+                                 `SIMILARITY_THRESHOLD` and 1.
+    """
+    grams = trigrams(query)
+    if not grams:
+        return []
+
+    books: dict[int, tuple[float, float]] = {}
+    if scope in ("all", "title"):
+        books = _score(
+            SearchTrigram.BOOK,
+            grams,
+            lambda ids: Book.objects.filter(pk__in=ids).values_list("id", "title"),
+        )
+    if scope in ("all", "author"):
+        authors = _score(
+            SearchTrigram.AUTHOR,
+            grams,
+            lambda ids: Author.objects.filter(pk__in=ids).values_list("id", "name"),
+        )
+        for book_id, author_id in Book.objects.filter(
+            author_id__in=authors
+        ).values_list("id", "author_id"):
+            books[book_id] = max(books.get(book_id, (0, 0)), authors[author_id])
+
+    ranked = sorted(books.items(), key=lambda item: (item[1], -item[0]), reverse=True)
+    return [(book_id, round(score, 3)) for book_id, (score, _) in ranked[:MAX_RESULTS]]
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import audit
+from api.models import ChangeEvent, Log
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete audit log entries and change feed events older than the "
+        "retention period, in chunks so the database is never locked for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Keep entries from the last N days (default: 365).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of entries deleted per statement (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many entries would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        days: int = options["days"]
+        chunk_size: int = options["chunk_size"]
+
+        if days < 0:
+            raise CommandError("--days must not be negative")
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer")
+
+        # Make sure buffered entries are judged by the same cutoff
+        audit.flush()
+
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = Log.objects.filter(datetime__lt=cutoff)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} entries older than {cutoff} found.")
+            return
+
+        deleted = self.prune(expired, chunk_size)
+        self.stdout.write(
+            self.style.SUCCESS(f"Pruned {deleted} entries older than {cutoff}.")
+        )
+
+        # Clients that far behind get a reset event and refetch anyway
+        deleted = self.prune(
+            ChangeEvent.objects.filter(datetime__lt=cutoff), chunk_size
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Pruned {deleted} change events older than {cutoff}.")
+        )
+
+    def prune(self, expired, chunk_size: int) -> int:
+        deleted = 0
+        while True:
+            # Oldest first, walking the datetime index
+            ids = list(
+                expired.order_by("datetime").values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            count, _ = expired.model.objects.filter(id__in=ids).delete()
+            deleted += count
+            self.stdout.write(
+                f"Deleted {deleted} {expired.model._meta.verbose_name_plural}..."
+            )
+        return deleted
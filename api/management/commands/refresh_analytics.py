@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.analytics import RollupBuilder
+from api.models import Book, Borrow, CirculationRollup, LoanDurationBucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the circulation analytics rollups from the full borrow history. "
+        "Only needed once after upgrading, or to repair drift; borrow_book and "
+        "unborrow_book keep the rollups up to date incrementally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of borrow rows read per batch (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size: int = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer")
+
+        builder = RollupBuilder()
+        genres_through = Book.genres.through
+
+        last_id = 0
+        processed = 0
+        while True:
+            chunk = list(
+                Borrow.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list(
+                    "id", "book_id", "book__author_id", "borrowed_date", "returned_date"
+                )[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            # Genres of every book in the chunk in one query
+            genre_ids = defaultdict(list)
+            for book_id, genre_id in genres_through.objects.filter(
+                book_id__in={row[1] for row in chunk}
+            ).values_list("book_id", "genre_id"):
+                genre_ids[book_id].append(genre_id)
+
+            for _, book_id, author_id, borrowed_date, returned_date in chunk:
+                builder.add(
+                    borrowed_date, returned_date, book_id, author_id, genre_ids[book_id]
+                )
+
+            last_id = chunk[-1][0]
+            processed += len(chunk)
+            self.stdout.write(f"Read {processed} borrows...")
+
+        with transaction.atomic():
+            CirculationRollup.objects.all().delete()
+            LoanDurationBucket.objects.all().delete()
+            rows = builder.save()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rows} rollup rows from {processed} borrows."
+            )
+        )
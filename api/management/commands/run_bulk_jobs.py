@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import bulk
+from api.models import BulkJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background bulk jobs that are pending or were left running by "
+        "a process that died, in this process. Gunicorn workers resume them on "
+        "their own as they start; this is for other servers, or from cron."
+    )
+
+    def handle(self, *args, **options):
+        job_ids = bulk.resumable_job_ids()
+        for job_id in job_ids:
+            bulk.run_job(job_id)
+            job = BulkJob.objects.only("status", "processed", "total").get(pk=job_id)
+            self.stdout.write(
+                f"Job {job_id}: {job.status} ({job.processed}/{job.total} books)."
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {len(job_ids)} bulk jobs."))
@@ -0,0 +1,115 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+
+from . import compression
+from .auth_cache import get_cached_user
+from .querylog import SlowQueryRecorder, get_slow_query_log
+
+
+class SlowQueryLogMiddleware:
+    """
+    Records queries slower than `SLOW_QUERY_THRESHOLD_MS` together with the view
+    that ran them. Only active when `SLOW_QUERY_LOG` is enabled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(
+            request, settings.SLOW_QUERY_THRESHOLD_MS, get_slow_query_log()
+        )
+        with connection.execute_wrapper(recorder):
+            return self.get_response(request)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Drop-in replacement for Django's `AuthenticationMiddleware` that resolves
+    `request.user` from the user cache, so authenticated requests don't read
+    `auth_user` on every hit. See `api.auth_cache`.
+    """
+
+    def process_request(self, request):
+        if not hasattr(request, "session"):
+            raise ImproperlyConfigured(
+                "CachedAuthenticationMiddleware requires the session middleware "
+                "to be installed before it."
+            )
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+        async def auser():
+            return await sync_to_async(get_cached_user)(request)
+
+        request.auser = auser
+
+
+class ApiCompressionMiddleware:
+    """
+    Compresses API responses with brotli (when installed) or gzip, as negotiated
+    through the request's Accept-Encoding header.
+
+    Only responses under `API_COMPRESSION_PATH_PREFIX` are touched; regular
+    responses smaller than `API_COMPRESSION_MIN_SIZE` bytes are sent as is,
+    while streaming responses are compressed chunk by chunk. Server-sent event
+    streams are never compressed so events are not held back.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not request.path.startswith(settings.API_COMPRESSION_PATH_PREFIX):
+            return response
+
+        if response.has_header("Content-Encoding") or response.get(
+            "Content-Type", ""
+        ).startswith("text/event-stream"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = compression.negotiate_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_stream(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compression.compress_stream(
+                    response.streaming_content, encoding
+                )
+            # The compressed size is unknown until the stream has been sent
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < settings.API_COMPRESSION_MIN_SIZE:
+                return response
+
+            compressed = compression.compress(response.content, encoding)
+            # Return the compressed content only if it's actually shorter
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # A strong ETag can't match a different representation (RFC 9110 8.8.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+
+        return response
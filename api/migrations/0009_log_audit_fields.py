@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alter_book_date_added'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='action',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='actor',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='book_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='log',
+            name='datetime',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='log',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['datetime', 'action'], name='log_datetime_action_idx'),
+        ),
+    ]
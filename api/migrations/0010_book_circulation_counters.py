@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    Book = apps.get_model("api", "Book")
+    Borrow = apps.get_model("api", "Borrow")
+
+    counters = {}
+    for book_id, borrowed_date, returned_date in Borrow.objects.values_list(
+        "book_id", "borrowed_date", "returned_date"
+    ).iterator():
+        borrowed, returned, seconds = counters.get(book_id, (0, 0, 0.0))
+        borrowed += 1
+        if returned_date is not None:
+            returned += 1
+            seconds += (returned_date - borrowed_date).total_seconds()
+        counters[book_id] = (borrowed, returned, seconds)
+
+    books = list(Book.objects.filter(pk__in=counters.keys()))
+    for book in books:
+        book.times_borrowed, book.times_returned, book.total_loan_seconds = counters[
+            book.pk
+        ]
+    Book.objects.bulk_update(
+        books,
+        ["times_borrowed", "times_returned", "total_loan_seconds"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_log_audit_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='times_borrowed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='times_returned',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_loan_seconds',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['book', 'borrowed_date'], name='borrow_book_date_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:04
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    # Frozen copy of api.text.normalize_name
+    return " ".join(unicodedata.normalize("NFKC", name).split()).casefold()
+
+
+def link_borrowers(apps, schema_editor):
+    Borrow = apps.get_model("api", "Borrow")
+    Borrower = apps.get_model("api", "Borrower")
+
+    # First spelling seen becomes the display name
+    names = {}
+    for name in (
+        Borrow.objects.order_by("borrowed_date")
+        .values_list("borrower_name", flat=True)
+        .iterator()
+    ):
+        names.setdefault(normalize_name(name), name.strip())
+
+    Borrower.objects.bulk_create(
+        [
+            Borrower(name=name, normalized_name=normalized)
+            for normalized, name in names.items()
+        ],
+        batch_size=500,
+    )
+    borrower_ids = dict(Borrower.objects.values_list("normalized_name", "id"))
+
+    borrows = list(Borrow.objects.only("id", "borrower_name"))
+    for borrow in borrows:
+        borrow.borrower_id = borrower_ids[normalize_name(borrow.borrower_name)]
+    Borrow.objects.bulk_update(borrows, ["borrower"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_book_circulation_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Borrower',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='borrow',
+            name='borrower',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='borrows', to='api.borrower'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['borrower', 'is_borrowed'], name='borrow_borrower_active_idx'),
+        ),
+        migrations.RunPython(link_borrowers, migrations.RunPython.noop),
+    ]
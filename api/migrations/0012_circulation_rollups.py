@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_borrower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanDurationBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CirculationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('book', 'Book'), ('genre', 'Genre'), ('author', 'Author')], max_length=10)),
+                ('key', models.BigIntegerField(default=0)),
+                ('loans', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('loan_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'date', 'key'), name='rollup_unique_dimension_date_key')],
+            },
+        ),
+    ]
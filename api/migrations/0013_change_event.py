@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_circulation_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "datetime",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("type", models.CharField(max_length=32)),
+                ("book_id", models.IntegerField(blank=True, null=True)),
+                ("data", models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:29
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def sort_key(value, articles=("the", "a", "an")):
+    # Frozen copy of api.text.sort_key
+    key = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", value)
+        if not unicodedata.combining(char)
+    )
+    key = " ".join(key.casefold().split())
+    first, _, rest = key.partition(" ")
+    if rest and first in articles:
+        key = f"{rest}, {first}"
+    key = re.sub(r"\d+", lambda match: match.group().zfill(10), key)
+    return key[:255]
+
+
+def fill_sort_keys(apps, schema_editor):
+    Book = apps.get_model("api", "Book")
+
+    books = list(Book.objects.select_related("author").only("id", "title", "author__name"))
+    for book in books:
+        book.title_sort_key = sort_key(book.title)
+        book.author_sort_key = sort_key(book.author.name, ()) if book.author else ""
+    Book.objects.bulk_update(books, ["title_sort_key", "author_sort_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_book_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='author_sort_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_sort_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        # Before the indexes, so they are built once
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title_sort_key', 'id'], name='book_title_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author_sort_key', 'id'], name='book_author_sort_idx'),
+        ),
+    ]
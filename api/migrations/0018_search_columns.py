@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:31
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fold_text(value):
+    # Frozen copy of api.text.fold_text
+    return " ".join(
+        "".join(
+            char
+            for char in unicodedata.normalize("NFKD", value.casefold())
+            if not unicodedata.combining(char)
+        ).split()
+    )
+
+
+def fill_search_columns(apps, schema_editor):
+    for model, source, target in [
+        ("Book", "title", "title_search"),
+        ("Author", "name", "name_search"),
+        ("Borrower", "name", "search_name"),
+    ]:
+        Model = apps.get_model("api", model)
+        rows = list(Model.objects.only("id", source))
+        for row in rows:
+            setattr(row, target, fold_text(getattr(row, source)))
+        Model.objects.bulk_update(rows, [target], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_book_sort_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='name_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='borrower',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+    ]
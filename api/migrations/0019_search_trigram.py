@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:35
+
+import re
+
+from django.db import migrations, models
+
+
+def trigrams(folded):
+    # Frozen copy of api.fuzzy.trigrams, for text already folded
+    grams = set()
+    for word in re.findall(r"\w+", folded):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_catalog(apps, schema_editor):
+    SearchTrigram = apps.get_model("api", "SearchTrigram")
+    for kind, model, column in [
+        ("book", "Book", "title_search"),
+        ("author", "Author", "name_search"),
+    ]:
+        rows = apps.get_model("api", model).objects.values_list("id", column)
+        batch = []
+        for object_id, folded in rows.iterator():
+            batch.extend(
+                SearchTrigram(kind=kind, object_id=object_id, gram=gram)
+                for gram in trigrams(folded)
+            )
+            if len(batch) >= 5000:
+                SearchTrigram.objects.bulk_create(batch, batch_size=500)
+                batch = []
+        SearchTrigram.objects.bulk_create(batch, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_search_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('kind', models.CharField(choices=[('book', 'Book'), ('author', 'Author')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['object_id'], name='trigram_object_idx')],
+                'constraints': [models.UniqueConstraint(fields=('gram', 'kind', 'object_id'), name='trigram_unique_gram_object')],
+            },
+        ),
+        migrations.RunPython(index_catalog, migrations.RunPython.noop),
+    ]
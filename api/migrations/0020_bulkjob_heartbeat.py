@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_search_trigram"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bulkjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_bulkjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="author",
+            name="name_search",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="book",
+            name="title_search",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+    ]
@@ -1,18 +1,43 @@
-from django.db.models import (CASCADE, SET_NULL, BooleanField, CharField,
-                              CheckConstraint, DateTimeField, ForeignKey,
-                              ManyToManyField, Model, Q, TextField,
+from django.db.models import (CASCADE, PROTECT, SET_NULL, BigIntegerField,
+                              BooleanField, CharField, CheckConstraint,
+                              DateField, DateTimeField, FloatField, ForeignKey,
+                              Index, IntegerField, JSONField, ManyToManyField,
+                              Model, PositiveIntegerField,
+                              PositiveSmallIntegerField, Q, TextField,
                               UniqueConstraint)
+from django.utils import timezone
+
+from .text import fold_text, normalize_name, sort_key
 
 
 class Author(Model):
     name = CharField(max_length=255)
+    # `name` folded for accent- and case-insensitive search (see `api.text`).
+    # Not indexed: substring matches (LIKE '%q%') can't use a B-tree index
+    name_search = CharField(max_length=255, default="", editable=False)
+    # Read by the sync endpoint to find rows changed since a token
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        self.name_search = fold_text(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "name_search"}
+        super().save(*args, **kwargs)
+        if not adding:
+            # Books keep a copy of their author's sort key
+            Book.objects.filter(author=self).update(
+                author_sort_key=sort_key(self.name, articles=())
+            )
+
 
 class Genre(Model):
     name = CharField(max_length=255)
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -24,17 +49,90 @@ class Book(Model):
     allow_borrow = BooleanField(default=True)
     author = ForeignKey(Author, on_delete=SET_NULL, null=True, blank=True)
     genres = ManyToManyField(Genre)
+    # Also bumped when the book's genres change, or its author or one of its
+    # genres is deleted (see `api.sync`)
+    updated_at = DateTimeField(auto_now=True, db_index=True)
+    # Incremented by every edit, for optimistic concurrency (If-Match)
+    version = PositiveIntegerField(default=1)
+
+    # Circulation counters, maintained by borrow_book/unborrow_book so that
+    # history stats never need a scan of Borrow
+    times_borrowed = PositiveIntegerField(default=0)
+    times_returned = PositiveIntegerField(default=0)
+    total_loan_seconds = FloatField(default=0)
+
+    # Normalized keys that sort_books orders by (see `api.text.sort_key`), so
+    # that a sorted page is a walk of an index rather than a sort of the table.
+    # Kept up to date by save(), and by the views that write with update().
+    title_sort_key = CharField(max_length=255, default="", editable=False)
+    author_sort_key = CharField(max_length=255, default="", editable=False)
+    # `title` folded for accent- and case-insensitive search (see `api.text`).
+    # Not indexed, like `Author.name_search`
+    title_search = CharField(max_length=255, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            Index(fields=["title_sort_key", "id"], name="book_title_sort_idx"),
+            Index(fields=["author_sort_key", "id"], name="book_author_sort_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.title_sort_key = sort_key(self.title)
+        self.title_search = fold_text(self.title)
+        self.author_sort_key = (
+            sort_key(self.author.name, articles=()) if self.author else ""
+        )
+        if not self._state.adding:
+            self.version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "version",
+                    "title_sort_key",
+                    "author_sort_key",
+                    "title_search",
+                }
+        super().save(*args, **kwargs)
+
+    @property
+    def average_loan_seconds(self) -> float | None:
+        if not self.times_returned:
+            return None
+        return self.total_loan_seconds / self.times_returned
+
+
+class Borrower(Model):
+    # Display name, as first entered at the desk
+    name = CharField(max_length=255)
+    # Identity of the borrower; unique, and indexed for prefix lookups
+    normalized_name = CharField(max_length=255, unique=True)
+    # Also accent-folded, for search and autocomplete (see `api.text`)
+    search_name = CharField(max_length=255, default="", editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        self.search_name = fold_text(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
 
 class Borrow(Model):
     book = ForeignKey(Book, on_delete=CASCADE)
     is_borrowed = BooleanField(default=True)
+    borrower = ForeignKey(
+        Borrower, on_delete=PROTECT, null=True, blank=True, related_name="borrows"
+    )
+    # The name as given for this loan; kept alongside the normalized borrower
     borrower_name = CharField(max_length=255)
     borrowed_date = DateTimeField(auto_now_add=True)
     returned_date = DateTimeField(null=True, blank=True)
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -56,6 +154,22 @@ class Borrow(Model):
                 name="borrow_unique_active_borrow_per_book",
             ),
         ]
+        indexes = [
+            # Serves the paginated borrow history of a book
+            Index(fields=["book", "borrowed_date"], name="borrow_book_date_idx"),
+            # Serves the "currently holds" list of a borrower
+            Index(
+                fields=["borrower", "is_borrowed"], name="borrow_borrower_active_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.borrower_id is None and self.borrower_name:
+            self.borrower, _ = Borrower.objects.get_or_create(
+                normalized_name=normalize_name(self.borrower_name),
+                defaults={"name": self.borrower_name.strip()},
+            )
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return (
@@ -66,8 +180,189 @@ class Borrow(Model):
 
 
 class Log(Model):
-    datetime = DateTimeField()
-    description = TextField()
+    """
+    Append-only audit log of every write made through the API.
+
+    Entries are written in batches by `api.audit`, never updated, and only
+    removed by the `prune_logs` retention command.
+    """
+
+    datetime = DateTimeField(default=timezone.now)
+    description = TextField(blank=True)
+    actor = CharField(max_length=150, blank=True)
+    action = CharField(max_length=50, blank=True)
+    # Not a foreign key: entries must outlive the books they describe
+    book_id = IntegerField(null=True, blank=True)
+    payload = JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=["datetime", "action"], name="log_datetime_action_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Log entries are append-only and cannot be changed")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Log entries are append-only; use prune_logs instead")
 
     def __str__(self):
         return self.description
+
+
+class CirculationRollup(Model):
+    """
+    Daily loan and return totals, per book, genre and author plus an overall
+    total. Maintained incrementally by `api.analytics` as books are borrowed and
+    returned, and rebuilt from history by the `refresh_analytics` command.
+    """
+
+    TOTAL = "total"
+    BOOK = "book"
+    GENRE = "genre"
+    AUTHOR = "author"
+    DIMENSION_CHOICES = [
+        (TOTAL, "Total"),
+        (BOOK, "Book"),
+        (GENRE, "Genre"),
+        (AUTHOR, "Author"),
+    ]
+
+    date = DateField()
+    dimension = CharField(max_length=10, choices=DIMENSION_CHOICES)
+    # Id of the book/genre/author, 0 for the total
+    key = BigIntegerField(default=0)
+    loans = PositiveIntegerField(default=0)
+    returns = PositiveIntegerField(default=0)
+    loan_seconds = FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["dimension", "date", "key"],
+                name="rollup_unique_dimension_date_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.dimension}:{self.key} ({self.loans} loans)"
+
+
+class LoanDurationBucket(Model):
+    """
+    Histogram of loan durations on a logarithmic scale, used to answer duration
+    percentiles without reading the loans themselves.
+    """
+
+    bucket = PositiveSmallIntegerField(unique=True)
+    count = PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"bucket {self.bucket}: {self.count}"
+
+
+class ChangeEvent(Model):
+    """
+    Catalog change published on the change feed (`api.events`).
+
+    The table doubles as the channel between worker processes: each worker
+    polls it for ids above the last one it has seen, so an event emitted by any
+    worker reaches the clients of all of them. The highest id is the catalog
+    version.
+    """
+
+    datetime = DateTimeField(default=timezone.now, db_index=True)
+    type = CharField(max_length=32)
+    # Not a foreign key: deletions are events too
+    book_id = IntegerField(null=True, blank=True)
+    data = JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.type} {self.book_id or ''}".rstrip()
+
+
+class Tombstone(Model):
+    """
+    Record of a deleted catalog row, so that the sync endpoint can tell mirrors
+    to drop it. Written by `api.sync` when a book, author or genre is deleted.
+    """
+
+    BOOK = "book"
+    AUTHOR = "author"
+    GENRE = "genre"
+    KIND_CHOICES = [(BOOK, "Book"), (AUTHOR, "Author"), (GENRE, "Genre")]
+
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = BigIntegerField()
+    deleted_at = DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
+
+
+class SearchTrigram(Model):
+    """
+    Trigram index over book titles and author names, for typo-tolerant search
+    (see `api.fuzzy`). One row per distinct trigram of each title or name, kept
+    up to date as they are written.
+    """
+
+    BOOK = "book"
+    AUTHOR = "author"
+    KIND_CHOICES = [(BOOK, "Book"), (AUTHOR, "Author")]
+
+    gram = CharField(max_length=3)
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = BigIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the posting lists: the objects that contain a trigram
+            UniqueConstraint(
+                fields=["gram", "kind", "object_id"], name="trigram_unique_gram_object"
+            ),
+        ]
+        indexes = [
+            # The trigrams of one title or name. Deliberately not led by `kind`,
+            # or SQLite would pick it to scan every posting of a kind in search.
+            Index(fields=["object_id"], name="trigram_object_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.gram!r} in {self.kind} {self.object_id}"
+
+
+class BulkJob(Model):
+    """
+    A bulk operation running in the background, with its progress, for
+    operations too large to run within a request (see `api.bulk`).
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    action = CharField(max_length=50)
+    actor = CharField(max_length=150, blank=True)
+    status = CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    book_ids = JSONField(default=list)
+    total = PositiveIntegerField(default=0)
+    processed = PositiveIntegerField(default=0)
+    error = TextField(blank=True)
+    created_at = DateTimeField(default=timezone.now)
+    finished_at = DateTimeField(null=True, blank=True)
+    # Set by the process running the job after each chunk; a running job whose
+    # heartbeat is older than `BULK_JOB_STALE_AFTER` lost its process
+    heartbeat_at = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.action} #{self.id} ({self.status})"
@@ -0,0 +1,250 @@
+import json
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Patterns used to reduce a SQL statement to its "shape"
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN \((?:\?(?:, )?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduce a SQL statement to its shape so that queries differing only in their
+    literal values or parameters are grouped together.
+
+    Args:
+        sql (str): The SQL statement.
+
+    Returns:
+        str: The statement with literals and placeholders replaced by `?` and
+             `IN (...)` lists collapsed.
+    """
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _WHITESPACE.sub(" ", shape).strip()
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+class SlowQueryLog:
+    """
+    Writes slow query entries to a rotating JSON-lines file.
+
+    Entries are handed over through a bounded queue and written by a daemon
+    thread, which also captures the query plan on its own database connection,
+    so recording never adds latency to the request that ran the query.
+    """
+
+    def __init__(self, log_file: Path, max_bytes: int, backup_count: int):
+        self.log_file = Path(log_file)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, entry: dict) -> None:
+        """Queue an entry, dropping it if the writer is falling behind."""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            pass
+
+    def flush(self) -> None:
+        """Block until every queued entry has been written."""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="slow-query-log", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            entry = self.queue.get()
+            try:
+                entry["plan"] = self._explain(entry)
+                self._write(entry)
+            except Exception as e:
+                print(f"Unexpected error in slow query log: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _explain(self, entry: dict) -> list[str] | None:
+        # Only plain reads are safe to explain again
+        if entry["many"] or not entry["sql"].lstrip().upper().startswith("SELECT"):
+            return None
+
+        connection = connections[entry["alias"]]
+        prefix = connection.ops.explain_query_prefix()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {entry['sql']}", entry["params"])
+                return [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+
+    def _write(self, entry: dict) -> None:
+        line = json.dumps(entry, default=str) + "\n"
+
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        if (
+            self.log_file.exists()
+            and self.log_file.stat().st_size + len(line) > self.max_bytes
+        ):
+            self._rotate()
+
+        with self.log_file.open("a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _rotate(self) -> None:
+        # slow_queries.log -> .1 -> .2 ... dropping the oldest
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.log_file.with_name(f"{self.log_file.name}.{i}")
+            if src.exists():
+                src.replace(self.log_file.with_name(f"{self.log_file.name}.{i + 1}"))
+        if self.backup_count > 0:
+            self.log_file.replace(self.log_file.with_name(f"{self.log_file.name}.1"))
+        else:
+            self.log_file.unlink()
+
+    def files(self) -> list[Path]:
+        """Return the log file and its rotated backups, oldest first."""
+        backups = [
+            self.log_file.with_name(f"{self.log_file.name}.{i}")
+            for i in range(self.backup_count, 0, -1)
+        ]
+        return [f for f in [*backups, self.log_file] if f.exists()]
+
+    def read(self) -> list[dict]:
+        """Read every recorded entry, oldest first."""
+        entries: list[dict] = []
+        for log_file in self.files():
+            with log_file.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        return entries
+
+
+_logs: dict[Path, SlowQueryLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Return the process-wide log for the configured `SLOW_QUERY_LOG_FILE`."""
+    log_file = Path(settings.SLOW_QUERY_LOG_FILE)
+    with _logs_lock:
+        if log_file not in _logs:
+            _logs[log_file] = SlowQueryLog(
+                log_file,
+                max_bytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                backup_count=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+            )
+        return _logs[log_file]
+
+
+class SlowQueryRecorder:
+    """
+    Database execute wrapper that times each query and submits the ones slower
+    than `threshold_ms` to the slow query log.
+    """
+
+    def __init__(self, request, threshold_ms: float, log: SlowQueryLog):
+        self.request = request
+        self.threshold_ms = threshold_ms
+        self.log = log
+
+    def view_name(self) -> str | None:
+        match = getattr(self.request, "resolver_match", None)
+        if match is None:
+            return None
+        return getattr(match.func, "__name__", match.view_name)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.log.submit(
+                    {
+                        "datetime": timezone.now().isoformat(),
+                        "alias": context["connection"].alias,
+                        "view": self.view_name(),
+                        "path": self.request.path,
+                        "durationMs": round(duration_ms, 3),
+                        "sql": sql,
+                        "params": None if many else params,
+                        "many": many,
+                    }
+                )
+
+
+def summarize(entries: list[dict]) -> list[dict]:
+    """
+    Aggregate slow query entries by normalized SQL shape.
+
+    Args:
+        entries (list[dict]): Entries as returned by `SlowQueryLog.read`.
+
+    Returns:
+        list[dict]: One item per shape, slowest total time first.
+    """
+    groups: dict[str, dict] = defaultdict(
+        lambda: {"count": 0, "totalMs": 0.0, "maxMs": 0.0, "views": set()}
+    )
+
+    for entry in entries:
+        shape = normalize_sql(entry["sql"])
+        group = groups[shape]
+        group["count"] += 1
+        group["totalMs"] += entry["durationMs"]
+        if entry["durationMs"] >= group["maxMs"]:
+            # Keep the slowest occurrence as the representative sample
+            group["maxMs"] = entry["durationMs"]
+            group["sample"] = {
+                "sql": entry["sql"],
+                "params": entry.get("params"),
+                "plan": entry.get("plan"),
+            }
+        if entry.get("view"):
+            group["views"].add(entry["view"])
+        group["lastSeen"] = entry["datetime"]
+
+    result = [
+        {
+            "shape": shape,
+            "count": group["count"],
+            "totalMs": round(group["totalMs"], 3),
+            "avgMs": round(group["totalMs"] / group["count"], 3),
+            "maxMs": group["maxMs"],
+            "views": sorted(group["views"]),
+            "lastSeen": group["lastSeen"],
+            "sample": group["sample"],
+        }
+        for shape, group in groups.items()
+    ]
+    result.sort(key=lambda item: item["totalMs"], reverse=True)
+    return result
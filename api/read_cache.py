@@ -0,0 +1,68 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+
+from . import events
+
+# Response headers kept with a cached response
+CACHED_HEADERS = ["ETag"]
+
+
+def cache_key(request: HttpRequest, catalog_version: int) -> str:
+    params = sorted(
+        (name, value) for name, values in request.GET.lists() for value in values
+    )
+    digest = hashlib.sha1(repr((request.path, params)).encode()).hexdigest()
+    return f"read:{catalog_version}:{digest}"
+
+
+def cached_read(view):
+    """
+    Serve the successful GET responses of a catalog read view from the read
+    cache (`READ_CACHE_ALIAS`), for up to `READ_CACHE_TIMEOUT` seconds.
+
+    Responses are cached under the catalog version, the id of the latest change
+    event (`events.latest_id`), which every write announces in its own
+    transaction. Each request reads the version (one indexed lookup), so a
+    write made through any worker is seen by the others on their next request,
+    and the entries of older versions are never read again; they age out of
+    the in-process LRU and expire from the shared tier.
+
+    Responses carry `X-Cache: hit` or `X-Cache: miss`. Streamed responses and
+    errors aren't cached.
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method != "GET" or not settings.READ_CACHE_TIMEOUT:
+            return view(request, *args, **kwargs)
+
+        cache = caches[settings.READ_CACHE_ALIAS]
+        key = cache_key(request, events.latest_id())
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, headers = cached
+            response = HttpResponse(content, content_type=content_type)
+            for name, value in headers:
+                response[name] = value
+            response["X-Cache"] = "hit"
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            headers = [
+                (name, response[name]) for name in CACHED_HEADERS if name in response
+            ]
+            cache.set(
+                key,
+                (response.content, response["Content-Type"], headers),
+                settings.READ_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "miss"
+        return response
+
+    return wrapper
@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(obj):
+    # Anything orjson can't encode natively (e.g. Decimal, lazy strings)
+    return DjangoJSONEncoder().default(obj)
+
+
+def get_encoder_name() -> str:
+    """
+    Return the JSON encoder in use: 'orjson' or 'stdlib'.
+
+    Controlled by the `API_JSON_ENCODER` setting: 'auto' (orjson when it is
+    installed), 'orjson' or 'stdlib'.
+    """
+    choice = settings.API_JSON_ENCODER
+    if choice == "stdlib" or orjson is None:
+        return "stdlib"
+    return "orjson"
+
+
+def dumps(data) -> bytes:
+    """
+    Encode `data` as compact UTF-8 JSON with the configured encoder.
+
+    Views are expected to hand over ready-to-encode values (datetimes already
+    formatted with `isoformat()` while building the rows), so both encoders
+    produce equivalent documents and never need a fallback hook on the hot path.
+    """
+    if get_encoder_name() == "orjson":
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+
+class ApiJsonResponse(JsonResponse):
+    """
+    `JsonResponse` that encodes with `dumps`, using orjson when available.
+
+    Accepts the same arguments as `JsonResponse` except `encoder` and
+    `json_dumps_params`, which only apply to the stdlib encoder.
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        # Skip JsonResponse.__init__, which would encode with the stdlib
+        super(JsonResponse, self).__init__(content=dumps(data), **kwargs)
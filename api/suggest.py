@@ -0,0 +1,209 @@
+import bisect
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Author, Book, Genre, Tombstone
+from .text import fold_text
+
+TITLE = "title"
+AUTHOR = "author"
+GENRE = "genre"
+
+# Kind of each suggestion: model, its text column, its folded column (if
+# stored), its tombstone kind, and the one-letter code used in index entries
+KINDS = {
+    TITLE: (Book, "title", "title_search", Tombstone.BOOK, "t"),
+    AUTHOR: (Author, "name", "name_search", Tombstone.AUTHOR, "a"),
+    GENRE: (Genre, "name", None, Tombstone.GENRE, "g"),
+}
+_CODES = {code: kind for kind, (*_, code) in KINDS.items()}
+_TOMBSTONE_CODES = {tombstone: code for *_, tombstone, code in KINDS.values()}
+
+# Characters of each key kept in the index; longer queries match on these
+KEY_LENGTH = 48
+# Most entries of each list looked at per lookup
+SCAN_LIMIT = 256
+# More changed rows than this since the last refresh and the index is rebuilt
+MAX_DELTA = 1000
+# Rows changed this long before the last refresh are read again, in case
+# their transaction committed after it
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index of book titles, author names and genre names, for
+    suggestions as the user types.
+
+    Keys are entries `<folded text>\0<kind code><id>` of sorted lists (see
+    `api.text.fold_text`): one list for whole texts, another for the text from
+    each later word on. A lookup is a bisect into each list followed by a scan of
+    about `limit` entries, without touching the database.
+
+    Each worker process keeps its own index. It is built on first use, then
+    brought up to date with the rows changed since (by `updated_at`, and
+    tombstones for deletions) at most every `SUGGEST_REFRESH_INTERVAL` seconds.
+    """
+
+    def __init__(self):
+        # Whole texts, then texts from their second, third... word on
+        self._starts: list[str] = []
+        self._words: list[str] = []
+        # "<kind code><id>" -> (text, folded text)
+        self._labels: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._checked_at = float("-inf")
+
+    @staticmethod
+    def _keys(ref: str, folded: str) -> tuple[str, set[str]]:
+        """The key of the whole text and the keys of its later words."""
+        words = set()
+        start = 0
+        for word in folded.split(" ")[:-1]:
+            start += len(word) + 1
+            words.add(f"{folded[start : start + KEY_LENGTH]}\0{ref}")
+        return f"{folded[:KEY_LENGTH]}\0{ref}", words
+
+    def _add(self, ref: str, text: str, folded: str) -> None:
+        self._labels[ref] = (text, folded)
+        start, words = self._keys(ref, folded)
+        bisect.insort(self._starts, start)
+        for key in words:
+            bisect.insort(self._words, key)
+
+    def _remove(self, ref: str) -> None:
+        label = self._labels.pop(ref, None)
+        if label is None:
+            return
+        start, words = self._keys(ref, label[1])
+        for entries, keys in [(self._starts, [start]), (self._words, words)]:
+            for key in keys:
+                i = bisect.bisect_left(entries, key)
+                if i < len(entries) and entries[i] == key:
+                    del entries[i]
+
+    def _rows(self, kind: str, **filters):
+        model, column, folded_column, _, code = KINDS[kind]
+        rows = model.objects.filter(**filters).values_list(
+            "id", column, folded_column or column
+        )
+        for object_id, text, folded in rows.iterator():
+            if not folded_column:
+                folded = fold_text(text)
+            yield f"{code}{object_id}", text, folded
+
+    def _load(self, rows) -> None:
+        """Replace the contents with `(ref, text, folded)` rows."""
+        labels = {}
+        starts = []
+        words = []
+        for ref, text, folded in rows:
+            labels[ref] = (text, folded)
+            start, keys = self._keys(ref, folded)
+            starts.append(start)
+            words.extend(keys)
+        starts.sort()
+        words.sort()
+        self._starts, self._words, self._labels = starts, words, labels
+
+    def _build(self) -> None:
+        self._watermark = timezone.now()
+        self._load(row for kind in KINDS for row in self._rows(kind))
+
+    def _apply_changes(self) -> bool:
+        """Apply the rows changed since the last refresh. False if too many."""
+        since = self._watermark - REFRESH_OVERLAP
+        watermark = timezone.now()
+
+        deleted = list(
+            Tombstone.objects.filter(deleted_at__gte=since).values_list(
+                "kind", "object_id"
+            )[: MAX_DELTA + 1]
+        )
+        changed = []
+        for kind in KINDS:
+            changed.extend(self._rows(kind, updated_at__gte=since))
+            if len(deleted) + len(changed) > MAX_DELTA:
+                return False
+
+        for tombstone, object_id in deleted:
+            if tombstone in _TOMBSTONE_CODES:
+                self._remove(f"{_TOMBSTONE_CODES[tombstone]}{object_id}")
+        for ref, text, folded in changed:
+            if self._labels.get(ref) != (text, folded):
+                self._remove(ref)
+                self._add(ref, text, folded)
+        self._watermark = watermark
+        return True
+
+    def refresh(self, force: bool = False) -> None:
+        """Bring the index up to date, unless it was checked very recently."""
+        if (
+            not force
+            and time.monotonic() - self._checked_at < settings.SUGGEST_REFRESH_INTERVAL
+        ):
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._watermark is None or not self._apply_changes():
+                self._build()
+
+    def suggest(self, query: str, limit: int) -> list[dict]:
+        """
+        Return up to `limit` titles and names with a word starting with `query`.
+
+        Texts that start with the query come first, then texts with a later word
+        starting with it, each in alphabetical order.
+        """
+        prefix = fold_text(query)[:KEY_LENGTH]
+        if not prefix:
+            return []
+
+        refs: dict[str, None] = {}  # Ordered set
+        with self._lock:
+            for entries in (self._starts, self._words):
+                start = bisect.bisect_left(entries, prefix)
+                # Several words of a text can match; bounded in case many do
+                for entry in entries[start : start + SCAN_LIMIT]:
+                    if len(refs) == limit or not entry.startswith(prefix):
+                        break
+                    refs[entry.rpartition("\0")[2]] = None
+
+            return [
+                {
+                    "type": _CODES[ref[0]],
+                    "id": int(ref[1:]),
+                    "text": self._labels[ref][0],
+                }
+                for ref in refs
+            ]
+
+    def stats(self) -> dict:
+        """Size of the index, with its approximate memory use in bytes."""
+        with self._lock:
+            size = sys.getsizeof(self._labels)
+            for entries in (self._starts, self._words):
+                size += sys.getsizeof(entries)
+                size += sum(sys.getsizeof(entry) for entry in entries)
+            for ref, (text, folded) in self._labels.items():
+                size += sys.getsizeof(ref) + sys.getsizeof((text, folded))
+                size += sys.getsizeof(text) + sys.getsizeof(folded)
+            return {
+                "entries": len(self._starts) + len(self._words),
+                "items": len(self._labels),
+                "bytes": size,
+            }
+
+
+index = PrefixIndex()
+
+
+def suggest(query: str, limit: int) -> list[dict]:
+    index.refresh()
+    return index.suggest(query, limit)
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+
+from django.db.models import F, Prefetch, QuerySet
+from django.utils import timezone
+
+from .models import Author, Book, Borrow, Genre, Tombstone
+from .utils import cursor_paginate, decode_cursor, encode_cursor
+
+
+def _books() -> QuerySet:
+    return Book.objects.prefetch_related(
+        Prefetch("genres", queryset=Genre.objects.only("id"))
+    )
+
+
+def _book_row(book: Book) -> dict:
+    return {
+        "id": book.id,
+        "title": book.title,
+        "authorId": book.author_id,
+        "genreIds": [genre.id for genre in book.genres.all()],
+        "dateAdded": book.date_added.isoformat(),
+        "allowBorrow": book.allow_borrow,
+        "updatedAt": book.updated_at.isoformat(),
+    }
+
+
+def _named_row(obj: Author | Genre) -> dict:
+    return {"id": obj.id, "name": obj.name, "updatedAt": obj.updated_at.isoformat()}
+
+
+def _borrow_row(borrow: Borrow) -> dict:
+    return {
+        "id": borrow.id,
+        "bookId": borrow.book_id,
+        "borrowerName": borrow.borrower_name,
+        "isBorrowed": borrow.is_borrowed,
+        "borrowedDate": borrow.borrowed_date.isoformat(),
+        "returnedDate": (
+            borrow.returned_date.isoformat() if borrow.returned_date else None
+        ),
+        "updatedAt": borrow.updated_at.isoformat(),
+    }
+
+
+# Streams in token order, each walked by (updated_at, id); tombstones come last
+STREAMS = {
+    "books": (_books, _book_row),
+    "authors": (Author.objects.all, _named_row),
+    "genres": (Genre.objects.all, _named_row),
+    "borrows": (Borrow.objects.all, _borrow_row),
+}
+
+# `updated_at` is taken before a write waits for the SQLite write lock (up to
+# its 20s busy timeout), so a row can commit with a timestamp older than rows
+# already synced. The settled position of a token never passes rows changed
+# less than this long ago; newer rows are sent from a separate fresh position
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def _is_position(value) -> bool:
+    return (
+        isinstance(value, list)
+        and len(value) == 2
+        and isinstance(value[0], str)
+        and isinstance(value[1], int)
+    )
+
+
+def decode_token(token: str | None) -> list:
+    """
+    Decode a sync token into one `[settled, fresh]` pair per stream, followed
+    by the pair of the tombstones. Each is a `[timestamp, id]` position or None.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    if not token:
+        return [[None, None] for _ in range(len(STREAMS) + 1)]
+
+    positions = decode_cursor(token)
+    if len(positions) != len(STREAMS) + 1:
+        raise ValueError("Invalid sync token")
+
+    pairs = []
+    for position in positions:
+        # Tokens issued before fresh positions hold the settled one only
+        if position is None or _is_position(position):
+            position = [position, None]
+        if not (
+            isinstance(position, list)
+            and len(position) == 2
+            and all(value is None or _is_position(value) for value in position)
+        ):
+            raise ValueError("Invalid sync token")
+        pairs.append(position)
+    return pairs
+
+
+def _walk(
+    queryset: QuerySet, field: str, pair: list, limit: int, horizon: datetime
+) -> tuple[list, bool]:
+    """
+    Read up to `limit` rows after the `[settled, fresh]` positions of a stream,
+    updating them in place. Returns the rows and whether there are more.
+
+    Rows changed before `horizon` are read first, from the settled position.
+    Once those are exhausted, the newer ones are read from the fresh position;
+    they come again, once, when they settle, which is what lets the settled
+    position pick up rows that committed late.
+    """
+    settled, fresh = pair
+    rows, next_cursor = cursor_paginate(
+        queryset.filter(**{f"{field}__lt": horizon}),
+        field,
+        encode_cursor(settled) if settled else None,
+        limit,
+    )
+    if rows:
+        pair[0] = [getattr(rows[-1], field).isoformat(), rows[-1].id]
+    if next_cursor is not None:
+        return rows, True
+
+    start = max(
+        (position for position in (fresh, [horizon.isoformat(), 0]) if position),
+        key=lambda position: (datetime.fromisoformat(position[0]), position[1]),
+    )
+    fresh_rows, next_cursor = cursor_paginate(
+        queryset, field, encode_cursor(start), limit
+    )
+    if fresh_rows:
+        pair[1] = [getattr(fresh_rows[-1], field).isoformat(), fresh_rows[-1].id]
+    return rows + fresh_rows, next_cursor is not None
+
+
+def sync_page(token: str | None, limit: int) -> dict:
+    """
+    Return what changed since `token`: up to `limit` changed rows per stream and
+    up to `limit` deletions, with the token to pass on the next call.
+
+    Each stream is walked in (updated_at, id) order through its index, so a
+    delta costs as much as the rows it returns. Clients apply the changed rows
+    first and the deletions last, and keep calling while `hasMore` is true.
+    Rows changed in the last `SYNC_OVERLAP` can be sent twice, so clients
+    apply them as upserts. Borrows of a deleted book are deleted with it.
+
+    Args:
+        token (str | None): The token of the previous call, or None for a full
+                            sync.
+        limit (int): The page size.
+
+    Returns:
+        dict: `books`, `authors`, `genres`, `borrows`, `deleted` (ids per
+              kind), `token` and `hasMore`.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    pairs = decode_token(token)
+    horizon = timezone.now() - SYNC_OVERLAP
+    result: dict = {}
+    has_more = False
+
+    for index, (stream, (queryset, render)) in enumerate(STREAMS.items()):
+        rows, more = _walk(queryset(), "updated_at", pairs[index], limit, horizon)
+        result[stream] = [render(row) for row in rows]
+        has_more = has_more or more
+
+    tombstones, more = _walk(
+        Tombstone.objects.all(), "deleted_at", pairs[-1], limit, horizon
+    )
+    deleted: dict = {kind: [] for kind, _ in Tombstone.KIND_CHOICES}
+    for tombstone in tombstones:
+        deleted[tombstone.kind].append(tombstone.object_id)
+    result["deleted"] = deleted
+    has_more = has_more or more
+
+    result["token"] = encode_cursor(pairs)
+    result["hasMore"] = has_more
+    return result
+
+
+def record_tombstone(sender, instance, **kwargs) -> None:
+    """`post_delete` receiver for Book, Author and Genre."""
+    kind = {Book: Tombstone.BOOK, Author: Tombstone.AUTHOR, Genre: Tombstone.GENRE}
+    Tombstone.objects.create(kind=kind[sender], object_id=instance.pk)
+
+
+def touch_books_on_genre_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+) -> None:
+    """
+    `m2m_changed` receiver for `Book.genres`: a book whose genres change is a
+    changed book, but changing a many-to-many relation doesn't save it.
+    """
+    if action == "pre_clear":
+        # pk_set isn't provided for clears, so find the books before they go
+        book_ids = (
+            [instance.pk]
+            if not reverse
+            else list(instance.book_set.values_list("id", flat=True))
+        )
+    elif action in ("post_add", "post_remove"):
+        book_ids = [instance.pk] if not reverse else list(pk_set)
+    else:
+        return
+
+    _touch_books(Book.objects.filter(pk__in=book_ids))
+
+
+def touch_books_on_delete(sender, instance, **kwargs) -> None:
+    """
+    `pre_delete` receiver for Author and Genre: deleting one sets its books to
+    no author, or takes the genre off them, without saving them.
+    """
+    if sender is Author:
+        books = Book.objects.filter(author=instance)
+    else:
+        books = Book.objects.filter(genres=instance)
+    _touch_books(books)
+
+
+def _touch_books(books: QuerySet) -> None:
+    books.update(updated_at=timezone.now(), version=F("version") + 1)
@@ -1,14 +1,50 @@
+import asyncio
+import gzip
 import json
+import re
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import ExitStack
 from datetime import timedelta
-
-from django.test import Client, TestCase
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends import cached_db
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, ConnectionHandler, connection
+from django.db.models import F
+from django.test import (Client, RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from frontend import views as frontend_views
+
+from . import (analytics, audit, auth_cache, bitmaps, bulk, columnar,
+               compression, events, fuzzy, responses, suggest, sync, views,
+               warmup)
+from .auth_cache import get_cached_user, user_cache_key
+from .cache import LRUCache, TieredCache
+from .fuzzy import trigrams
+from .management.commands.prestart import (STATIC_STAMP, pending_migrations,
+                                           static_sources_hash)
 # Import models from your app (replace 'library_api' if needed)
-from .models import Author, Book, Borrow, Genre
+from .models import (Author, Book, Borrow, Borrower, BulkJob, ChangeEvent,
+                     CirculationRollup, Genre, LoanDurationBucket, Log,
+                     SearchTrigram, Tombstone)
+from .querylog import SlowQueryLog, SlowQueryRecorder, normalize_sql, summarize
+from .text import fold_text, sort_key
 # Import utils from your app (replace 'library_api' if needed)
-from .utils import filter_books, paginate_books, sort_books
+from .utils import encode_cursor, filter_books, paginate_books, sort_books
 
 
 # --- Test Data Setup Helper Functions ---
@@ -62,8 +98,64 @@ def create_borrow(
     return borrow
 
 
+# --- Base Test Cases ---
+# Tests run on in-memory caches, never on the on-disk cache of a running server
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-default",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-shared",
+    },
+    "tiered": {
+        "BACKEND": "api.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {"LOCAL_TIMEOUT": 5},
+    },
+}
+
+
+class ApiTestMixin:
+    """
+    Empties the caches before each test and logs the client in as `self.user`,
+    a librarian unless the class creates its own, and drops the audit entries
+    a test left buffered. Set `login` to False for tests that don't need a
+    user.
+    """
+
+    login = True
+
+    def setUp(self):
+        super().setUp()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        if self.login:
+            if not hasattr(self, "user"):
+                self.user = User.objects.create_user("librarian")
+            self.client.force_login(self.user)
+
+    def tearDown(self):
+        # Entries left behind would be written to the next test's database
+        audit.buffer.clear()
+        super().tearDown()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTestCase(ApiTestMixin, TestCase):
+    pass
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTransactionTestCase(ApiTestMixin, TransactionTestCase):
+    pass
+
+
 # --- Tests for Utility Functions ---
-class UtilsTests(TestCase):
+class UtilsTests(ApiTestCase):
+    login = False
+
     @classmethod
     def setUpTestData(cls):
         cls.author1 = create_author("Author One")
@@ -336,7 +428,9 @@ class UtilsTests(TestCase):
 
 
 # --- Tests for View Functions ---
-class ViewsTests(TestCase):
+class ViewsTests(ApiTestCase):
+    login = False
+
     @classmethod
     def setUpTestData(cls):
         cls.client = Client()
@@ -992,3 +1086,2305 @@ class ViewsTests(TestCase):
         url = reverse("delete_book", args=[self.book1.id])
         response = self.client.post(url)  # Use POST instead of DELETE
         self.assertEqual(response.status_code, 405)
+
+
+# --- Tests for the Slow Query Log ---
+class SlowQueryLogTests(ApiTestCase):
+    login = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        cls.book = create_book("Slow Book")
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.log_file = Path(self.tmp_dir.name) / "slow_queries.log"
+
+    def test_normalize_sql(self):
+        """Literals, placeholders and IN lists are collapsed."""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s)  AND c=3"),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) AND c=?",
+        )
+
+    def test_recorder_captures_slow_queries_with_plan(self):
+        """Queries above the threshold are written with their view and plan."""
+        log = SlowQueryLog(self.log_file, max_bytes=1024 * 1024, backup_count=1)
+        request = Client().get("/").wsgi_request
+        recorder = SlowQueryRecorder(request, threshold_ms=0, log=log)
+
+        with connection.execute_wrapper(recorder):
+            list(Book.objects.filter(title="Slow Book"))
+        log.flush()
+
+        entries = log.read()
+        self.assertEqual(len(entries), 1)
+        self.assertIn("api_book", entries[0]["sql"])
+        self.assertEqual(entries[0]["params"], ["Slow Book"])
+        self.assertTrue(entries[0]["plan"])
+        self.assertNotIn("EXPLAIN failed", entries[0]["plan"][0])
+
+    def test_log_rotation(self):
+        """The log rotates once it exceeds its size limit."""
+        log = SlowQueryLog(self.log_file, max_bytes=200, backup_count=2)
+        entry = {
+            "datetime": "2025-01-01T00:00:00",
+            "sql": "UPDATE t SET a = 1",
+            "durationMs": 1.0,
+        }
+        for _ in range(5):
+            log._write(dict(entry))
+
+        self.assertEqual(len(log.files()), 3)
+        self.assertLessEqual(self.log_file.stat().st_size, 200)
+
+    def test_summarize_groups_by_shape(self):
+        """Entries differing only in parameters are aggregated together."""
+        entries = [
+            {
+                "datetime": "t1",
+                "sql": "SELECT 1 WHERE a = 5",
+                "durationMs": 10.0,
+                "view": "get_books",
+            },
+            {
+                "datetime": "t2",
+                "sql": "SELECT 1 WHERE a = 7",
+                "durationMs": 30.0,
+                "view": "get_book",
+            },
+            {"datetime": "t3", "sql": "DELETE FROM t", "durationMs": 5.0},
+        ]
+        shapes = summarize(entries)
+        self.assertEqual(len(shapes), 2)
+        self.assertEqual(shapes[0]["count"], 2)
+        self.assertEqual(shapes[0]["totalMs"], 40.0)
+        self.assertEqual(shapes[0]["maxMs"], 30.0)
+        self.assertEqual(shapes[0]["views"], ["get_book", "get_books"])
+
+    def test_slow_queries_view_requires_staff(self):
+        """Only staff members can read the slow query summary."""
+        response = self.client.get(reverse("slow_queries"))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.staff)
+        with override_settings(SLOW_QUERY_LOG_FILE=self.log_file):
+            response = self.client.get(reverse("slow_queries"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["totalEntries"], 0)
+
+
+# --- Tests for the Audit Log ---
+@override_settings(AUDIT_LOG_BATCH_SIZE=100, AUDIT_LOG_FLUSH_INTERVAL=3600)
+class AuditLogTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian", password="pw")
+        cls.staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        cls.book = create_book("Audited Book")
+
+    def test_writes_are_buffered_then_flushed(self):
+        """Write views queue entries instead of writing them immediately."""
+        response = self.client.put(
+            reverse("borrow_book", args=[self.book.id]),
+            data=json.dumps({"borrowerName": "Reader"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Log.objects.count(), 0)
+        self.assertEqual(len(audit.buffer), 1)
+
+        self.assertEqual(audit.flush(), 1)
+        entry = Log.objects.get()
+        self.assertEqual(entry.actor, "librarian")
+        self.assertEqual(entry.action, "book.borrow")
+        self.assertEqual(entry.book_id, self.book.id)
+        self.assertEqual(entry.payload["borrowerName"], "Reader")
+
+    def test_buffer_flushes_when_batch_is_full(self):
+        """A full batch is written in one go when the request finishes."""
+        with override_settings(AUDIT_LOG_BATCH_SIZE=2):
+            for name in ["First", "Second"]:
+                self.client.post(
+                    reverse("add_author"),
+                    data=json.dumps({"name": name}),
+                    content_type="application/json",
+                )
+        self.assertEqual(Log.objects.filter(action="author.create").count(), 2)
+        self.assertEqual(len(audit.buffer), 0)
+
+    def test_failed_flush_is_logged(self):
+        """Entries that can't be written end up in the server log."""
+        audit.record(None, "book.create", description="librarian: book.create")
+        with patch.object(Log.objects, "bulk_create", side_effect=OSError("disk")):
+            with self.assertLogs("api.audit", "ERROR") as logs:
+                self.assertEqual(audit.flush(), 0)
+        self.assertIn("librarian: book.create", logs.output[0])
+        self.assertEqual(len(audit.buffer), 0)
+
+    def test_log_is_append_only(self):
+        """Existing entries can be neither changed nor deleted."""
+        entry = Log.objects.create(action="book.update", description="x")
+        entry.description = "changed"
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_get_logs_cursor_pagination(self):
+        """Entries are returned newest first across cursor pages."""
+        now = timezone.now()
+        Log.objects.bulk_create(
+            [
+                Log(
+                    datetime=now - timedelta(minutes=i),
+                    action="book.update",
+                    book_id=i,
+                )
+                for i in range(5)
+            ]
+        )
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("get_logs"), {"limit": 3})
+        data = response.json()
+        self.assertEqual([e["bookId"] for e in data["logs"]], [0, 1, 2])
+        self.assertIsNotNone(data["nextCursor"])
+
+        response = self.client.get(
+            reverse("get_logs"), {"limit": 3, "cursor": data["nextCursor"]}
+        )
+        data = response.json()
+        self.assertEqual([e["bookId"] for e in data["logs"]], [3, 4])
+        self.assertIsNone(data["nextCursor"])
+
+    def test_get_logs_requires_staff(self):
+        """Non-staff users cannot read the audit log."""
+        response = self.client.get(reverse("get_logs"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_logs_invalid_cursor(self):
+        """A malformed cursor is rejected."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("get_logs"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune_logs_command(self):
+        """Entries older than the retention period are deleted in chunks."""
+        now = timezone.now()
+        Log.objects.bulk_create(
+            [Log(datetime=now - timedelta(days=100), action="old") for _ in range(5)]
+            + [Log(datetime=now, action="new")]
+        )
+        call_command("prune_logs", days=30, chunk_size=2, stdout=StringIO())
+        self.assertEqual(list(Log.objects.values_list("action", flat=True)), ["new"])
+
+
+# --- Tests for Borrow History ---
+class BorrowHistoryTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian", password="pw")
+        cls.book = create_book("Popular Book")
+        now = timezone.now()
+        for i in range(5):
+            create_borrow(
+                cls.book,
+                f"Reader {i}",
+                is_borrowed=False,
+                borrowed_date=now - timedelta(days=10 - i),
+                returned_date=now - timedelta(days=9 - i),
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("get_book_borrows", args=[self.book.id])
+
+    def test_history_cursor_pagination(self):
+        """Borrows are paged newest first, following nextCursor."""
+        data = self.client.get(self.url, {"limit": 2}).json()
+        names = [b["borrowerName"] for b in data["borrows"]]
+        while data["nextCursor"]:
+            data = self.client.get(
+                self.url, {"limit": 2, "cursor": data["nextCursor"]}
+            ).json()
+            names += [b["borrowerName"] for b in data["borrows"]]
+
+        self.assertEqual(names, [f"Reader {i}" for i in range(4, -1, -1)])
+
+    def test_history_ascending(self):
+        """order=asc returns the oldest borrows first."""
+        data = self.client.get(self.url, {"order": "asc", "limit": 1}).json()
+        self.assertEqual(data["borrows"][0]["borrowerName"], "Reader 0")
+
+    def test_history_not_found(self):
+        """An unknown book returns 404."""
+        response = self.client.get(reverse("get_book_borrows", args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_counters_maintained_by_borrow_and_return(self):
+        """Borrowing and returning update the stats without a history scan."""
+        self.client.put(
+            reverse("borrow_book", args=[self.book.id]),
+            data=json.dumps({"borrowerName": "Counter"}),
+            content_type="application/json",
+        )
+        self.client.put(reverse("unborrow_book", args=[self.book.id]))
+
+        # Session, book, one page; the user is cached by the earlier requests
+        with self.assertNumQueries(3):
+            stats = self.client.get(self.url).json()["stats"]
+        self.assertEqual(stats["timesBorrowed"], 1)
+        self.assertEqual(stats["timesReturned"], 1)
+        self.assertIsNotNone(stats["averageLoanSeconds"])
+
+
+# --- Tests for Borrowers ---
+class BorrowerTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian", password="pw")
+        cls.book1 = create_book("First Loan")
+        cls.book2 = create_book("Second Loan")
+        cls.book3 = create_book("Returned Loan")
+        create_borrow(cls.book1, "Jane Doe")
+        create_borrow(cls.book2, "  jane   DOE ")
+        create_borrow(
+            cls.book3, "Jane Doe", is_borrowed=False, returned_date=timezone.now()
+        )
+        create_borrow(create_book("Other Loan"), "Janet Smith")
+
+    def test_borrows_share_normalized_borrower(self):
+        """Different spellings of a name are linked to one borrower."""
+        self.assertEqual(Borrower.objects.count(), 2)
+        jane = Borrower.objects.get(normalized_name="jane doe")
+        self.assertEqual(jane.name, "Jane Doe")
+        self.assertEqual(jane.borrows.count(), 3)
+
+    def test_get_borrowers_prefix_search_with_holds(self):
+        """Prefix search returns borrowers with their current holds only."""
+        response = self.client.get(reverse("get_borrowers"), {"q": "JANE  d"})
+        self.assertEqual(response.status_code, 200)
+        borrowers = response.json()["borrowers"]
+        self.assertEqual([b["name"] for b in borrowers], ["Jane Doe"])
+        self.assertEqual(
+            [h["title"] for h in borrowers[0]["holds"]], ["First Loan", "Second Loan"]
+        )
+
+        response = self.client.get(reverse("get_borrowers"), {"q": "jan"})
+        self.assertEqual(len(response.json()["borrowers"]), 2)
+
+    def test_get_borrowers_without_holds(self):
+        """holds=false skips the holds lookup."""
+        response = self.client.get(
+            reverse("get_borrowers"), {"q": "janet", "holds": "false"}
+        )
+        self.assertNotIn("holds", response.json()["borrowers"][0])
+
+    def test_prefix_lookup_uses_index(self):
+        """The prefix search is answered from the normalized name index."""
+        plan = Borrower.objects.filter(
+            normalized_name__gte="jan", normalized_name__lt="jan\U0010ffff"
+        ).explain()
+        self.assertIn("USING", plan)
+        self.assertIn("INDEX", plan)
+
+    def test_filter_books_by_normalized_borrower(self):
+        """Borrower search ignores case and extra whitespace."""
+        filters = {"query": "JANE   doe", "search_scope": "borrower"}
+        filtered_qs = filter_books(Book.objects.all(), filters)
+        self.assertEqual(set(filtered_qs), {self.book1, self.book2, self.book3})
+
+
+# --- Tests for Circulation Analytics ---
+class AnalyticsTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian", password="pw")
+        cls.author = create_author("Prolific Author")
+        cls.genre = create_genre("Mystery")
+        cls.book1 = create_book("Hot Book", author=cls.author, genres=[cls.genre])
+        cls.book2 = create_book("Quiet Book")
+
+    def borrow_and_return(self, book, times=1):
+        for _ in range(times):
+            self.client.put(
+                reverse("borrow_book", args=[book.id]),
+                data=json.dumps({"borrowerName": "Reader"}),
+                content_type="application/json",
+            )
+            self.client.put(reverse("unborrow_book", args=[book.id]))
+
+    def test_borrow_and_return_update_rollups(self):
+        """Loans are counted per day for the total, book, author and genre."""
+        self.borrow_and_return(self.book1, times=2)
+
+        today = timezone.localdate()
+        for dimension, key in [
+            (CirculationRollup.TOTAL, 0),
+            (CirculationRollup.BOOK, self.book1.id),
+            (CirculationRollup.AUTHOR, self.author.id),
+            (CirculationRollup.GENRE, self.genre.id),
+        ]:
+            rollup = CirculationRollup.objects.get(
+                date=today, dimension=dimension, key=key
+            )
+            self.assertEqual((rollup.loans, rollup.returns), (2, 2))
+        self.assertEqual(LoanDurationBucket.objects.get(bucket=0).count, 2)
+
+    def test_analytics_endpoint(self):
+        """The endpoint reports daily loans and top lists from the rollups."""
+        self.borrow_and_return(self.book1, times=3)
+        self.borrow_and_return(self.book2)
+
+        response = self.client.get(reverse("analytics"), {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["totals"]["loans"], 4)
+        self.assertEqual(data["loansPerDay"][0]["loans"], 4)
+        self.assertEqual(
+            [(b["name"], b["loans"]) for b in data["topBooks"]],
+            [("Hot Book", 3), ("Quiet Book", 1)],
+        )
+        self.assertEqual(data["topGenres"][0]["name"], "Mystery")
+        self.assertEqual(data["topAuthors"][0]["loans"], 3)
+        self.assertIn("p50", data["loanDuration"])
+
+    def test_analytics_invalid_params(self):
+        """Out of range windows are rejected."""
+        response = self.client.get(reverse("analytics"), {"days": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_percentiles_from_histogram(self):
+        """Percentiles are read from the cumulative bucket counts."""
+        histogram = {
+            analytics.duration_bucket(3600): 90,
+            analytics.duration_bucket(86400): 10,
+        }
+        result = analytics.percentiles(histogram, [50, 95])
+        self.assertAlmostEqual(result["p50"], 3600, delta=3600 * 0.2)
+        self.assertAlmostEqual(result["p95"], 86400, delta=86400 * 0.2)
+
+    def test_refresh_analytics_matches_incremental(self):
+        """Rebuilding from history gives the same rollups as the live updates."""
+        self.borrow_and_return(self.book1, times=2)
+        self.borrow_and_return(self.book2)
+        fields = ("date", "dimension", "key", "loans", "returns")
+        live = set(CirculationRollup.objects.values_list(*fields))
+
+        call_command("refresh_analytics", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(set(CirculationRollup.objects.values_list(*fields)), live)
+        self.assertEqual(LoanDurationBucket.objects.get(bucket=0).count, 3)
+
+
+# --- Tests for the Session and Auth Fast Path ---
+class AuthCacheTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian", password="old-password")
+        create_author("Some Author")
+
+    def setUp(self):
+        super().setUp()
+        self.user_cache = caches[settings.AUTH_USER_CACHE_ALIAS]
+
+    def test_user_is_cached_between_requests(self):
+        """Only the first request reads auth_user."""
+        with self.assertNumQueries(3):  # session, user, authors
+            self.client.get(reverse("get_authors"))
+        with self.assertNumQueries(2):  # session, authors
+            response = self.client.get(reverse("get_authors"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_invalidates_cached_user(self):
+        """Logging out drops the cached user."""
+        self.client.get(reverse("get_authors"))
+        self.assertIsNotNone(self.user_cache.get(user_cache_key(self.user.pk)))
+
+        self.client.post(reverse("logout"))
+        self.assertIsNone(self.user_cache.get(user_cache_key(self.user.pk)))
+        response = self.client.get(reverse("get_authors"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_cache_holds_no_password(self):
+        """Only a small record of the user is cached, without its password."""
+        self.client.get(reverse("get_authors"))
+
+        record = self.user_cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn("password", record)
+        self.assertNotIn(self.user.password, repr(record))
+        self.assertEqual(record["username"], "librarian")
+        self.assertEqual(record["auth_hash"], self.user.get_session_auth_hash())
+
+    def test_cached_user_is_usable(self):
+        """A user rebuilt from the cache reads and saves like a loaded one."""
+        User.objects.filter(pk=self.user.pk).update(email="librarian@example.com")
+        self.client.get(reverse("get_authors"))
+
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        with self.assertNumQueries(1):  # session
+            user = get_cached_user(request)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.username, "librarian")
+            self.assertTrue(user.is_active)
+            self.assertFalse(user.is_staff)
+
+        # Deferred fields load on access and are left alone by save()
+        self.assertEqual(user.email, "librarian@example.com")
+        user = get_cached_user(request)
+        user.is_staff = True
+        user.save()
+        saved = User.objects.get(pk=self.user.pk)
+        self.assertTrue(saved.is_staff)
+        self.assertEqual(saved.email, "librarian@example.com")
+        self.assertTrue(saved.check_password("old-password"))
+
+    def test_password_change_invalidates_sessions(self):
+        """After a password change the old session is no longer accepted."""
+        self.client.get(reverse("get_authors"))
+
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("new-password")
+        user.save()
+
+        response = self.client.get(reverse("get_authors"))
+        self.assertEqual(response.status_code, 302)
+
+    def as_worker(self, tiered: TieredCache):
+        """Serve the "tiered" alias from one worker's own in-process tier."""
+        worker_caches = {alias: caches[alias] for alias in settings.CACHES}
+        worker_caches["tiered"] = tiered
+        stack = ExitStack()
+        stack.enter_context(patch.object(auth_cache, "caches", worker_caches))
+        stack.enter_context(patch.object(cached_db, "caches", worker_caches))
+        return stack
+
+    def test_invalidation_reaches_other_workers(self):
+        """A user deactivated on one worker is logged out on all of them."""
+        worker_a, worker_b = (
+            TieredCache("shared", {"OPTIONS": {"LOCAL_TIMEOUT": 60}}) for _ in range(2)
+        )
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+
+        with self.as_worker(worker_a):
+            self.assertTrue(get_cached_user(request).is_authenticated)
+        with self.as_worker(worker_b):
+            self.user.is_active = False
+            self.user.save()
+        with self.as_worker(worker_a):
+            self.assertFalse(get_cached_user(request).is_authenticated)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_logout_reaches_other_workers(self):
+        """A session ended on one worker is gone on all of them."""
+        worker_a, worker_b = (
+            TieredCache("shared", {"OPTIONS": {"LOCAL_TIMEOUT": 60}}) for _ in range(2)
+        )
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+
+        with self.as_worker(worker_a):
+            self.assertIn(SESSION_KEY, cached_db.SessionStore(session_key).load())
+        with self.as_worker(worker_b):
+            cached_db.SessionStore(session_key).flush()
+        with self.as_worker(worker_a):
+            self.assertEqual(cached_db.SessionStore(session_key).load(), {})
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions_touch_no_auth_tables(self):
+        """With signed cookies and a warm user cache only catalog data is read."""
+        self.client.force_login(self.user)
+        self.client.get(reverse("get_authors"))
+        with self.assertNumQueries(1):  # authors
+            response = self.client.get(reverse("get_authors"))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tiered-test-shared",
+        },
+    }
+)
+class TieredCacheTests(ApiTestCase):
+    login = False
+
+    def setUp(self):
+        super().setUp()
+        self.cache = TieredCache("shared", {"OPTIONS": {"LOCAL_TIMEOUT": 60}})
+
+    def test_reads_fill_the_local_tier(self):
+        """A value found in the shared tier is then served locally."""
+        caches["shared"].set("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+
+        caches["shared"].delete("key")
+        self.assertEqual(self.cache.get("key"), "value")
+
+    def test_writes_and_deletes_reach_both_tiers(self):
+        """set and delete apply to the shared tier as well."""
+        self.cache.set("key", "value")
+        self.assertEqual(caches["shared"].get("key"), "value")
+
+        self.cache.delete("key")
+        self.assertIsNone(caches["shared"].get("key"))
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_lru_statistics(self):
+        """The in-process tier is a bounded LRU that counts what it does."""
+        lru = LRUCache(2)
+        lru.set("a", 1, None)
+        lru.set("b", 2, None)
+        self.assertEqual(lru.get("a"), 1)
+        lru.set("c", 3, None)  # Evicts "b", the least recently used
+        self.assertIsNone(lru.get("b"))
+        lru.set("d", 4, -1)  # Already expired
+        self.assertIsNone(lru.get("d"))
+        self.assertEqual(
+            lru.stats(),
+            {"entries": 1, "maxEntries": 2, "hits": 1, "misses": 2, "evictions": 2},
+        )
+
+        self.cache.set("key", "value")
+        self.cache.get("key")
+        self.cache.get("missing")
+        stats = self.cache.stats()
+        self.assertEqual(stats["local"]["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+
+@override_settings(READ_CACHE_TIMEOUT=60)
+class ReadCacheTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_author("Terry Pratchett")
+        cls.book = create_book(title="Mort", author=cls.author)
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def test_hits_until_a_write(self):
+        first = self.get("get_books", q="mort")
+        self.assertEqual(first["X-Cache"], "miss")
+
+        # Session and catalog version only
+        with self.assertNumQueries(2):
+            second = self.get("get_books", q="mort")
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.get("get_books", q="MORT")["X-Cache"], "miss")
+
+        self.client.put(
+            reverse("edit_book", args=[self.book.id]),
+            data=json.dumps({"title": "Mort (Discworld)"}),
+            content_type="application/json",
+        )
+        third = self.get("get_books", q="mort")
+        self.assertEqual(third["X-Cache"], "miss")
+        self.assertEqual(third.json()["books"][0]["title"], "Mort (Discworld)")
+
+    def test_writes_of_other_workers(self):
+        """Anything that emits a change event invalidates every worker's copy."""
+        self.get("get_book", self.book.id)
+        self.assertEqual(self.get("get_book", self.book.id)["X-Cache"], "hit")
+
+        Book.objects.filter(pk=self.book.id).update(title="Reaper Man")
+        events.emit(events.BOOK_UPDATED, self.book.id)
+        response = self.get("get_book", self.book.id)
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertEqual(response.json()["book"]["title"], "Reaper Man")
+
+        # Headers are kept
+        response = self.get("get_book", self.book.id, fields="id,version")
+        cached = self.get("get_book", self.book.id, fields="id,version")
+        self.assertEqual(cached["X-Cache"], "hit")
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_new_authors_and_genres_are_seen(self):
+        self.get("get_authors")
+        self.client.post(
+            reverse("add_author"),
+            data=json.dumps({"name": "Neil Gaiman"}),
+            content_type="application/json",
+        )
+        response = self.get("get_authors")
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertIn("Neil Gaiman", [a["name"] for a in response.json()["authors"]])
+        self.assertTrue(ChangeEvent.objects.filter(type=events.AUTHOR_CREATED).exists())
+
+    def test_errors_and_streams_are_not_cached(self):
+        self.get("get_book", 999999)
+        self.assertEqual(self.get("get_book", 999999)["X-Cache"], "miss")
+        self.get("get_books", mode="ids")
+        self.assertEqual(self.get("get_books", mode="ids")["X-Cache"], "miss")
+
+    @override_settings(READ_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.get("get_books")
+        self.assertNotIn("X-Cache", self.get("get_books"))
+
+    def test_stats_view(self):
+        self.get("get_books")
+        self.get("get_books")
+        self.assertEqual(self.client.get(reverse("cache_stats")).status_code, 302)
+
+        self.client.force_login(
+            User.objects.create_user("staff", password="pw", is_staff=True)
+        )
+        data = self.client.get(reverse("cache_stats")).json()
+        self.assertEqual(data["catalogVersion"], events.latest_id())
+        self.assertGreaterEqual(data["caches"]["tiered"]["local"]["hits"], 1)
+        self.assertEqual(data["caches"]["tiered"]["local"]["maxEntries"], 1000)
+
+
+# --- Tests for the API JSON Response ---
+class ApiJsonResponseTests(ApiTestCase):
+    data = {
+        "books": [{"id": 1, "title": "Café", "dateAdded": "2025-01-01T00:00:00"}],
+        "totalItems": 1,
+    }
+
+    @override_settings(API_JSON_ENCODER="stdlib")
+    def test_stdlib_encoder(self):
+        """The stdlib fallback produces compact JSON."""
+        response = responses.ApiJsonResponse(self.data)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), self.data)
+        self.assertNotIn(b", ", response.content)
+
+    @unittest.skipIf(responses.orjson is None, "orjson is not installed")
+    @override_settings(API_JSON_ENCODER="auto")
+    def test_orjson_encoder_matches_stdlib(self):
+        """orjson, when installed, encodes the same document."""
+        self.assertEqual(responses.get_encoder_name(), "orjson")
+        response = responses.ApiJsonResponse(self.data)
+        self.assertEqual(json.loads(response.content), self.data)
+
+    def test_non_dict_requires_safe_false(self):
+        """Like JsonResponse, non-dict payloads must be explicitly allowed."""
+        with self.assertRaises(TypeError):
+            responses.ApiJsonResponse([1, 2])
+        response = responses.ApiJsonResponse([1, 2], safe=False)
+        self.assertEqual(response.content, b"[1,2]")
+
+    def test_views_use_api_response(self):
+        """API views respond through ApiJsonResponse."""
+        response = self.client.get(reverse("get_genres"))
+        self.assertIsInstance(response, responses.ApiJsonResponse)
+
+
+class ApiCompressionTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Genre.objects.bulk_create(Genre(name=f"Genre number {i}") for i in range(100))
+
+    def test_gzip_negotiated(self):
+        """Large API responses are gzipped when the client asks for gzip."""
+        response = self.client.get(reverse("get_genres"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data["genres"]), 100)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Brotli wins over gzip when the client accepts both."""
+        response = self.client.get(
+            reverse("get_genres"), HTTP_ACCEPT_ENCODING="gzip, deflate, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        data = json.loads(compression.brotli.decompress(response.content))
+        self.assertEqual(len(data["genres"]), 100)
+
+    def test_not_accepted(self):
+        """Codings the client doesn't accept, or refuses with q=0, aren't used."""
+        for header in ["", "identity", "gzip;q=0, br;q=0", "*;q=0"]:
+            response = self.client.get(
+                reverse("get_genres"), HTTP_ACCEPT_ENCODING=header
+            )
+            self.assertFalse(response.has_header("Content-Encoding"), header)
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(len(json.loads(response.content)["genres"]), 100)
+
+    @override_settings(API_COMPRESSION_MIN_SIZE=1_000_000)
+    def test_small_response_untouched(self):
+        """Responses under the size threshold are sent as is."""
+        response = self.client.get(reverse("get_genres"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(compression.negotiate_encoding("gzip;q=0.5, *;q=0"), "gzip")
+        self.assertEqual(
+            compression.negotiate_encoding("*"), "br" if compression.brotli else "gzip"
+        )
+        self.assertIsNone(compression.negotiate_encoding("deflate"))
+
+    def test_compress_stream(self):
+        """Streamed chunks decompress back to the original body."""
+        chunks = [b'{"ids":[', b"1,2,3", b"]}"]
+        compressed = b"".join(compression.compress_stream(iter(chunks), "gzip"))
+        self.assertEqual(gzip.decompress(compressed), b"".join(chunks))
+
+
+class SparseFieldsetTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_author("Ursula K. Le Guin")
+        genre = create_genre("Fantasy")
+        for i in range(5):
+            create_book(title=f"Earthsea {i}", author=author, genres=[genre])
+        cls.book = Book.objects.get(title="Earthsea 0")
+        Borrow.objects.create(book=cls.book, borrower_name="Ged")
+
+    def setUp(self):
+        super().setUp()
+        # Warm the user cache so only the view's own queries are counted
+        self.client.get(reverse("get_authors"))
+
+    def test_all_fields_by_default(self):
+        """Without `fields` every book field is returned, without N+1 queries."""
+        # Session, count, page, genres, current borrows
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("get_books"), {"sort_by": "title"})
+        books = response.json()["books"]
+        self.assertEqual(len(books), 5)
+        self.assertEqual(
+            list(books[0]),
+            [
+                "id",
+                "title",
+                "author",
+                "dateAdded",
+                "genres",
+                "borrowerName",
+                "allowBorrow",
+            ],
+        )
+        self.assertEqual(books[0]["borrowerName"], "Ged")
+        self.assertEqual(books[0]["genres"][0]["name"], "Fantasy")
+        self.assertIsNone(books[1]["borrowerName"])
+
+    def test_sparse_fields_skip_lookups(self):
+        """Unrequested fields are left out of the output and the query plan."""
+        with self.assertNumQueries(3):  # session, count, page
+            response = self.client.get(
+                reverse("get_books"), {"fields": "id,title", "sort_by": "title"}
+            )
+        books = response.json()["books"]
+        self.assertEqual(books[0], {"id": self.book.id, "title": "Earthsea 0"})
+
+        with self.assertNumQueries(4):  # session, count, page, current borrows
+            response = self.client.get(
+                reverse("get_books"), {"fields": "borrowerName, id"}
+            )
+        self.assertIn(
+            {"id": self.book.id, "borrowerName": "Ged"}, response.json()["books"]
+        )
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("get_books"), {"fields": "id,isbn"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("isbn", response.json()["error"])
+
+    def test_get_book_fields(self):
+        url = reverse("get_book", args=[self.book.id])
+        with self.assertNumQueries(2):  # session, book
+            response = self.client.get(url, {"fields": "title,allowBorrow"})
+        self.assertEqual(
+            response.json()["book"], {"title": "Earthsea 0", "allowBorrow": True}
+        )
+
+        book = self.client.get(url, {"fields": "id,borrow"}).json()["book"]
+        self.assertEqual(book["borrow"]["borrowerName"], "Ged")
+        self.assertTrue(book["borrow"]["isCurrentlyBorrowed"])
+
+        full = self.client.get(url).json()["book"]
+        self.assertEqual(full["author"]["name"], "Ursula K. Le Guin")
+        self.assertEqual(len(full), 8)
+
+
+class BookIdsAndCountModeTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_author("Terry Pratchett")
+        cls.books = [
+            create_book(title=f"Discworld {i:02}", author=cls.author) for i in range(12)
+        ]
+        create_book(title="Unrelated")
+
+    def get(self, **params):
+        return self.client.get(reverse("get_books"), params)
+
+    def test_ids_mode_streams_ids(self):
+        response = self.get(
+            mode="ids", q="discworld", sort_by="title", sort_desc="true"
+        )
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["ids"], [book.id for book in reversed(self.books)])
+        self.assertEqual(data["currentPage"], 1)
+        self.assertFalse(data["hasNext"])
+
+    def test_ids_mode_pages(self):
+        pages = [
+            json.loads(
+                b"".join(
+                    self.get(
+                        mode="ids", q="discworld", pg_size=5, pg_num=n
+                    ).streaming_content
+                )
+            )
+            for n in (1, 2, 3)
+        ]
+        self.assertEqual([page["hasNext"] for page in pages], [True, True, False])
+        self.assertEqual(
+            [book_id for page in pages for book_id in page["ids"]],
+            [book.id for book in self.books],
+        )
+
+    def test_ids_mode_page_cap(self):
+        """The ids mode allows much larger pages than the books mode."""
+        self.assertEqual(self.get(mode="ids", pg_size=10000).status_code, 200)
+        self.assertEqual(self.get(mode="ids", pg_size=10001).status_code, 400)
+        self.assertEqual(self.get(pg_size=51).status_code, 400)
+
+    def test_count_mode(self):
+        response = self.get(mode="count", q="discworld")
+        self.assertEqual(response.json(), {"totalItems": 12, "cached": False})
+
+        create_book(title="Discworld 12", author=self.author)
+        # Cached counts may briefly lag behind writes
+        self.assertEqual(
+            self.get(mode="count", q="discworld").json(),
+            {"totalItems": 12, "cached": True},
+        )
+        self.assertEqual(
+            self.get(mode="count", q="discworld", exact="true").json(),
+            {"totalItems": 13, "cached": False},
+        )
+        self.assertEqual(
+            self.get(mode="count", filter_author=self.author.id).json()["totalItems"],
+            13,
+        )
+
+    def test_invalid_mode(self):
+        self.assertEqual(self.get(mode="everything").status_code, 400)
+
+
+@override_settings(
+    CHANGE_FEED_POLL_INTERVAL=0.01,
+    CHANGE_FEED_KEEPALIVE=60,
+    CHANGE_FEED_MAX_DURATION=0,
+)
+class ChangeFeedTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("librarian")
+        cls.genre = create_genre("Poetry")
+        cls.book = create_book(title="Leaves of Grass", genres=[cls.genre])
+
+    def parse(self, content: bytes) -> list[dict]:
+        messages = []
+        for block in content.decode().split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in block.splitlines() if ": " in line
+            )
+            if "data" in fields:
+                messages.append(
+                    {"event": fields["event"], **json.loads(fields["data"])}
+                )
+        return messages
+
+    def test_write_views_emit_events(self):
+        response = self.client.post(
+            reverse("add_book"),
+            data=json.dumps({"title": "Howl", "genres": [self.genre.id]}),
+            content_type="application/json",
+        )
+        book_id = response.json()["book_id"]
+        self.client.put(
+            reverse("borrow_book", args=[book_id]),
+            data=json.dumps({"borrowerName": "Allen"}),
+            content_type="application/json",
+        )
+        self.client.put(reverse("unborrow_book", args=[book_id]))
+        self.client.delete(reverse("delete_book", args=[book_id]))
+
+        changes = ChangeEvent.objects.order_by("id")
+        self.assertEqual(
+            [event.type for event in changes],
+            ["book.created", "book.borrowed", "book.returned", "book.deleted"],
+        )
+        self.assertEqual({event.book_id for event in changes}, {book_id})
+        created = changes[0].data["book"]
+        self.assertEqual(created["title"], "Howl")
+        self.assertEqual(created["genres"], [{"id": self.genre.id, "name": "Poetry"}])
+        self.assertEqual(changes[1].data["borrowerName"], "Allen")
+
+    def test_writes_and_events_commit_together(self):
+        """A write whose event can't be saved is rolled back with it."""
+        with patch.object(events, "emit", side_effect=RuntimeError("disk full")):
+            self.client.post(
+                reverse("add_book"),
+                data=json.dumps({"title": "Howl", "genres": [self.genre.id]}),
+                content_type="application/json",
+            )
+            self.client.put(
+                reverse("edit_book", args=[self.book.id]),
+                data=json.dumps({"title": "Song of Myself"}),
+                content_type="application/json",
+            )
+            self.client.delete(reverse("delete_book", args=[self.book.id]))
+
+        self.assertEqual(
+            list(Book.objects.values_list("title", flat=True)), ["Leaves of Grass"]
+        )
+
+        response = self.client.put(
+            reverse("edit_book", args=[self.book.id]),
+            data=json.dumps({"title": "Song of Myself"}),
+            content_type="application/json",
+        )
+        event = ChangeEvent.objects.get()
+        self.assertEqual(
+            event.data["book"]["version"], response.json()["book"]["version"]
+        )
+        self.assertEqual(event.data["book"]["title"], "Song of Myself")
+
+    def test_wsgi_stream_replays_from_last_event_id(self):
+        first = events.emit(events.BOOK_DELETED, 1)
+        events.emit(events.BOOK_BORROWED, self.book.id, {"borrowerName": "Walt"})
+
+        response = self.client.get(reverse("change_feed"), HTTP_LAST_EVENT_ID=first)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        content = b"".join(response.streaming_content)
+        self.assertTrue(content.startswith(b"retry: "))
+
+        messages = self.parse(content)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["event"], "book.borrowed")
+        self.assertEqual(messages[0]["bookId"], self.book.id)
+        self.assertEqual(messages[0]["data"], {"borrowerName": "Walt"})
+
+    def test_new_connection_starts_at_latest(self):
+        events.emit(events.BOOK_DELETED, 1)
+        response = self.client.get(reverse("change_feed"))
+        self.assertEqual(self.parse(b"".join(response.streaming_content)), [])
+
+    @override_settings(CHANGE_FEED_REPLAY_LIMIT=2)
+    def test_reset_when_too_far_behind(self):
+        for _ in range(3):
+            latest = events.emit(events.BOOK_DELETED, 1)
+        response = self.client.get(reverse("change_feed"), {"lastEventId": 0})
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(f"id: {latest}\nevent: reset", content)
+
+    def test_invalid_last_event_id(self):
+        response = self.client.get(reverse("change_feed"), HTTP_LAST_EVENT_ID="abc")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_stream_follows_broadcaster(self):
+        await self.async_client.aforce_login(self.user)
+        first = await sync_to_async(events.emit)(events.BOOK_DELETED, 1)
+        replayed = await sync_to_async(events.emit)(events.BOOK_DELETED, 2)
+
+        response = await self.async_client.get(
+            reverse("change_feed"), headers={"Last-Event-ID": str(first)}
+        )
+        content = aiter(response.streaming_content)
+
+        async def next_message() -> list[dict]:
+            return self.parse(await asyncio.wait_for(anext(content), 5))
+
+        self.assertEqual(await next_message(), [])  # retry
+        self.assertEqual((await next_message())[0]["id"], replayed)
+        self.assertEqual(len(events.broadcaster), 1)
+
+        pushed = await sync_to_async(events.emit)(
+            events.BOOK_RETURNED, self.book.id, {"borrowId": 1}
+        )
+        message = (await next_message())[0]
+        self.assertEqual(message["id"], pushed)
+        self.assertEqual(message["event"], "book.returned")
+
+    async def test_asgi_stream_unsubscribes_on_disconnect(self):
+        stream = events.astream(None)
+        await anext(stream)  # retry
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(events.broadcaster), 1)
+
+        # The ASGI handler cancels the response when the client disconnects
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(len(events.broadcaster), 0)
+
+
+class SyncTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_author("Jorge Luis Borges")
+        cls.genre = create_genre("Short Stories")
+        cls.books = [
+            create_book(title=title, author=cls.author, genres=[cls.genre])
+            for title in ["Ficciones", "El Aleph", "Labyrinths"]
+        ]
+
+    def sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get(reverse("sync"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_empty_delta(self):
+        data = self.sync()
+        self.assertEqual(
+            {book["title"] for book in data["books"]},
+            {"Ficciones", "El Aleph", "Labyrinths"},
+        )
+        self.assertEqual(data["books"][0]["genreIds"], [self.genre.id])
+        self.assertEqual(data["authors"][0]["name"], "Jorge Luis Borges")
+        self.assertFalse(data["hasMore"])
+
+        delta = self.sync(data["token"])
+        self.assertEqual(delta["books"], [])
+        self.assertEqual(delta["authors"], [])
+        self.assertEqual(delta["deleted"], {"book": [], "author": [], "genre": []})
+
+    def test_delta_contains_changes_and_tombstones(self):
+        token = self.sync()["token"]
+
+        self.client.put(
+            reverse("borrow_book", args=[self.books[0].id]),
+            data=json.dumps({"borrowerName": "Pierre Menard"}),
+            content_type="application/json",
+        )
+        self.client.delete(reverse("delete_book", args=[self.books[1].id]))
+        other_genre = create_genre("Fantasy")
+        self.books[2].genres.add(other_genre)
+
+        delta = self.sync(token)
+        self.assertEqual([book["id"] for book in delta["books"]], [self.books[2].id])
+        self.assertEqual(
+            sorted(delta["books"][0]["genreIds"]), [self.genre.id, other_genre.id]
+        )
+        self.assertEqual([genre["name"] for genre in delta["genres"]], ["Fantasy"])
+        self.assertEqual(delta["borrows"][0]["borrowerName"], "Pierre Menard")
+        self.assertEqual(delta["deleted"]["book"], [self.books[1].id])
+
+        self.assertEqual(self.sync(delta["token"])["deleted"]["book"], [])
+
+    def test_deleted_author_changes_its_books(self):
+        token = self.sync()["token"]
+        other = create_book(title="Other", author=create_author("Other Author"))
+        token = self.sync(token)["token"]
+
+        versions = dict(Book.objects.values_list("id", "version"))
+        author_id = self.author.id
+        self.author.delete()
+        delta = self.sync(token)
+        self.assertEqual(
+            {book["id"]: book["authorId"] for book in delta["books"]},
+            {book.id: None for book in self.books},
+        )
+        self.assertEqual(delta["deleted"]["author"], [author_id])
+        # Edits made against the old author are refused
+        self.assertEqual(
+            dict(Book.objects.values_list("id", "version")),
+            {
+                **{book.id: versions[book.id] + 1 for book in self.books},
+                other.id: versions[other.id],
+            },
+        )
+
+    def test_deleted_genre_changes_its_books(self):
+        self.books[0].genres.remove(self.genre)
+        token = self.sync()["token"]
+
+        genre_id = self.genre.id
+        self.genre.delete()
+        delta = self.sync(token)
+        self.assertEqual(
+            {book["id"]: book["genreIds"] for book in delta["books"]},
+            {book.id: [] for book in self.books[1:]},
+        )
+        self.assertEqual(delta["deleted"]["genre"], [genre_id])
+
+    def test_pages(self):
+        first = self.sync(limit=2)
+        self.assertEqual(len(first["books"]), 2)
+        self.assertTrue(first["hasMore"])
+
+        second = self.sync(first["token"], limit=2)
+        self.assertEqual(len(second["books"]), 1)
+        self.assertFalse(second["hasMore"])
+        self.assertEqual(
+            {book["id"] for book in first["books"] + second["books"]},
+            {book.id for book in self.books},
+        )
+
+    def test_late_commit_is_not_skipped(self):
+        """
+        A write whose timestamp is older than rows already synced (it waited
+        for the write lock) comes once it settles.
+        """
+        token = self.sync()["token"]
+        late = create_book(title="Tlön", author=self.author)
+        Book.objects.filter(pk=late.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=10)
+        )
+        self.assertEqual(self.sync(token)["books"], [])
+
+        later = timezone.now() + sync.SYNC_OVERLAP
+        with patch("api.sync.timezone.now", return_value=later):
+            delta = self.sync(token)
+            # Along with the rows sent before they settled
+            self.assertIn(late.id, [book["id"] for book in delta["books"]])
+            self.assertEqual(self.sync(delta["token"])["books"], [])
+
+    def test_token_without_fresh_positions(self):
+        data = self.sync(encode_cursor([None] * 5))
+        self.assertEqual(len(data["books"]), 3)
+
+    def test_invalid_token(self):
+        response = self.client.get(reverse("sync"), {"since": "not-a-token"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkEditTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.old_author = create_author("Old Author")
+        cls.new_author = create_author("New Author")
+        cls.fiction = create_genre("Fiction")
+        cls.reference = create_genre("Reference")
+        cls.books = [
+            create_book(title=f"Shelf {i}", author=cls.old_author, genres=[cls.fiction])
+            for i in range(4)
+        ]
+        Borrow.objects.create(book=cls.books[0], borrower_name="Reader")
+
+    def edit(self, body):
+        return self.client.put(
+            reverse("edit_books"),
+            data=json.dumps(body),
+            content_type="application/json",
+        )
+
+    def test_edit_by_ids(self):
+        ids = [book.id for book in self.books[1:3]]
+        response = self.edit(
+            {
+                "ids": ids + [999999],
+                "patch": {
+                    "author_id": self.new_author.id,
+                    "add_genre_ids": [self.reference.id],
+                    "remove_genre_ids": [self.fiction.id],
+                },
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["updated"], 2)
+        self.assertEqual(
+            data["results"],
+            [
+                {"id": ids[0], "status": "updated"},
+                {"id": ids[1], "status": "updated"},
+                {"id": 999999, "status": "not_found"},
+            ],
+        )
+
+        for book in Book.objects.filter(pk__in=ids):
+            self.assertEqual(book.author, self.new_author)
+            self.assertEqual(list(book.genres.all()), [self.reference])
+        # Untouched books keep their values
+        self.assertEqual(Book.objects.get(pk=self.books[3].pk).author, self.old_author)
+
+        event = ChangeEvent.objects.get(type=events.BOOKS_UPDATED)
+        self.assertEqual(event.data["ids"], ids)
+
+    def test_edit_by_filters_reports_borrowed_books(self):
+        response = self.edit(
+            {
+                "filters": {"filter_genre": [self.fiction.id], "q": "shelf"},
+                "patch": {"allowBorrow": False},
+            }
+        )
+        data = response.json()
+        self.assertEqual(data["updated"], 3)
+        statuses = {result["id"]: result["status"] for result in data["results"]}
+        self.assertEqual(statuses[self.books[0].id], "error")
+        self.assertEqual(
+            set(Book.objects.filter(allow_borrow=False).values_list("id", flat=True)),
+            {book.id for book in self.books[1:]},
+        )
+
+    def test_book_borrowed_during_edit_is_reported(self):
+        """A book borrowed just before the update is still left borrowable."""
+        borrowed = []
+
+        def borrow_before_update(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "api_book"') and not borrowed:
+                borrowed.append(
+                    Borrow.objects.create(book=self.books[1], borrower_name="Late")
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(borrow_before_update):
+            response = self.edit(
+                {
+                    "ids": [book.id for book in self.books[1:3]],
+                    "patch": {"allowBorrow": False},
+                }
+            )
+        data = response.json()
+        self.assertEqual(data["updated"], 1)
+        self.assertEqual(data["results"][0]["status"], "error")
+        self.assertTrue(Book.objects.get(pk=self.books[1].pk).allow_borrow)
+        self.assertFalse(Book.objects.get(pk=self.books[2].pk).allow_borrow)
+
+    def test_bulk_edit_query_count_is_constant(self):
+        """The number of queries doesn't grow with the number of books."""
+        patch = {"allowBorrow": True, "add_genre_ids": [self.reference.id]}
+        self.edit({"ids": [self.books[1].id], "patch": patch})
+        # Session, books, genres, savepoint, update, insert, event, release
+        with self.assertNumQueries(8) as small:
+            self.edit({"ids": [self.books[1].id], "patch": patch})
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.edit({"ids": [book.id for book in self.books], "patch": patch})
+
+    def test_validation(self):
+        ids = [self.books[1].id]
+        self.assertEqual(self.edit({"ids": ids}).status_code, 400)
+        self.assertEqual(self.edit({"ids": ids, "patch": {}}).status_code, 400)
+        self.assertEqual(self.edit({"patch": {"allowBorrow": True}}).status_code, 400)
+        self.assertEqual(
+            self.edit({"ids": ids, "patch": {"author_id": 999999}}).status_code, 404
+        )
+        self.assertEqual(
+            self.edit({"ids": ids, "patch": {"add_genre_ids": [999999]}}).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.edit(
+                {
+                    "filters": {"filter_borrowed": "maybe"},
+                    "patch": {"allowBorrow": True},
+                }
+            ).status_code,
+            400,
+        )
+
+
+class BulkDeleteTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = create_genre("Outdated")
+        cls.books = [
+            create_book(title=f"Old Manual {i}", genres=[cls.genre]) for i in range(5)
+        ]
+        cls.keep = create_book(title="Keeper", genres=[cls.genre])
+        Borrow.objects.create(book=cls.books[0], borrower_name="Reader")
+
+    def delete(self, body):
+        return self.client.post(
+            reverse("delete_books"),
+            data=json.dumps(body),
+            content_type="application/json",
+        )
+
+    @override_settings(BULK_DELETE_CHUNK_SIZE=2, BULK_DELETE_PAUSE=0)
+    def test_delete_by_filters_in_chunks(self):
+        response = self.delete({"filters": {"q": "old manual"}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["deleted"], 5)
+
+        self.assertEqual(list(Book.objects.all()), [self.keep])
+        self.assertFalse(Borrow.objects.exists())
+        self.assertEqual(
+            list(Book.genres.through.objects.values_list("book_id", flat=True)),
+            [self.keep.id],
+        )
+        self.assertEqual(
+            Tombstone.objects.filter(kind=Tombstone.BOOK).count(), len(self.books)
+        )
+        # One change event per chunk
+        self.assertEqual(
+            [len(event.data["ids"]) for event in ChangeEvent.objects.order_by("id")],
+            [2, 2, 1],
+        )
+
+    def test_delete_by_ids(self):
+        response = self.delete({"ids": [self.books[1].id, 999999]})
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": self.books[1].id, "status": "deleted"},
+                {"id": 999999, "status": "not_found"},
+            ],
+        )
+        self.assertFalse(Book.objects.filter(pk=self.books[1].pk).exists())
+
+    def test_more_ids_than_sqlite_variables(self):
+        connection.ensure_connection()
+        sqlite = connection.connection
+        limit = sqlite.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        sqlite.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 1000)
+        self.addCleanup(sqlite.setlimit, sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, limit)
+
+        missing = range(10**6, 10**6 + 5000)
+        response = self.delete({"ids": [self.books[2].id, *missing]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["deleted"], 1)
+        self.assertEqual(len(response.json()["results"]), 5001)
+
+    def test_validation(self):
+        self.assertEqual(self.delete({}).status_code, 400)
+        self.assertEqual(self.delete({"ids": "all"}).status_code, 400)
+        response = self.client.get(reverse("delete_books"))
+        self.assertEqual(response.status_code, 405)
+        response = self.client.get(reverse("bulk_job", args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(BULK_DELETE_CHUNK_SIZE=3, BULK_DELETE_PAUSE=0)
+class BackgroundBulkDeleteTests(ApiTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(10):
+            create_book(title=f"Weeded {i}")
+
+    def test_background_job_reports_progress(self):
+        response = self.client.post(
+            reverse("delete_books"),
+            data=json.dumps({"filters": {"q": "weeded"}, "background": True}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(data["total"], 10)
+
+        for _ in range(100):
+            job = self.client.get(data["progressUrl"]).json()
+            if job["status"] in (BulkJob.DONE, BulkJob.FAILED):
+                break
+            time.sleep(0.05)
+
+        self.assertEqual(job["status"], BulkJob.DONE)
+        self.assertEqual(job["processed"], 10)
+        self.assertFalse(Book.objects.exists())
+
+    def job(self, **fields):
+        return BulkJob.objects.create(
+            action="book.bulk_delete",
+            book_ids=list(Book.objects.order_by("id").values_list("id", flat=True)),
+            total=Book.objects.count(),
+            **fields,
+        )
+
+    def test_claim_is_exclusive(self):
+        job = self.job()
+        self.assertTrue(bulk.claim_job(job.id))
+        self.assertFalse(bulk.claim_job(job.id))
+
+        # Until its process stops reporting progress
+        BulkJob.objects.filter(pk=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertTrue(bulk.claim_job(job.id))
+
+    def test_stale_job_resumed_where_it_stopped(self):
+        job = self.job(
+            status=BulkJob.RUNNING,
+            processed=6,
+            heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+        running = self.job(status=BulkJob.RUNNING, heartbeat_at=timezone.now())
+        self.assertEqual(bulk.resumable_job_ids(), [job.id])
+
+        call_command("run_bulk_jobs", stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (BulkJob.DONE, 10))
+        # The books it had processed before aren't deleted again
+        self.assertEqual(
+            list(Book.objects.values_list("id", flat=True)), job.book_ids[:6]
+        )
+        running.refresh_from_db()
+        self.assertEqual(running.status, BulkJob.RUNNING)
+
+    def test_stopped_job_handed_back(self):
+        job = self.job()
+        with patch.object(bulk, "_stopping") as stopping:
+            stopping.is_set.return_value = True
+            bulk.run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (BulkJob.PENDING, 3))
+        self.assertEqual(Book.objects.count(), 7)
+        self.assertEqual(bulk.resumable_job_ids(), [job.id])
+
+
+class EditBookConcurrencyTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_author("Author")
+        cls.fiction = create_genre("Fiction")
+        cls.poetry = create_genre("Poetry")
+        cls.book = create_book(
+            title="Draft", author=cls.author, genres=[cls.fiction], allow_borrow=True
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.book.refresh_from_db()
+
+    def edit(self, body, **headers):
+        return self.client.put(
+            reverse("edit_book", args=[self.book.id]),
+            data=json.dumps(body),
+            content_type="application/json",
+            headers=headers,
+        )
+
+    def test_edit_bumps_version_and_sets_etag(self):
+        response = self.edit({"title": "Final", "genre_ids": [self.poetry.id]})
+
+        self.assertEqual(response.status_code, 200)
+        book = response.json()["book"]
+        self.assertEqual(book["version"], self.book.version + 1)
+        self.assertEqual(book["genres"], [{"id": self.poetry.id, "name": "Poetry"}])
+        self.assertEqual(response["ETag"], f'"{book["version"]}"')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "Final")
+        self.assertEqual(self.book.version, book["version"])
+        self.assertEqual(list(self.book.genres.all()), [self.poetry])
+
+    def test_book_borrowed_during_edit_stays_borrowable(self):
+        """A loan made after the book was read still blocks allowBorrow=false."""
+        borrowed = []
+
+        def borrow_before_update(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "api_book"') and not borrowed:
+                borrowed.append(
+                    Borrow.objects.create(book=self.book, borrower_name="Late")
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(borrow_before_update):
+            response = self.edit({"title": "Final", "allowBorrow": False})
+
+        self.assertEqual(response.status_code, 400)
+        self.book.refresh_from_db()
+        self.assertTrue(self.book.allow_borrow)
+        self.assertEqual(self.book.title, "Draft")
+        self.assertFalse(ChangeEvent.objects.filter(book_id=self.book.id).exists())
+
+    def test_get_book_etag_round_trip(self):
+        etag = self.client.get(reverse("get_book", args=[self.book.id]))["ETag"]
+
+        self.assertEqual(self.edit({"title": "One"}, if_match=etag).status_code, 200)
+        # The same ETag is now stale
+        response = self.edit({"title": "Two"}, if_match=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()["currentVersion"], self.book.version + 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "One")
+
+    def test_weak_etag_and_wildcard_accepted(self):
+        response = self.edit({"title": "One"}, if_match=f'W/"{self.book.version}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.edit({"title": "Two"}, if_match="*").status_code, 200)
+
+    def test_expected_version_conflict(self):
+        response = self.edit(
+            {"title": "Late", "expectedVersion": self.book.version - 1}
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["currentVersion"], self.book.version)
+        self.assertEqual(
+            self.edit({"title": "x", "expectedVersion": "v1"}).status_code, 400
+        )
+
+    def test_concurrent_write_between_read_and_update(self):
+        version = self.book.version
+
+        def edited_meanwhile(*args, **kwargs):
+            # Someone else saves the book after it was read, before the UPDATE
+            Book.objects.filter(pk=self.book.id).update(version=F("version") + 1)
+            return update_basic_book_fields(*args, **kwargs)
+
+        update_basic_book_fields = views._update_basic_book_fields
+        with patch.object(views, "_update_basic_book_fields", edited_meanwhile):
+            response = self.edit({"title": "Lost", "expectedVersion": version})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["currentVersion"], version + 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "Draft")
+
+    def test_only_changed_fields_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.edit(
+                {"title": "Renamed", "allowBorrow": True, "author_id": self.author.id}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"allow_borrow"', updates[0])
+        self.assertNotIn('"author_id"', updates[0])
+
+    def test_no_changes_no_write(self):
+        # Session and user, the book with its genres, its borrower, the genres
+        with self.assertNumQueries(6):
+            response = self.edit({"title": "Draft", "genre_ids": [self.fiction.id]})
+
+        self.assertEqual(response.json()["book"]["version"], self.book.version)
+        self.assertFalse(ChangeEvent.objects.exists())
+
+    def test_edit_emits_event(self):
+        self.edit({"title": "Announced"})
+
+        event = ChangeEvent.objects.get()
+        self.assertEqual(event.type, events.BOOK_UPDATED)
+        self.assertEqual(event.data["book"]["title"], "Announced")
+        self.assertIsNone(event.data["book"]["borrowerName"])
+
+
+class SortKeyTests(ApiTestCase):
+
+    def titles(self, **params):
+        response = self.client.get(reverse("get_books"), params)
+        return [book["title"] for book in response.json()["books"]]
+
+    def test_sort_key(self):
+        self.assertEqual(sort_key("The  Hobbit"), "hobbit, the")
+        self.assertEqual(sort_key("A"), "a")
+        self.assertEqual(sort_key("Ænima Brontë"), "ænima bronte")
+        self.assertLess(sort_key("Volume 2"), sort_key("Volume 10"))
+        self.assertEqual(sort_key("The Author", articles=()), "the author")
+        self.assertEqual(len(sort_key("9 " * 200)), 255)
+
+    def test_title_order(self):
+        for title in ["Volume 10", "The Zebra", "Émile", "Volume 2", "an Apple"]:
+            create_book(title=title)
+
+        self.assertEqual(
+            self.titles(sort_by="title"),
+            ["an Apple", "Émile", "Volume 2", "Volume 10", "The Zebra"],
+        )
+        self.assertEqual(
+            self.titles(sort_by="title", sort_desc="true"),
+            ["The Zebra", "Volume 10", "Volume 2", "Émile", "an Apple"],
+        )
+
+    def test_keys_follow_edits(self):
+        author = create_author("Zoë")
+        book = create_book(title="The Old Title", author=author)
+        self.assertEqual(
+            (book.title_sort_key, book.author_sort_key), ("old title, the", "zoe")
+        )
+
+        self.client.put(
+            reverse("edit_book", args=[book.id]),
+            data=json.dumps({"title": "New Title", "author_id": None}),
+            content_type="application/json",
+        )
+        book.refresh_from_db()
+        self.assertEqual((book.title_sort_key, book.author_sort_key), ("new title", ""))
+
+        book.author = author
+        book.save()
+        author.name = "Ada"
+        author.save()
+        book.refresh_from_db()
+        self.assertEqual(book.author_sort_key, "ada")
+
+    def test_sorted_page_uses_index(self):
+        plan = sort_books(Book.objects.all(), "title")[:20].explain()
+        self.assertIn("book_title_sort_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class FoldedSearchTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.marquez = create_author("Gabriel García Márquez")
+        cls.solitude = create_book(title="Cien años de soledad", author=cls.marquez)
+        cls.strasse = create_book(title="Die Straße")
+        cls.loaned = create_book(title="Loaned")
+        Borrow.objects.create(book=cls.loaned, borrower_name="José Ñúñez")
+
+    def search(self, q, search_in="all"):
+        response = self.client.get(
+            reverse("get_books"), {"q": q, "search_in": search_in, "fields": "id"}
+        )
+        return [book["id"] for book in response.json()["books"]]
+
+    def test_fold_text(self):
+        self.assertEqual(fold_text("  GARCÍA  Márquez "), "garcia marquez")
+        self.assertEqual(fold_text("Straße"), "strasse")
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(self.search("garcia", "author"), [self.solitude.id])
+        self.assertEqual(self.search("AÑOS"), [self.solitude.id])
+        self.assertEqual(self.search("anos", "title"), [self.solitude.id])
+        self.assertEqual(self.search("STRASSE"), [self.strasse.id])
+        self.assertEqual(self.search("nunez", "borrower"), [self.loaned.id])
+        self.assertEqual(self.search("garcia", "title"), [])
+
+    def test_columns_follow_edits(self):
+        self.client.put(
+            reverse("edit_book", args=[self.strasse.id]),
+            data=json.dumps({"title": "Ça ira"}),
+            content_type="application/json",
+        )
+        self.assertEqual(self.search("ca ira"), [self.strasse.id])
+
+        self.marquez.name = "Ǵabo"
+        self.marquez.save(update_fields=["name"])
+        self.assertEqual(self.search("gabo", "author"), [self.solitude.id])
+
+    def test_borrower_autocomplete_ignores_accents(self):
+        response = self.client.get(reverse("get_borrowers"), {"q": "jose n"})
+        self.assertEqual(
+            [borrower["name"] for borrower in response.json()["borrowers"]],
+            ["José Ñúñez"],
+        )
+
+
+class FuzzySearchTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = create_author("J. R. R. Tolkien")
+        cls.hobbit = create_book(title="The Hobbit", author=cls.tolkien)
+        cls.rings = create_book(title="The Lord of the Rings", author=cls.tolkien)
+        cls.habit = create_book(title="Atomic Habits")
+        cls.other = create_book(title="Dune")
+
+    def search(self, q, **params):
+        response = self.client.get(
+            reverse("get_books"),
+            {"q": q, "search_mode": "fuzzy", "fields": "id", **params},
+        )
+        return [book["id"] for book in response.json()["books"]]
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams("Cat"), {"  c", " ca", "cat", "at "})
+        self.assertEqual(trigrams("ÇAT!"), trigrams("cat"))
+        self.assertEqual(trigrams(" "), set())
+
+    def test_misspelled_title(self):
+        self.assertEqual(self.search("hobit", search_in="title"), [self.hobbit.id])
+        self.assertEqual(self.search("lord of the rigns")[0], self.rings.id)
+        self.assertEqual(self.search("hobit", search_mode="contains"), [])
+
+    def test_misspelled_author(self):
+        self.assertEqual(
+            self.search("tolkein", search_in="author"), [self.hobbit.id, self.rings.id]
+        )
+
+    def test_ranked_by_similarity_unless_sorted(self):
+        matches = fuzzy.search("habit")
+        self.assertEqual(matches[0][0], self.habit.id)
+        self.assertEqual([book_id for book_id, _ in matches], self.search("habit"))
+        self.assertEqual(
+            self.search("habit", sort_by="title"), sorted(self.search("habit"))[::-1]
+        )
+
+    def test_index_follows_writes(self):
+        self.client.put(
+            reverse("edit_book", args=[self.other.id]),
+            data=json.dumps({"title": "Children of Dune"}),
+            content_type="application/json",
+        )
+        self.assertEqual(self.search("chidlren"), [self.other.id])
+
+        self.tolkien.name = "Christopher Tolkien"
+        self.tolkien.save()
+        self.assertIn(self.hobbit.id, self.search("christofer"))
+
+        self.hobbit.delete()
+        bulk.delete_books([self.rings.id])
+        self.assertFalse(
+            SearchTrigram.objects.filter(
+                kind=SearchTrigram.BOOK, object_id__in=[self.hobbit.id, self.rings.id]
+            ).exists()
+        )
+
+    def test_invalid_mode(self):
+        url = reverse("get_books")
+        self.assertEqual(
+            self.client.get(url, {"search_mode": "sloppy"}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(
+                url, {"search_mode": "fuzzy", "search_in": "borrower"}
+            ).status_code,
+            400,
+        )
+
+    def test_candidates_from_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            fuzzy.search("hobit", "title")
+
+        lookup = next(query for query in queries if "GROUP BY" in query["sql"])
+        plan = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{plan} {lookup['sql']}")
+            details = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("INDEX", details)
+        self.assertIn("(gram=? AND kind=?)", details)
+
+    def test_common_trigrams_not_looked_up(self):
+        """Trigrams in too many titles only count when scoring candidates."""
+        with patch.object(fuzzy, "MAX_GRAM_FREQUENCY", 1):
+            with CaptureQueriesContext(connection) as queries:
+                matches = fuzzy.search("the hobit", "title")
+
+        self.assertEqual(matches[0][0], self.hobbit.id)
+        lookup = next(query for query in queries if "GROUP BY" in query["sql"])
+        # "the" is in two titles
+        self.assertNotIn("'the'", lookup["sql"])
+        self.assertIn("'hob'", lookup["sql"])
+
+    def test_ranked_in_pages(self):
+        """Relevance is ranked outside the SQL, which stays small."""
+        ranked = self.search("the habit")
+        self.assertGreater(len(ranked), 1)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.search("the habit", pg_size=1, pg_num=2)
+        self.assertEqual(second, ranked[1:2])
+        self.assertFalse(any("CASE" in query["sql"] for query in queries))
+
+        response = self.client.get(
+            reverse("get_books"),
+            {"q": "the habit", "search_mode": "fuzzy", "mode": "ids"},
+        )
+        self.assertEqual(json.loads(response.getvalue())["ids"], ranked)
+        self.assertEqual(self.search("the habit", sort_desc="true"), ranked[::-1])
+
+
+@override_settings(SUGGEST_REFRESH_INTERVAL=0)
+class SuggestTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = create_author("J. R. R. Tolkien")
+        cls.fantasy = create_genre("Fantasy")
+        cls.hobbit = create_book(title="The Hobbit", author=cls.tolkien)
+        cls.hobbits = create_book(title="Hobbits and Halflings")
+        cls.garcia = create_book(title="Crónica de una muerte anunciada")
+
+    def setUp(self):
+        super().setUp()
+        # Each test starts from a fresh index of its own catalog
+        self.index = suggest.PrefixIndex()
+        patcher = patch.object(suggest, "index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def suggestions(self, q, **params):
+        response = self.client.get(reverse("suggest"), {"q": q, **params})
+        return [(s["type"], s["text"]) for s in response.json()["suggestions"]]
+
+    def test_word_prefixes(self):
+        self.assertEqual(
+            self.suggestions("hobb"),
+            [("title", "Hobbits and Halflings"), ("title", "The Hobbit")],
+        )
+        self.assertEqual(self.suggestions("TOLK"), [("author", "J. R. R. Tolkien")])
+        self.assertEqual(self.suggestions("fan"), [("genre", "Fantasy")])
+        self.assertEqual(self.suggestions("cronica de"), [("title", self.garcia.title)])
+        self.assertEqual(self.suggestions("hobbit the"), [])
+        self.assertEqual(self.suggestions(""), [])
+        # Texts starting with the query first
+        self.assertEqual(
+            self.suggestions("h", limit=1), [("title", "Hobbits and Halflings")]
+        )
+
+    def test_refreshed_incrementally(self):
+        self.suggestions("x")
+        with patch.object(self.index, "_build") as build:
+            book = create_book(title="Hobbit Recipes")
+            self.assertIn(("title", "Hobbit Recipes"), self.suggestions("hobbit r"))
+
+            self.client.put(
+                reverse("edit_book", args=[book.id]),
+                data=json.dumps({"title": "Elvish Recipes"}),
+                content_type="application/json",
+            )
+            self.assertEqual(self.suggestions("hobbit r"), [])
+            self.assertEqual(self.suggestions("elv"), [("title", "Elvish Recipes")])
+
+            book.delete()
+            self.tolkien.name = "Christopher Tolkien"
+            self.tolkien.save()
+            self.assertEqual(self.suggestions("elv"), [])
+            self.assertEqual(
+                self.suggestions("tolkien"), [("author", "Christopher Tolkien")]
+            )
+        build.assert_not_called()
+
+    def test_rebuilt_after_many_changes(self):
+        self.suggestions("x")
+        with patch.object(suggest, "MAX_DELTA", 1):
+            create_book(title="Silmarillion")
+            create_genre("Silly")
+            self.assertEqual(len(self.suggestions("sil")), 2)
+
+    def test_no_queries_between_refreshes(self):
+        self.suggestions("x")
+        with override_settings(SUGGEST_REFRESH_INTERVAL=60):
+            # Only the session (the user is cached)
+            with self.assertNumQueries(1):
+                self.suggestions("hob")
+
+    def test_stats(self):
+        response = self.client.get(reverse("suggest"), {"q": "h", "stats": "true"})
+        stats = response.json()["index"]
+        self.assertEqual(stats["items"], 5)
+        self.assertGreater(stats["entries"], stats["items"])
+        self.assertGreater(stats["bytes"], 0)
+        self.assertEqual(
+            self.client.get(reverse("suggest"), {"limit": "0"}).status_code, 400
+        )
+
+
+# Every query sees the writes made before it
+@override_settings(CATALOG_REFRESH_INTERVAL=0)
+class ColumnarEngineTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = create_author("J. R. R. Tolkien")
+        cls.garcia = create_author("Gabriel García Márquez")
+        cls.le_guin = create_author("Ursula K. Le Guin")
+        cls.fantasy = create_genre("Fantasy")
+        cls.classic = create_genre("Classic")
+        same_day = timezone.now() - timedelta(days=3)
+
+        cls.hobbit = create_book(
+            title="The Hobbit", author=cls.tolkien, genres=[cls.fantasy]
+        )
+        cls.silmarillion = create_book(
+            title="The Silmarillion",
+            author=cls.tolkien,
+            genres=[cls.fantasy],
+            date_added=same_day,
+        )
+        cls.cronica = create_book(
+            title="Crónica de una muerte anunciada",
+            author=cls.garcia,
+            genres=[cls.classic],
+            date_added=same_day,
+        )
+        cls.earthsea = create_book(
+            title="A Wizard of Earthsea",
+            author=cls.le_guin,
+            genres=[cls.fantasy, cls.classic],
+        )
+        cls.book10 = create_book(title="Book 10", allow_borrow=False)
+        cls.book9 = create_book(title="Book 9", date_added=same_day)
+
+        create_borrow(cls.silmarillion, "Ana", is_borrowed=False)
+        create_borrow(cls.cronica, "José")
+        create_borrow(cls.earthsea, "Tolkien Fan")
+
+    def setUp(self):
+        super().setUp()
+        # Each test starts from a fresh catalog
+        self.catalog = columnar.ColumnarCatalog()
+        patcher = patch.object(columnar, "catalog", self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, engine, **params):
+        with override_settings(CATALOG_ENGINE=engine):
+            response = self.client.get(reverse("get_books"), params)
+        return response.status_code, response.json()
+
+    def assertSameAsOrm(self, **params):
+        with self.subTest(**params):
+            self.assertEqual(self.get("columnar", **params), self.get("orm", **params))
+
+    def test_search_and_sort(self):
+        for q in ["", "tolkien", "CRONICA", "ana", "jose", "book", "nothing"]:
+            for scope in ["all", "title", "author", "borrower"]:
+                for sort_by in ["title", "author", "dateAdded", "id"]:
+                    for sort_desc in ["false", "true"]:
+                        self.assertSameAsOrm(
+                            q=q,
+                            search_scope=scope,
+                            sort_by=sort_by,
+                            sort_desc=sort_desc,
+                        )
+        # Answered by the catalog, not by falling back to the ORM
+        with patch.object(views, "paginate_books") as paginate_books:
+            self.get("columnar", q="tolkien", sort_by="author")
+        paginate_books.assert_not_called()
+        self.assertEqual(len(self.catalog.refresh().positions), 6)
+
+    def test_filters_and_pages(self):
+        filters = [
+            {"filter_author": [self.tolkien.id, self.le_guin.id]},
+            {"filter_author": ["", " "]},
+            {"filter_genre": self.classic.id},
+            {"filter_genre": [self.fantasy.id, self.classic.id]},
+            {"filter_borrowed": "true"},
+            {"filter_borrowed": "false"},
+            {"filter_allow_borrow": "false"},
+            {"filter_allow_borrow": "true", "filter_genre": self.fantasy.id},
+        ]
+        for params in filters:
+            for sort_by in ["title", "dateAdded"]:
+                for pg_num in ["1", "2", "3", "4"]:
+                    self.assertSameAsOrm(
+                        **params, sort_by=sort_by, pg_num=pg_num, pg_size="2"
+                    )
+        self.assertSameAsOrm(fields="id,borrowerName", sort_by="author")
+        self.assertSameAsOrm(mode="count", q="tolkien", exact="true")
+        self.assertSameAsOrm(mode="count", filter_borrowed="false", exact="true")
+
+    def test_facets(self):
+        status, facets = self.get("orm", mode="facets", filter_genre=self.classic.id)
+        self.assertEqual(status, 200)
+        # Each facet leaves its own filter out
+        self.assertEqual(
+            facets["genres"],
+            [
+                {"id": self.fantasy.id, "count": 3},
+                {"id": self.classic.id, "count": 2},
+            ],
+        )
+        self.assertEqual(
+            facets["authors"],
+            [{"id": self.garcia.id, "count": 1}, {"id": self.le_guin.id, "count": 1}],
+        )
+        self.assertEqual(facets["borrowed"], {"true": 2, "false": 0})
+        self.assertEqual(facets["allowBorrow"], {"true": 2, "false": 0})
+
+        for params in [
+            {},
+            {"filter_genre": self.classic.id},
+            {"filter_author": self.tolkien.id, "filter_borrowed": "false"},
+            {"q": "tolkien", "filter_allow_borrow": "true"},
+            {"q": "jose", "search_scope": "borrower", "filter_genre": ""},
+        ]:
+            self.assertSameAsOrm(mode="facets", **params)
+
+    def test_bitmap_index(self):
+        index = bitmaps.BitmapIndex.build([(1,), (1, 2), (), (2,)], 4)
+        self.assertEqual(index.bits([1], 4), 0b0011)
+        self.assertEqual(index.bits([1, 2, 3], 4), 0b1011)
+        self.assertEqual(index.counts(0b1110, 4), {1: 1, 2: 2})
+
+        # Sets stay arrays of positions until they fill up
+        index = bitmaps.BitmapIndex()
+        for position in range(200):
+            index.add(1, position * 100)
+        self.assertNotIsInstance(index._sets[1], int)
+        for position in range(200):
+            index.add(2, position)
+        self.assertIsInstance(index._sets[2], int)
+        self.assertEqual(index.bits([2], 200), (1 << 200) - 1)
+        for position in range(200):
+            index.discard(2, position)
+        self.assertEqual(index.counts((1 << 20000) - 1, 20000), {1: 200})
+
+    def test_deep_pages_skip_blocks(self):
+        # Blocks of two books, so later pages start past whole blocks
+        with patch.object(columnar, "MIN_BLOCK_SIZE", 2):
+            for sort_by in ["title", "author", "dateAdded", "id"]:
+                for sort_desc in ["false", "true"]:
+                    for pg_num in ["1", "2", "3"]:
+                        self.assertSameAsOrm(
+                            sort_by=sort_by,
+                            sort_desc=sort_desc,
+                            pg_num=pg_num,
+                            pg_size="2",
+                        )
+            for pg_num in ["2", "3"]:
+                self.assertSameAsOrm(
+                    filter_genre=self.fantasy.id, pg_num=pg_num, pg_size="1"
+                )
+            block_size, blocks = self.catalog.refresh()._blocks("by_title")
+        self.assertEqual((block_size, len(blocks)), (2, 3))
+
+    def test_unsupported_queries_use_the_orm(self):
+        filters = {"query": "hobbit", "search_mode": "fuzzy"}
+        self.assertIsNone(self.catalog.page(filters, "title", False, 1, 20))
+        self.assertIsNone(self.catalog.page({}, "borrowerName", False, 1, 20))
+        self.assertIsNone(self.catalog.count({"authors": ["x"]}))
+        self.assertSameAsOrm(sort_by="borrowerName")
+        self.assertSameAsOrm(q="hobit", search_mode="fuzzy")
+
+    def test_writes_are_applied_without_reloading(self):
+        self.get("columnar")
+        with patch.object(self.catalog, "_build") as build:
+            self.client.put(
+                reverse("edit_book", args=[self.hobbit.id]),
+                data=json.dumps(
+                    {"title": "The Hobbit, or There and Back Again", "genre_ids": []}
+                ),
+                content_type="application/json",
+            )
+            self.client.post(
+                reverse("borrow_book", args=[self.book9.id]),
+                data=json.dumps({"borrowerName": "Zoë"}),
+                content_type="application/json",
+            )
+            self.client.put(reverse("unborrow_book", args=[self.cronica.id]))
+            self.client.delete(reverse("delete_book", args=[self.book10.id]))
+            self.client.put(
+                reverse("edit_books"),
+                data=json.dumps(
+                    {
+                        "ids": [self.earthsea.id],
+                        "patch": {"author_id": self.garcia.id},
+                    }
+                ),
+                content_type="application/json",
+            )
+            self.tolkien.name = "Christopher Tolkien"
+            self.tolkien.save()
+            self.le_guin.delete()
+            self.classic.delete()
+
+            for sort_by in ["title", "author", "dateAdded"]:
+                self.assertSameAsOrm(sort_by=sort_by)
+            for q in ["hobbit", "zoe", "jose", "christopher"]:
+                self.assertSameAsOrm(q=q)
+            self.assertSameAsOrm(filter_borrowed="true")
+            self.assertSameAsOrm(filter_genre=self.fantasy.id)
+            self.assertSameAsOrm(mode="facets")
+        build.assert_not_called()
+
+    def test_reads_between_refreshes(self):
+        snapshot = self.catalog.refresh()
+        titles = list(snapshot.titles)
+        with override_settings(CATALOG_REFRESH_INTERVAL=60):
+            book = create_book(title="Unfinished Tales", author=self.tolkien)
+            # Read from the current snapshot, without the database
+            with self.assertNumQueries(0):
+                page = self.catalog.page({}, "title", False, 1, 20)
+            self.assertNotIn(book.id, page.object_list)
+
+            # Nor wait for another thread's refresh
+            with self.catalog._lock:
+                self.catalog._checked_at = float("-inf")
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.catalog.count({}), 6)
+
+            # Changes are applied to a copy
+            self.assertIn(book.id, self.catalog.refresh(force=True).positions)
+            self.assertEqual(snapshot.titles, titles)
+            self.assertNotIn(book.id, snapshot.positions)
+
+    def test_reloaded_after_many_changes(self):
+        self.get("columnar")
+        with patch.object(columnar, "MAX_DELTA", 1):
+            create_book(title="Unfinished Tales", author=self.tolkien)
+            create_book(title="The Children of Húrin", author=self.tolkien)
+            self.assertSameAsOrm(q="tolkien")
+
+    def test_out_of_range_page(self):
+        status, data = self.get("columnar", pg_num="9")
+        self.assertEqual(status, 404)
+        self.assertEqual(data, self.get("orm", pg_num="9")[1])
+
+
+STATIC_STORAGES = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+# Static URLs without the manifest of collected files
+@override_settings(STORAGES=STATIC_STORAGES)
+class WarmupTests(ApiTestCase):
+    login = False
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch.dict(
+            warmup.state, {"finishedAt": None, "durationMs": None, "pid": None}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    def test_ready_after_warmup(self):
+        response = self.client.get(reverse("readiness"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"ready": False})
+
+        create_book(title="Small Gods")
+        with patch.object(suggest.index, "refresh") as refresh:
+            state = warmup.warm_up()
+        refresh.assert_called_once_with(force=True)
+        self.assertEqual(set(state["steps"]), {"urls", "database", "caches", "shells"})
+        self.assertEqual(state["steps"]["database"]["synchronous"], 1)
+
+        # Without a login or a query
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("readiness"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["ready"])
+        self.assertEqual(data["finishedAt"], state["finishedAt"])
+
+    def test_not_ready_in_forked_process(self):
+        """A worker isn't ready because its master warmed up."""
+        warmup.state.update(finishedAt=timezone.now().isoformat(), pid=-1)
+        self.assertFalse(warmup.is_ready())
+
+
+class PrestartTests(ApiTestCase):
+    login = False
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dist = Path(tmp_dir.name) / "dist"
+        self.dist.mkdir()
+        (self.dist / "main.js").write_text("console.log('v1')")
+
+        # Without compressing and hashing the admin's files on each collect
+        self.enterContext(
+            override_settings(
+                STATIC_ROOT=Path(tmp_dir.name) / "static",
+                STATICFILES_DIRS=[self.dist],
+                STORAGES=STATIC_STORAGES,
+            )
+        )
+        self.enterContext(patch.dict("os.environ", {"DJANGO_SUPERUSER_PASSWORD": "pw"}))
+
+    def prestart(self, *args) -> list[str]:
+        out = StringIO()
+        call_command("prestart", *args, stdout=out)
+        return out.getvalue().splitlines()
+
+    def test_skips_what_is_done(self):
+        first = self.prestart()
+        self.assertTrue(first[0].startswith("--> static: collected"))
+        # The test database is in memory
+        self.assertTrue(first[1].startswith("--> journal: not supported"))
+        self.assertTrue(first[2].startswith("--> migrate: up to date, skipped"))
+        self.assertTrue(first[3].startswith("--> superuser: created 'admin'"))
+        self.assertTrue(User.objects.get(username="admin").is_superuser)
+
+        second = self.prestart()
+        self.assertTrue(second[0].startswith("--> static: unchanged, skipped"))
+        self.assertTrue(second[3].startswith("--> superuser: already exists"))
+
+        # A new frontend build is collected
+        (self.dist / "main.js").write_text("console.log('v2')")
+        third = self.prestart("--only", "static")
+        self.assertEqual(len(third), 2)
+        self.assertTrue(third[0].startswith("--> static: collected"))
+        self.assertEqual(
+            (Path(settings.STATIC_ROOT) / STATIC_STAMP).read_text(),
+            static_sources_hash(),
+        )
+
+    def test_sets_wal_once(self):
+        db_file = Path(settings.STATIC_ROOT).parent / "db.sqlite3"
+        databases = ConnectionHandler(
+            {DEFAULT_DB_ALIAS: {**settings.DATABASES["default"], "NAME": db_file}}
+        )
+        self.addCleanup(databases.close_all)
+        self.enterContext(
+            patch("api.management.commands.prestart.connections", databases)
+        )
+
+        first = self.prestart("--only", "journal")
+        self.assertTrue(first[0].startswith("--> journal: set to wal"))
+        second = self.prestart("--only", "journal")
+        self.assertTrue(second[0].startswith("--> journal: already wal, skipped"))
+
+        # Connections leave it alone
+        with databases[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=DELETE")
+        databases.close_all()
+        with databases[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "delete")
+
+    def test_pending_migrations(self):
+        self.assertEqual(pending_migrations(), [])
+        with patch(
+            "django.db.migrations.recorder.MigrationRecorder.applied_migrations",
+            return_value={},
+        ):
+            self.assertTrue(pending_migrations())
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class ShellPageTests(ApiTestCase):
+    login = False
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(patch.dict(frontend_views._shells, clear=True))
+
+    def test_rendered_once(self):
+        with patch(
+            "frontend.views.render_to_string", wraps=frontend_views.render_to_string
+        ) as render:
+            first = self.client.get(reverse("login"))
+            with self.assertNumQueries(0):
+                second = self.client.get(reverse("login"))
+        render.assert_called_once()
+
+        self.assertEqual(second.content, first.content)
+        self.assertIn(b'src="/static/frontend/login.js"', second.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(
+            second["Link"],
+            "</static/frontend/login.css>; rel=preload; as=style, "
+            "</static/frontend/login.js>; rel=modulepreload",
+        )
+        self.assertIn("no-cache", second["Cache-Control"])
+
+    def test_not_modified(self):
+        self.client.force_login(User.objects.create_user("librarian"))
+        etag = self.client.get("/books/1/")["ETag"]
+
+        response = self.client.get("/", headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_immutable_assets(self):
+        """Hashed file names are cached for good, others revalidate."""
+        immutable = re.compile(settings.WHITENOISE_IMMUTABLE_FILE_TEST)
+        for url, expected in [
+            ("/static/frontend/main.3f2a1b4c5d6e.js", True),
+            ("/static/frontend/main.3f2a1b4c5d6e.css", True),
+            ("/static/frontend/chunk-vendorB2x9aK1c.js", True),
+            ("/static/frontend/main.js", False),
+            ("/static/admin/css/base.css", False),
+        ]:
+            self.assertEqual(bool(immutable.search(url)), expected, url)
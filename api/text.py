@@ -0,0 +1,89 @@
+import re
+import unicodedata
+
+# Leading articles that titles are not sorted under ('The Hobbit' sorts as H)
+SORT_ARTICLES = ("the", "a", "an")
+# Numbers are zero-padded to this width so that 'Vol. 2' < 'Vol. 10'
+SORT_NUMBER_WIDTH = 10
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a person's name for identity and lookups.
+
+    Applies Unicode compatibility normalization, collapses runs of whitespace and
+    case-folds, so 'Jane  DOE' and 'jane doe' are the same borrower.
+
+    Args:
+        name (str): The name as entered.
+
+    Returns:
+        str: The normalized name.
+    """
+    return " ".join(unicodedata.normalize("NFKC", name).split()).casefold()
+
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """
+    Return the half-open range of strings starting with `prefix`.
+
+    Filtering with `field__gte=low, field__lt=high` is answered from a plain
+    index on `field`, unlike `startswith`, which SQLite evaluates with LIKE.
+    """
+    return prefix, prefix + "\U0010ffff"
+
+
+def fold_accents(value: str) -> str:
+    """
+    Strip diacritics, so 'Brontë' and 'Bronte' compare equal.
+
+    Decomposes with compatibility normalization (which also splits ligatures
+    like 'ﬁ') and drops the combining marks.
+    """
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", value)
+        if not unicodedata.combining(char)
+    )
+
+
+def fold_text(value: str) -> str:
+    """
+    Normalize text for accent- and case-insensitive matching.
+
+    Case-folds, strips diacritics and collapses runs of whitespace, so that
+    'GARCÍA  Márquez' and 'garcia marquez' are the same. Stored in the `*_search`
+    columns and applied to search queries alike.
+
+    Args:
+        value (str): The text to fold.
+
+    Returns:
+        str: The folded text.
+    """
+    return " ".join(fold_accents(value.casefold()).split())
+
+
+def sort_key(value: str, articles: tuple[str, ...] = SORT_ARTICLES) -> str:
+    """
+    Build the stored key a title or name is sorted by.
+
+    The key is accent-folded and case-folded with collapsed whitespace, a
+    leading article is moved to the end ('the hobbit' -> 'hobbit, the') and
+    numbers are zero-padded for natural order. Keys are cut to 255 characters,
+    the size of their columns.
+
+    Args:
+        value (str): The title or name.
+        articles (tuple[str, ...], optional): Leading words to move to the end.
+                                              Pass `()` for names.
+
+    Returns:
+        str: The sort key.
+    """
+    key = fold_text(value)
+    first, _, rest = key.partition(" ")
+    if rest and first in articles:
+        key = f"{rest}, {first}"
+    key = re.sub(r"\d+", lambda match: match.group().zfill(SORT_NUMBER_WIDTH), key)
+    return key[:255]
@@ -6,15 +6,30 @@ urlpatterns = [
     path("get-books/", views.get_books, name="get_books"),
     path("get-authors/", views.get_authors, name="get_authors"),
     path("get-genres/", views.get_genres, name="get_genres"),
+    path("get-borrowers/", views.get_borrowers, name="get_borrowers"),
     path("get-book/<int:book_id>/", views.get_book, name="get_book"),
+    path(
+        "get-book/<int:book_id>/borrows/",
+        views.get_book_borrows,
+        name="get_book_borrows",
+    ),
     path("search-books/", views.get_books, name="search_books"),
+    path("suggest/", views.get_suggestions, name="suggest"),
     path("add-book/", views.add_book, name="add_book"),
     path("add-author/", views.add_author_genre, {"type": "author"}, name="add_author"),
     path("add-genre/", views.add_author_genre, {"type": "genre"}, name="add_genre"),
     path("borrow-book/<int:book_id>/", views.borrow_book, name="borrow_book"),
     path("unborrow-book/<int:book_id>/", views.unborrow_book, name="unborrow_book"),
     path("edit-book/<int:book_id>/", views.edit_book, name="edit_book"),
+    path("edit-books/", views.edit_books, name="edit_books"),
     path("delete-book/<int:book_id>/", views.delete_book, name="delete_book"),
+    path("delete-books/", views.delete_books, name="delete_books"),
+    path("bulk-jobs/<int:job_id>/", views.get_bulk_job, name="bulk_job"),
     path("add-books/", views.add_books, name="add_books"),
+    path("get-logs/", views.get_logs, name="get_logs"),
+    path("analytics/", views.get_analytics, name="analytics"),
+    path("events/", views.change_feed, name="change_feed"),
+    path("sync/", views.sync_catalog, name="sync"),
+    path("ready/", views.readiness, name="readiness"),
     path("", views.index, name="api_index"),
 ]
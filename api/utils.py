@@ -1,17 +1,196 @@
+import base64
+import json
+
 from django.core.paginator import Page, Paginator
-from django.db.models import Q, QuerySet
+from django.db.models import Count, Prefetch, Q, QuerySet
 from django.db.models.functions import Lower
+from django.http import QueryDict
+
+from . import fuzzy
+from .models import Borrow, Genre
+from .text import fold_text
+
+# Fields of a book in `get_books` responses, in output order
+BOOK_LIST_FIELDS = [
+    "id",
+    "title",
+    "author",
+    "dateAdded",
+    "genres",
+    "borrowerName",
+    "allowBorrow",
+]
+
+# Fields of a book in `get_book` responses, in output order
+BOOK_DETAIL_FIELDS = [
+    "id",
+    "title",
+    "author",
+    "genres",
+    "allowBorrow",
+    "dateAdded",
+    "borrow",
+    "version",
+]
+
+# Book columns needed to render each response field
+BOOK_FIELD_COLUMNS = {
+    "title": ["title"],
+    "author": ["author__id", "author__name"],
+    "dateAdded": ["date_added"],
+    "allowBorrow": ["allow_borrow"],
+    "version": ["version"],
+}
+
+
+def parse_book_filters(params: QueryDict) -> dict:
+    """
+    Build the filter criteria of `filter_books` from request parameters.
+
+    Args:
+        params (QueryDict): The request parameters: `q`, `search_in`,
+                            `search_mode`, `filter_author` and `filter_genre`
+                            (repeatable),
+                            `filter_borrowed` and `filter_allow_borrow`.
+
+    Returns:
+        dict: The filter criteria for `filter_books`.
+
+    Raises:
+        ValueError: If a parameter has an invalid value.
+    """
+    # Search parameters
+    search_query: str | None = params.get("q", None)
+    search_scope: str = params.get("search_in", "all").lower()
+
+    # Validate search_scope
+    allowed_search_scopes = ["all", "title", "author", "borrower"]
+    if search_scope not in allowed_search_scopes:
+        raise ValueError(
+            "Invalid value for search_in parameter. Allowed values: "
+            + ", ".join(allowed_search_scopes)
+        )
+
+    # Validate search_mode
+    search_mode: str = params.get("search_mode", "contains").lower()
+    allowed_search_modes = ["contains", "fuzzy"]
+    if search_mode not in allowed_search_modes:
+        raise ValueError(
+            "Invalid value for search_mode parameter. Allowed values: "
+            + ", ".join(allowed_search_modes)
+        )
+    if search_mode == "fuzzy" and search_scope == "borrower":
+        raise ValueError("Fuzzy search covers titles and authors, not borrowers")
+
+    # Extract query parameters for filtering (prefixed with filter_)
+    filter_authors: list[str] = params.getlist("filter_author", "")
+    filter_genres: list[str] = params.getlist("filter_genre", "")
+    filter_borrowed_q: str = params.get("filter_borrowed", "null").lower()
+    filter_allow_borrow_q: str = params.get("filter_allow_borrow", "null").lower()
+
+    # Validate filter_borrowed parameter
+    allowed_filter_borrowed_values = ["true", "false", "null"]
+    if filter_borrowed_q not in allowed_filter_borrowed_values:
+        raise ValueError(
+            "Invalid value for filter_borrowed parameter. Allowed values: "
+            + ", ".join(allowed_filter_borrowed_values)
+        )
+
+    # Convert filter_borrowed parameter to boolean if provided
+    # If filter_borrowed_q is not "true" or "false", set it to None
+    filter_borrowed = (
+        filter_borrowed_q == "true" if filter_borrowed_q in ["true", "false"] else None
+    )
+
+    # Validate filter_allowborrow parameter
+    allowed_filter_allowborrow_values = ["true", "false", "null"]
+    if filter_allow_borrow_q not in allowed_filter_allowborrow_values:
+        raise ValueError(
+            "Invalid value for filter_allowborrow parameter. Allowed values: "
+            + ", ".join(allowed_filter_allowborrow_values)
+        )
+
+    # Convert filter_allowborrow parameter to boolean if provided
+    # If filter_allowborrow_q is not "true" or "false", set it to None
+    filter_allowborrow = (
+        filter_allow_borrow_q == "true"
+        if filter_allow_borrow_q in ["true", "false"]
+        else None
+    )
+
+    return {
+        "query": search_query,
+        "search_scope": search_scope,
+        "search_mode": search_mode,
+        "authors": filter_authors,
+        "genres": filter_genres,
+        "borrowed": filter_borrowed,
+        "allowborrow": filter_allowborrow,
+    }
+
+
+def book_filter_params(criteria: dict) -> QueryDict:
+    """
+    Convert filter criteria given as a JSON object (e.g. in a request body) to
+    the query parameters expected by `parse_book_filters`.
+
+    Args:
+        criteria (dict): Parameter names mapped to a value or a list of values.
+
+    Returns:
+        QueryDict: The equivalent query parameters.
+
+    Raises:
+        ValueError: If `criteria` is not an object.
+    """
+    if not isinstance(criteria, dict):
+        raise ValueError("filters must be an object")
+
+    params = QueryDict(mutable=True)
+    for key, value in criteria.items():
+        values = value if isinstance(value, list) else [value]
+        params.setlist(
+            key,
+            [
+                str(item).lower() if isinstance(item, bool) else str(item)
+                for item in values
+                if item is not None
+            ],
+        )
+    return params
+
+
+def fuzzy_matches(filters: dict) -> list[tuple[int, float]] | None:
+    """
+    Run the fuzzy search of the filter criteria, if they ask for one.
+
+    Returns:
+        list | None: The `(book_id, score)` pairs of `api.fuzzy.search`, best
+                     first, or None if the criteria don't use fuzzy search.
+    """
+    query = filters.get("query")
+    if query and query.strip() and filters.get("search_mode") == "fuzzy":
+        return fuzzy.search(query, filters.get("search_scope", "all"))
+    return None
 
 
-def filter_books(books: QuerySet, filters: dict) -> QuerySet:
+def filter_books(
+    books: QuerySet, filters: dict, matches: list[tuple[int, float]] | None = None
+) -> QuerySet:
     """
     Apply search and filters to the queryset based on the provided criteria.
 
     Args:
         books (QuerySet): The queryset to filter.
         filters (dict): A dictionary containing filter and search criteria.
-                        Expected keys: 'query', 'search_scope', 'authors',
-                        'genres', 'borrowed', 'allowborrow'.
+                        Expected keys: 'query', 'search_scope',
+                        'search_mode', 'authors', 'genres', 'borrowed',
+                        'allowborrow'.
+        matches (list, optional): The `fuzzy_matches` of `filters`, if the
+                                  caller already has them.
+
+    With the 'fuzzy' search mode, only the matches found by `api.fuzzy.search`
+    are kept; `RankedBooks` orders them by relevance.
 
     Returns:
         QuerySet: The filtered queryset.
@@ -21,25 +200,30 @@ def filter_books(books: QuerySet, filters: dict) -> QuerySet:
     # one of 'all', 'title', 'author', 'borrower'
 
     # --- Apply Search First (if query is provided) ---
-    if query and query.strip():
-        query = query.strip()
+    if query and query.strip() and filters.get("search_mode") == "fuzzy":
+        if matches is None:
+            matches = fuzzy_matches(filters)
+        books = books.filter(pk__in=[book_id for book_id, _ in matches])
+    elif query and query.strip():
+        # Matched against the folded `*_search` columns, so the search ignores
+        # case and accents for any script, not just ASCII
+        query = fold_text(query)
         search_q = Q()  # Initialize an empty Q object
 
         if search_scope == "title":
-            search_q = Q(title__icontains=query)
+            search_q = Q(title_search__contains=query)
         elif search_scope == "author":
             # Ensure author is not null before searching name
-            search_q = Q(author__isnull=False, author__name__icontains=query)
+            search_q = Q(author__isnull=False, author__name_search__contains=query)
         elif search_scope == "borrower":
-            search_q = Q(borrow__isnull=False, borrow__borrower_name__icontains=query)
+            search_q = Q(borrow__borrower__search_name__contains=query)
         else:  # Default 'all' scope
             search_q = (
-                Q(title__icontains=query)
-                | Q(author__isnull=False, author__name__icontains=query)
+                Q(title_search__contains=query)
+                | Q(author__isnull=False, author__name_search__contains=query)
                 | Q(
-                    borrow__isnull=False,
                     borrow__is_borrowed=True,
-                    borrow__borrower_name__icontains=query,
+                    borrow__borrower__search_name__contains=query,
                 )
             )
 
@@ -86,13 +270,58 @@ def filter_books(books: QuerySet, filters: dict) -> QuerySet:
     return books.distinct()  # Ensure no duplicate results
 
 
+def count_book_facets(books: QuerySet, filters: dict) -> dict:
+    """
+    Count the books matching `filters` per genre, per author, by borrowed status
+    and by whether they can be borrowed.
+
+    Each facet leaves its own filter out, so its counts are what choosing one
+    more value of it would add: the genre counts ignore `genres`, and so on.
+
+    Args:
+        books (QuerySet): The books to count.
+        filters (dict): As for `filter_books`.
+
+    Returns:
+        dict: `genres` and `authors` as lists of `{"id", "count"}` (without
+              zero counts), and `borrowed` and `allowBorrow` as
+              `{"true": count, "false": count}`.
+    """
+
+    def matching(**overrides) -> QuerySet:
+        return filter_books(books, {**filters, **overrides})
+
+    def counts(field: str, leave_out: str) -> list[dict]:
+        rows = (
+            matching(**{leave_out: []})
+            .values_list(field)
+            .annotate(count=Count("id", distinct=True))
+            .order_by(field)
+        )
+        return [{"id": pk, "count": count} for pk, count in rows if pk is not None]
+
+    return {
+        "genres": counts("genres", "genres"),
+        "authors": counts("author", "authors"),
+        "borrowed": {
+            "true": matching(borrowed=True).count(),
+            "false": matching(borrowed=False).count(),
+        },
+        "allowBorrow": {
+            "true": matching(allowborrow=True).count(),
+            "false": matching(allowborrow=False).count(),
+        },
+    }
+
+
 def sort_books(books: QuerySet, sort_by: str, desc: bool = False) -> QuerySet:
     """
     Sort the queryset based on the provided sort criteria.
 
     Args:
         books (QuerySet): The queryset to sort.
-        sort_by (str): The field to sort by.
+        sort_by (str): The field to sort by. Sorting fuzzy search matches by
+                       relevance is done by `RankedBooks` instead.
         desc (bool, optional): Whether to sort in descending order. Defaults to False.
 
     Returns:
@@ -101,8 +330,8 @@ def sort_books(books: QuerySet, sort_by: str, desc: bool = False) -> QuerySet:
 
     # Map of sortable fields to their corresponding query pattern
     sortable_fields = {
-        "title": "title",
-        "author": "author__name",
+        "title": "title_sort_key",
+        "author": "author_sort_key",
         "dateAdded": "date_added",
         "borrowerName": "borrow__borrower_name",
         "borrowDate": "borrow__borrowed_date",
@@ -120,27 +349,131 @@ def sort_books(books: QuerySet, sort_by: str, desc: bool = False) -> QuerySet:
         if sort_by == "author":
             books = books.filter(author__isnull=False)
 
-        # If sorting by title or author, use a case-insensitive sort
-        if sort_by in ["title", "author", "borrowerName"]:
+        # Prefix for descending is '-'
+        prefix = "-" if desc else ""
+
+        if sort_by in ["title", "author"]:
+            # Stored, normalized keys (see `Book.save`): walking the
+            # (key, id) index in either direction gives the page in order
+            books = books.order_by(f"{prefix}{field}", f"{prefix}id")
+        elif sort_by == "borrowerName":
+            # Case-insensitive sort
             query_field = Lower(field).desc() if desc else Lower(field)
+            books = books.order_by(query_field, "id")
         else:
-            # Prefix for descending is '-'
-            prefix = "-" if desc else ""
-
-            query_field = f"{prefix}{field}"
-
-        books = books.order_by(query_field, "id")
+            books = books.order_by(f"{prefix}{field}", "id")
 
     # Otherwise, return the original queryset
     return books.distinct()
 
 
-def paginate_books(books: QuerySet, number: int, per_page: int) -> Page:
+def parse_fields(value: str | None, allowed: list[str]) -> list[str]:
+    """
+    Parse a comma-separated `fields` parameter.
+
+    Args:
+        value (str | None): The raw parameter, e.g. 'id,title,borrowerName'.
+        allowed (list[str]): The fields that can be requested.
+
+    Returns:
+        list[str]: The requested fields in `allowed` order, or all of `allowed`
+                   if the parameter is missing or empty.
+
+    Raises:
+        ValueError: If an unknown field is requested.
+    """
+    if not value or not value.strip():
+        return list(allowed)
+
+    requested = {field.strip() for field in value.split(",") if field.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Allowed values: {', '.join(allowed)}"
+        )
+    return [field for field in allowed if field in requested]
+
+
+def select_book_fields(books: QuerySet, fields: list[str]) -> QuerySet:
+    """
+    Restrict a book queryset to what is needed to render `fields`.
+
+    Only the requested columns are loaded and the author join, genre prefetch
+    and current borrow prefetch are added only when their field is requested.
+    The current borrow is stored in `active_borrows` and the genres are
+    prefetched with `genres.all()`.
+
+    Args:
+        books (QuerySet): The queryset to restrict.
+        fields (list[str]): Fields returned by `parse_fields`.
+
+    Returns:
+        QuerySet: The restricted queryset.
+    """
+    columns = ["id"]
+    for field in fields:
+        columns.extend(BOOK_FIELD_COLUMNS.get(field, []))
+    books = books.only(*columns)
+
+    if "author" in fields:
+        books = books.select_related("author")
+
+    if "genres" in fields:
+        books = books.prefetch_related(
+            Prefetch("genres", queryset=Genre.objects.only("id", "name"))
+        )
+
+    if "borrowerName" in fields or "borrow" in fields:
+        books = books.prefetch_related(
+            Prefetch(
+                "borrow_set",
+                queryset=Borrow.objects.filter(is_borrowed=True),
+                to_attr="active_borrows",
+            )
+        )
+
+    return books
+
+
+class RankedBooks:
+    """
+    Filtered books in the order of their fuzzy search relevance: best first, or
+    worst first with `desc` (reversed, like the other sorts).
+
+    The ranking is applied in Python to the ids of the matches (at most
+    `fuzzy.MAX_RESULTS`), and a page is then loaded by id, so no query grows
+    with the number of matches. Can be paginated like a queryset.
+    """
+
+    def __init__(
+        self, books: QuerySet, matches: list[tuple[int, float]], desc: bool = False
+    ):
+        self.books = books
+        # The matches left by the other filters
+        matching = set(books.values_list("id", flat=True))
+        self.ids: list[int] = [book_id for book_id, _ in matches if book_id in matching]
+        if desc:
+            self.ids.reverse()
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: slice) -> list:
+        ids = self.ids[index]
+        books = {book.id: book for book in self.books.filter(pk__in=ids)}
+        return [books[book_id] for book_id in ids]
+
+
+def paginate_books(books: QuerySet | RankedBooks, number: int, per_page: int) -> Page:
     """
     Paginate the queryset and return the current page and its data.
 
     Args:
-        books (QuerySet): The queryset to paginate.
+        books (QuerySet | RankedBooks): The queryset to paginate.
         number (int): The page number.
         per_page (int): The number of items per page.
 
@@ -152,7 +485,7 @@ def paginate_books(books: QuerySet, number: int, per_page: int) -> Page:
     """
     try:
         # check if books is ordered
-        if not books.query.order_by:
+        if isinstance(books, QuerySet) and not books.query.order_by:
             books = books.order_by("id")
         paginator: Paginator = Paginator(books, per_page)
         page: Page = paginator.page(number)
@@ -160,3 +493,84 @@ def paginate_books(books: QuerySet, number: int, per_page: int) -> Page:
         raise e
 
     return page
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Encode the sort key of the last item of a page as an opaque cursor.
+
+    Args:
+        values (list): JSON-serializable sort key values.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def cursor_paginate(
+    items: QuerySet, field: str, cursor: str | None, limit: int, desc: bool = False
+) -> tuple[list, str | None]:
+    """
+    Keyset-paginate a queryset ordered by `field` with `id` as a tie-breaker.
+
+    Unlike `paginate_books`, the cost of a page does not grow with its depth:
+    each page starts from the last (field, id) pair seen instead of an OFFSET.
+
+    Args:
+        items (QuerySet): The queryset to paginate.
+        field (str): A concrete, non-null model field to order by.
+        cursor (str | None): The cursor returned with the previous page.
+        limit (int): The number of items per page.
+        desc (bool, optional): Whether to walk in descending order.
+
+    Returns:
+        tuple[list, str | None]: The items of the page and the cursor for the
+                                 next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor)
+            last_value = items.model._meta.get_field(field).to_python(last_value)
+        except Exception as e:
+            raise ValueError("Invalid cursor") from e
+
+        op = "lt" if desc else "gt"
+        items = items.filter(
+            Q(**{f"{field}__{op}": last_value})
+            | Q(**{field: last_value, f"id__{op}": last_id})
+        )
+
+    prefix = "-" if desc else ""
+    # Fetch one extra row to know whether there is a next page
+    rows = list(items.order_by(f"{prefix}{field}", f"{prefix}id")[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last_value = getattr(rows[-1], field)
+    if hasattr(last_value, "isoformat"):
+        last_value = last_value.isoformat()
+    return rows, encode_cursor([last_value, rows[-1].id])
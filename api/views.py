@@ -1,29 +1,63 @@
 import csv
+import hashlib
 import json
+from datetime import timedelta
 from os import path
 
 from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import EmptyPage, Page, PageNotAnInteger
-from django.db import transaction
-from django.db.models import QuerySet
+from django.db import connection, transaction
+from django.db.models import F, Prefetch, QuerySet, Sum
 from django.db.models.functions import Lower
 from django.http import (FileResponse, Http404, HttpRequest, HttpResponse,
-                         JsonResponse)
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 
-from .models import Author, Book, Borrow, Genre
-from .utils import filter_books, paginate_books, sort_books
+from . import (analytics, audit, bulk, columnar, events, fuzzy, suggest, sync,
+               warmup)
+from .models import (Author, Book, Borrow, Borrower, BulkJob,
+                     CirculationRollup, Genre, LoanDurationBucket, Log,
+                     SearchTrigram)
+from .querylog import get_slow_query_log, summarize
+from .read_cache import cached_read
+from .responses import ApiJsonResponse
+from .text import fold_text, prefix_range, sort_key
+from .utils import (BOOK_DETAIL_FIELDS, BOOK_LIST_FIELDS, RankedBooks,
+                    book_filter_params, count_book_facets, cursor_paginate,
+                    filter_books, fuzzy_matches, paginate_books,
+                    parse_book_filters, parse_fields, select_book_fields,
+                    sort_books)
 
 
 def index(request) -> HttpResponse:
     return HttpResponse("Hello, world. You're at the api index.", status=200)
 
 
+def readiness(request: HttpRequest) -> JsonResponse:
+    """
+    Report whether this worker finished its warmup (see `api.warmup`), for load
+    balancer and orchestrator readiness checks: 200 once it has, 503 before.
+    Doesn't require a login and doesn't touch the database.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    ready = warmup.is_ready()
+    return ApiJsonResponse(
+        {"ready": ready, **(warmup.state if ready else {})},
+        status=200 if ready else 503,
+    )
+
+
 @login_required
+@cached_read
 def get_books(request: HttpRequest) -> JsonResponse:
     """
     Handle GET requests to fetch books with filtering, sorting, and pagination.
@@ -33,6 +67,9 @@ def get_books(request: HttpRequest) -> JsonResponse:
         - `q` (str, optional): Search query term.
         - `search_in` (str, optional): Scope of the search. Options: 'all' (default),
           'title', 'author'.
+        - `search_mode` (str, optional): 'contains' (default) matches the query as
+          a substring. 'fuzzy' tolerates typos, using a trigram index over titles
+          and author names, and sorts by relevance unless `sort_by` is given.
     - Filtering:
         - `filter_author` (str, optional, repeatable): Filters books by author name(s).
           Can be provided multiple times (
@@ -47,13 +84,25 @@ def get_books(request: HttpRequest) -> JsonResponse:
            be borrowed or not.
     - Sorting:
         - `sort_by` (str, optional): Field to sort books by. Defaults to 'id'.
-          Common options: 'title', 'author', 'date_added', 'borrower_name'.
+          Common options: 'title', 'author', 'date_added', 'borrower_name',
+          'relevance' (fuzzy search only).
         - `sort_desc` (str, optional):
                 Set to 'true' for descending order, 'false' (or omit) for ascending.
           Defaults to 'false'.
     - Pagination:
         - `pg_num` (int, optional): The page number to retrieve. Defaults to 1.
         - `pg_size` (int, optional): The number of books per page. Defaults to 20.
+    - Fields:
+        - `fields` (str, optional): Comma-separated book fields to return
+          (e.g., ?fields=id,title,borrowerName). Defaults to all fields. Joins and
+          lookups for fields that aren't requested are skipped.
+    - Mode:
+        - `mode` (str, optional): 'books' (default), 'ids', 'count' or
+          'facets'. 'ids' streams only the ids of the matching books, with
+          pages of up to 10000 ids (1000 by default). 'count' returns only the
+          number of matching books, cached for a few seconds unless
+          `exact=true` is given. 'facets' returns the number of matching books
+          per genre, author, borrowed status and allowBorrow.
 
     Returns:
         JsonResponse: A JSON object containing:
@@ -61,96 +110,61 @@ def get_books(request: HttpRequest) -> JsonResponse:
             - `current_page`: The current page number.
             - `total_pages`: The total number of pages available.
             - `total_items`: The total number of books matching the filters.
+
+        With `mode=ids`, a streamed JSON object containing `ids`, `currentPage`
+        and `hasNext`. With `mode=count`, a JSON object containing `totalItems`
+        and `cached`. With `mode=facets`, the JSON object of
+        `count_book_facets`.
     """
     if request.method != "GET":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
 
-    # Extract query parameters (search, filtering, sorting, pagination)
-    # Search parameters
-    search_query: str | None = request.GET.get("q", None)
-    search_scope: str = request.GET.get("search_in", "all").lower()
-
-    # Validate search_scope
-    allowed_search_scopes = ["all", "title", "author", "borrower"]
-    if search_scope not in allowed_search_scopes:
-        return JsonResponse(
-            {
-                "error": f"Invalid value for search_in parameter. Allowed values: {
-                    ', '.join(allowed_search_scopes)}"
-            },
-            status=400,
-        )
-
-    # Extract query parameters for filtering (prefixed with filter_)
-    filter_authors: list[str] = request.GET.getlist("filter_author", "")
-    filter_genres: list[str] = request.GET.getlist("filter_genre", "")
-    filter_borrowed_q: str = request.GET.get("filter_borrowed", "null").lower()
-    filter_allow_borrow_q: str = request.GET.get("filter_allow_borrow", "null").lower()
+    mode: str = request.GET.get("mode", "books").lower()
 
-    # Validate filter_borrowed parameter
-    allowed_filter_borrowed_values = ["true", "false", "null"]
-    if filter_borrowed_q not in allowed_filter_borrowed_values:
-        return JsonResponse(
+    # Validate mode
+    allowed_modes = ["books", "ids", "count", "facets"]
+    if mode not in allowed_modes:
+        return ApiJsonResponse(
             {
-                "error": (
-                    f"Invalid value for filter_borrowed parameter. Allowed values: {
-                        ', '.join(allowed_filter_borrowed_values)}"
-                )
+                "error": f"Invalid value for mode parameter. Allowed values: {
+                    ', '.join(allowed_modes)}"
             },
             status=400,
         )
 
-    # Convert filter_borrowed parameter to boolean if provided
-    # If filter_borrowed_q is not "true" or "false", set it to None
-    filter_borrowed = (
-        filter_borrowed_q == "true" if filter_borrowed_q in ["true", "false"] else None
-    )
-
-    # Validate filter_allowborrow parameter
-    allowed_filter_allowborrow_values = ["true", "false", "null"]
-    if filter_allow_borrow_q not in allowed_filter_allowborrow_values:
-        return JsonResponse(
-            {
-                "error": (
-                    f"Invalid value for filter_allowborrow parameter. Allowed values: {
-                        ', '.join(allowed_filter_allowborrow_values)}"
-                )
-            },
-            status=400,
-        )
+    # Extract query parameters (search, filtering, sorting, pagination)
+    # Search and filtering parameters
+    try:
+        filters: dict = parse_book_filters(request.GET)
+    except ValueError as e:
+        return ApiJsonResponse({"error": str(e)}, status=400)
 
-    # Convert filter_allowborrow parameter to boolean if provided
-    # If filter_allowborrow_q is not "true" or "false", set it to None
-    filter_allowborrow = (
-        filter_allow_borrow_q == "true"
-        if filter_allow_borrow_q in ["true", "false"]
-        else None
-    )
+    if mode == "count":
+        return _count_books(filters, request.GET.get("exact", "false") == "true")
 
-    # Create a dictionary to hold the filter criteria
-    filters: dict = {
-        "query": search_query,
-        "search_scope": search_scope,
-        "authors": filter_authors,
-        "genres": filter_genres,
-        "borrowed": filter_borrowed,
-        "allowborrow": filter_allowborrow,
-    }
+    if mode == "facets":
+        return _book_facets(filters)
 
     # Extract query parameters for sorting (prefixed with sort_)
-    sort_by: str = request.GET.get("sort_by", "title")
+    # Fuzzy matches come best first unless another order is asked for
+    default_sort = (
+        "relevance"
+        if filters["search_mode"] == "fuzzy" and filters["query"]
+        else "title"
+    )
+    sort_by: str = request.GET.get("sort_by", default_sort)
     sort_desc: bool = request.GET.get("sort_desc", "false").lower() == "true"
 
     try:
         # Extract query parameters for pagination (prefixed with pg_)
         pg_num_str: str = request.GET.get("pg_num", "1")
-        pg_size_str: str = request.GET.get("pg_size", "20")
+        pg_size_str: str = request.GET.get("pg_size", "1000" if mode == "ids" else "20")
 
         pg_num: int = int(pg_num_str)
         pg_size: int = int(pg_size_str)
 
         if pg_num < 1 or pg_size < 1:
-            return JsonResponse(
+            return ApiJsonResponse(
                 {
                     "error": (
                         "Page number (pg_num) and page size (pg_size) "
@@ -160,42 +174,63 @@ def get_books(request: HttpRequest) -> JsonResponse:
                 status=400,
             )
 
-        MAX_PAGE_SIZE = 50
+        MAX_PAGE_SIZE = 10000 if mode == "ids" else 50
 
         if pg_size > MAX_PAGE_SIZE:
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": f"Page size cannot exceed {MAX_PAGE_SIZE}."}, status=400
             )
 
     except ValueError:
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "Invalid parameters: pg_num and pg_size must be integers."},
             status=400,
         )
 
-    # Fetch, filter, sort, paginate
-    books_qs: QuerySet = (
-        Book.objects.select_related("author")
-        .prefetch_related("genres", "borrow_set")
-        .all()
-    )
+    # Searched once here when the matches are also needed to rank them
+    matches = fuzzy_matches(filters) if sort_by == "relevance" else None
+
+    if mode == "ids":
+        books_qs = filter_books(Book.objects.all(), filters, matches)
+        if matches is not None:
+            ranked = RankedBooks(books_qs, matches, sort_desc)
+            return _stream_book_ids(ranked, pg_num, pg_size)
+        books_qs = sort_books(books_qs, sort_by, sort_desc)
+        return _stream_book_ids(books_qs, pg_num, pg_size)
 
-    books_qs = filter_books(books_qs, filters)  # Apply filters
-    books_qs = sort_books(books_qs, sort_by, sort_desc)  # Apply sorting
+    try:
+        fields: list[str] = parse_fields(request.GET.get("fields"), BOOK_LIST_FIELDS)
+    except ValueError as e:
+        return ApiJsonResponse({"error": str(e)}, status=400)
 
-    # Paginate
+    # Fetch, filter, sort, paginate
     try:
-        page: Page = paginate_books(books_qs, pg_num, pg_size)
+        page: Page | None = None
+        if settings.CATALOG_ENGINE == "columnar":
+            page = _columnar_page(filters, sort_by, sort_desc, pg_num, pg_size, fields)
+
+        if page is None:
+            books_qs: QuerySet = select_book_fields(Book.objects.all(), fields)
+
+            books_qs = filter_books(books_qs, filters, matches)  # Apply filters
+            if matches is not None:
+                # Best matches first, ranked outside the database
+                page = paginate_books(
+                    RankedBooks(books_qs, matches, sort_desc), pg_num, pg_size
+                )
+            else:
+                books_qs = sort_books(books_qs, sort_by, sort_desc)  # Apply sorting
+                page = paginate_books(books_qs, pg_num, pg_size)
     except PageNotAnInteger:
-        return JsonResponse({"error": "Page number must be an integer."}, status=400)
+        return ApiJsonResponse({"error": "Page number must be an integer."}, status=400)
     except EmptyPage:
         # Return 404 if the requested page is out of range
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": f"Invalid page number. Page {pg_num} does not exist."}, status=404
         )
     except Exception as e:
         print(e)
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "An error occurred. Please try again."}, status=500
         )
 
@@ -203,27 +238,37 @@ def get_books(request: HttpRequest) -> JsonResponse:
     result: list[dict] = []
 
     for book in page.object_list:
-        borrow_info = book.borrow_set.filter(is_borrowed=True).first()
-
-        borrower_name: str | None = borrow_info.borrower_name if borrow_info else None
-
-        result.append(
-            {
-                "id": book.id,
-                "title": book.title,
-                "author": (
+        book_info: dict = {}
+
+        for field in fields:
+            if field == "id":
+                book_info["id"] = book.id
+            elif field == "title":
+                book_info["title"] = book.title
+            elif field == "author":
+                book_info["author"] = (
                     {"id": book.author.id, "name": book.author.name}
                     if book.author
                     else None
-                ),
-                "dateAdded": book.date_added.isoformat(),
-                "genres": [genre for genre in book.genres.all().values("id", "name")],
-                "borrowerName": borrower_name,
-                "allowBorrow": book.allow_borrow,
-            }
-        )
+                )
+            elif field == "dateAdded":
+                book_info["dateAdded"] = book.date_added.isoformat()
+            elif field == "genres":
+                book_info["genres"] = [
+                    {"id": genre.id, "name": genre.name} for genre in book.genres.all()
+                ]
+            elif field == "borrowerName":
+                book_info["borrowerName"] = (
+                    book.active_borrows[0].borrower_name
+                    if book.active_borrows
+                    else None
+                )
+            elif field == "allowBorrow":
+                book_info["allowBorrow"] = book.allow_borrow
+
+        result.append(book_info)
 
-    return JsonResponse(
+    return ApiJsonResponse(
         {
             "books": result,
             "currentPage": page.number,
@@ -233,81 +278,428 @@ def get_books(request: HttpRequest) -> JsonResponse:
     )
 
 
+def _columnar_page(
+    filters: dict,
+    sort_by: str,
+    sort_desc: bool,
+    pg_num: int,
+    pg_size: int,
+    fields: list[str],
+) -> Page | None:
+    """
+    Filter, sort and paginate in the in-memory catalog (`api.columnar`), then
+    read only the books of the page. None if the catalog can't answer.
+
+    Raises:
+        EmptyPage: If the page number is out of range.
+    """
+    page = columnar.catalog.page(filters, sort_by, sort_desc, pg_num, pg_size)
+    if page is None:
+        return None
+
+    books = {
+        book.id: book
+        for book in select_book_fields(
+            Book.objects.filter(pk__in=page.object_list), fields
+        )
+    }
+    # Keep the catalog's order; a book deleted in the meantime is left out
+    page.object_list = [
+        books[book_id] for book_id in page.object_list if book_id in books
+    ]
+    return page
+
+
+def _count_books(filters: dict, exact: bool) -> JsonResponse:
+    """
+    Respond with the number of books matching `filters`.
+
+    Counts are cached in `BOOK_COUNT_CACHE_ALIAS` for `BOOK_COUNT_CACHE_TIMEOUT`
+    seconds per set of filters; `exact` skips the cache and refreshes it.
+    """
+    cache = caches[settings.BOOK_COUNT_CACHE_ALIAS]
+    key = (
+        "book-count:"
+        + hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    )
+
+    count = None if exact else cache.get(key)
+    cached = count is not None
+    if not cached:
+        if settings.CATALOG_ENGINE == "columnar":
+            count = columnar.catalog.count(filters)
+        if count is None:
+            count = filter_books(Book.objects.all(), filters).count()
+        cache.set(key, count, settings.BOOK_COUNT_CACHE_TIMEOUT)
+
+    return ApiJsonResponse({"totalItems": count, "cached": cached})
+
+
+def _book_facets(filters: dict) -> JsonResponse:
+    """Respond with the facet counts of the books matching `filters`."""
+    facets = None
+    if settings.CATALOG_ENGINE == "columnar":
+        facets = columnar.catalog.facets(filters)
+    if facets is None:
+        facets = count_book_facets(Book.objects.all(), filters)
+    return ApiJsonResponse(facets)
+
+
+def _stream_book_ids(
+    books: QuerySet | RankedBooks, pg_num: int, pg_size: int
+) -> HttpResponse:
+    """
+    Stream the ids of a page of `books` as `{"ids": [...], ...}`.
+
+    Only the id column is read, in chunks, and no count query is needed: one
+    extra id is fetched to tell whether there is a next page.
+    """
+    offset = (pg_num - 1) * pg_size
+    if isinstance(books, RankedBooks):
+        ids = books.ids[offset : offset + pg_size + 1]
+    else:
+        ids = books.values_list("id", flat=True)[
+            offset : offset + pg_size + 1
+        ].iterator(chunk_size=2000)
+
+    def chunks():
+        yield b'{"ids":['
+        has_next = False
+        batch: list[str] = []
+        separator = b""
+        for sent, book_id in enumerate(ids):
+            if sent == pg_size:
+                has_next = True
+                break
+            batch.append(str(book_id))
+            if len(batch) == 2000:
+                yield separator + ",".join(batch).encode()
+                batch, separator = [], b","
+        if batch:
+            yield separator + ",".join(batch).encode()
+        yield f'],"currentPage":{pg_num},"hasNext":{json.dumps(has_next)}}}'.encode()
+
+    return StreamingHttpResponse(chunks(), content_type="application/json")
+
+
 @login_required
+@cached_read
 def get_book(request: HttpRequest, book_id: int) -> JsonResponse:
     """
     Handle GET requests to fetch details for a specific book, including borrow history.
+
+    Query Parameters:
+        - `fields` (str, optional): Comma-separated book fields to return
+          (e.g., ?fields=id,title,borrow). Defaults to all fields.
+
+    The book's `version` is also sent as the `ETag` header, for `If-Match` on
+    `edit_book`.
     """
     if request.method != "GET":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
 
     try:
-        book = get_object_or_404(Book, pk=book_id)
-    except Http404:
-        return JsonResponse({"error": f"Book with id {book_id} not found"}, status=404)
+        fields: list[str] = parse_fields(request.GET.get("fields"), BOOK_DETAIL_FIELDS)
+    except ValueError as e:
+        return ApiJsonResponse({"error": str(e)}, status=400)
 
     try:
-        # Fetch borrow for book with is_borrowed=True
-        borrow = Borrow.objects.filter(book=book, is_borrowed=True).first()
-
-        # Convert borrow object to dictionary
-        borrow_info_dict = (
-            {
-                "id": borrow.id,
-                "borrowerName": borrow.borrower_name,
-                "borrowedDate": borrow.borrowed_date.isoformat(),
-                "isCurrentlyBorrowed": borrow.is_borrowed,
-            }
-            if borrow
-            else {
-                "id": None,
-                "borrowerName": None,
-                "borrowedDate": None,
-                "isCurrentlyBorrowed": False,
-            }
+        book = get_object_or_404(
+            select_book_fields(Book.objects.all(), fields), pk=book_id
+        )
+    except Http404:
+        return ApiJsonResponse(
+            {"error": f"Book with id {book_id} not found"}, status=404
         )
 
+    try:
         # Format the result for the specific book
-        result = {
-            "id": book.id,
-            "title": book.title,
-            "author": (
-                {"id": book.author.id, "name": book.author.name}
-                if book.author
-                else None
-            ),
-            "genres": [
-                {"id": genre.id, "name": genre.name} for genre in book.genres.all()
-            ],
-            "allowBorrow": book.allow_borrow,
-            "dateAdded": book.date_added.isoformat(),
-            "borrow": borrow_info_dict,
-        }
+        result: dict = {}
+
+        for field in fields:
+            if field == "id":
+                result["id"] = book.id
+            elif field == "title":
+                result["title"] = book.title
+            elif field == "author":
+                result["author"] = (
+                    {"id": book.author.id, "name": book.author.name}
+                    if book.author
+                    else None
+                )
+            elif field == "genres":
+                result["genres"] = [
+                    {"id": genre.id, "name": genre.name} for genre in book.genres.all()
+                ]
+            elif field == "allowBorrow":
+                result["allowBorrow"] = book.allow_borrow
+            elif field == "dateAdded":
+                result["dateAdded"] = book.date_added.isoformat()
+            elif field == "version":
+                result["version"] = book.version
+            elif field == "borrow":
+                # The borrow with is_borrowed=True, if any
+                borrow = book.active_borrows[0] if book.active_borrows else None
+
+                # Convert borrow object to dictionary
+                result["borrow"] = (
+                    {
+                        "id": borrow.id,
+                        "borrowerName": borrow.borrower_name,
+                        "borrowedDate": borrow.borrowed_date.isoformat(),
+                        "isCurrentlyBorrowed": borrow.is_borrowed,
+                    }
+                    if borrow
+                    else {
+                        "id": None,
+                        "borrowerName": None,
+                        "borrowedDate": None,
+                        "isCurrentlyBorrowed": False,
+                    }
+                )
 
-        return JsonResponse({"book": result})
+        response = ApiJsonResponse({"book": result})
+        if "version" in result:
+            # For If-Match on edit_book
+            response["ETag"] = f'"{book.version}"'
+        return response
 
     except Exception as e:
         # Log the exception e for debugging
         print(f"Unexpected error in get_book: {e}")  # Basic logging
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "An unexpected server error occurred"}, status=500
         )
 
 
 @login_required
+@cached_read
+def get_book_borrows(request: HttpRequest, book_id: int) -> JsonResponse:
+    """
+    Handle GET requests to fetch the full borrow history of a book.
+
+    History is paginated with an opaque cursor over `(borrowed_date, id)`, so
+    every page is an index range scan no matter how many loans a book has had.
+    Aggregate stats come from counters kept on the book.
+
+    Query Parameters:
+        - `order` (str, optional): 'desc' (newest first, default) or 'asc'.
+        - `cursor` (str, optional): The `nextCursor` of the previous page.
+        - `limit` (int, optional): Borrows per page. Defaults to 50, max 200.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `bookId`: The book's ID.
+            - `borrows`: The borrow records of this page.
+            - `nextCursor`: Cursor for the next page, or null on the last page.
+            - `stats`: `timesBorrowed`, `timesReturned` and
+              `averageLoanSeconds` (null if the book was never returned).
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    order = request.GET.get("order", "desc").lower()
+    if order not in ["asc", "desc"]:
+        return ApiJsonResponse(
+            {"error": "Invalid value for order parameter. Allowed values: asc, desc"},
+            status=400,
+        )
+
+    MAX_LIMIT = 200
+
+    try:
+        limit = int(request.GET.get("limit", "50"))
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {"error": f"limit must be an integer between 1 and {MAX_LIMIT}"},
+            status=400,
+        )
+
+    book = (
+        Book.objects.filter(pk=book_id)
+        .only("id", "times_borrowed", "times_returned", "total_loan_seconds")
+        .first()
+    )
+    if book is None:
+        return ApiJsonResponse(
+            {"error": f"Book with id {book_id} not found"}, status=404
+        )
+
+    try:
+        borrows, next_cursor = cursor_paginate(
+            Borrow.objects.filter(book_id=book_id),
+            "borrowed_date",
+            request.GET.get("cursor"),
+            limit,
+            desc=order == "desc",
+        )
+    except ValueError:
+        return ApiJsonResponse({"error": "Invalid cursor"}, status=400)
+
+    return ApiJsonResponse(
+        {
+            "bookId": book.id,
+            "borrows": [
+                {
+                    "id": borrow.id,
+                    "borrowerName": borrow.borrower_name,
+                    "borrowedDate": borrow.borrowed_date.isoformat(),
+                    "returnedDate": (
+                        borrow.returned_date.isoformat()
+                        if borrow.returned_date
+                        else None
+                    ),
+                    "isCurrentlyBorrowed": borrow.is_borrowed,
+                }
+                for borrow in borrows
+            ],
+            "nextCursor": next_cursor,
+            "stats": {
+                "timesBorrowed": book.times_borrowed,
+                "timesReturned": book.times_returned,
+                "averageLoanSeconds": book.average_loan_seconds,
+            },
+        }
+    )
+
+
+@login_required
+@cached_read
 def get_authors(request: HttpRequest) -> JsonResponse:
     # order by number of books
     authors = Author.objects.all().order_by(Lower("name"))
     result: list[dict] = [{"id": author.id, "name": author.name} for author in authors]
-    return JsonResponse({"authors": result})
+    return ApiJsonResponse({"authors": result})
 
 
 @login_required
+@cached_read
 def get_genres(request: HttpRequest) -> JsonResponse:
     # order by number of books
     genres = Genre.objects.all().order_by(Lower("name"))
     result: list[dict] = [{"id": genre.id, "name": genre.name} for genre in genres]
-    return JsonResponse({"genres": result})
+    return ApiJsonResponse({"genres": result})
+
+
+@login_required
+@cached_read
+def get_borrowers(request: HttpRequest) -> JsonResponse:
+    """
+    Handle GET requests to look up borrowers by name prefix.
+
+    Both the prefix search (on the indexed, folded name) and the "currently
+    holds" lists (on the `(borrower, is_borrowed)` index) are index range scans,
+    so lookups stay fast regardless of how long the borrow history is.
+
+    Query Parameters:
+        - `q` (str, optional): Name prefix; case, accents and extra whitespace
+          are ignored.
+        - `holds` (str, optional): 'true' (default) to include the books each
+          borrower currently holds, 'false' to skip them.
+        - `limit` (int, optional): Maximum number of borrowers. Defaults to 20,
+          max 100.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `borrowers`: Matching borrowers ordered by name, each with `id`,
+              `name` and (unless disabled) `holds`.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    MAX_LIMIT = 100
+
+    try:
+        limit = int(request.GET.get("limit", "20"))
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {"error": f"limit must be an integer between 1 and {MAX_LIMIT}"},
+            status=400,
+        )
+
+    include_holds = request.GET.get("holds", "true").lower() == "true"
+
+    borrowers_qs: QuerySet = Borrower.objects.all()
+
+    prefix = fold_text(request.GET.get("q", ""))
+    if prefix:
+        low, high = prefix_range(prefix)
+        borrowers_qs = borrowers_qs.filter(search_name__gte=low, search_name__lt=high)
+
+    borrowers = list(
+        borrowers_qs.order_by("search_name", "id").values("id", "name")[:limit]
+    )
+
+    if include_holds:
+        holds: dict[int, list[dict]] = {borrower["id"]: [] for borrower in borrowers}
+        for borrow in (
+            Borrow.objects.filter(borrower_id__in=holds.keys(), is_borrowed=True)
+            .order_by("borrowed_date")
+            .values("borrower_id", "book_id", "book__title", "borrowed_date")
+        ):
+            holds[borrow["borrower_id"]].append(
+                {
+                    "bookId": borrow["book_id"],
+                    "title": borrow["book__title"],
+                    "borrowedDate": borrow["borrowed_date"].isoformat(),
+                }
+            )
+
+        for borrower in borrowers:
+            borrower["holds"] = holds[borrower["id"]]
+
+    return ApiJsonResponse({"borrowers": borrowers})
+
+
+@login_required
+def get_suggestions(request: HttpRequest) -> JsonResponse:
+    """
+    Handle GET requests for search-as-you-type suggestions.
+
+    Suggestions come from an in-memory prefix index of the catalog kept by each
+    worker (see `api.suggest`), so a lookup doesn't query the database beyond
+    an occasional check for changes.
+
+    Query Parameters:
+        - `q` (str): What the user typed so far. Matches the start of any word of
+          a title, author name or genre name; case and accents are ignored.
+        - `limit` (int, optional): Maximum number of suggestions. Defaults to 10,
+          max 50.
+        - `stats` (str, optional): 'true' to include the size of the index.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `suggestions`: Each with `type` ('title', 'author' or 'genre'),
+              `id` and `text`, best first.
+            - `index` (with `stats=true`): `entries`, `items` and `bytes`, the
+              approximate memory used by the index.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    MAX_LIMIT = 50
+
+    try:
+        limit = int(request.GET.get("limit", "10"))
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {"error": f"limit must be an integer between 1 and {MAX_LIMIT}"},
+            status=400,
+        )
+
+    result: dict = {
+        "suggestions": suggest.suggest(request.GET.get("q", ""), limit),
+    }
+    if request.GET.get("stats", "false").lower() == "true":
+        result["index"] = suggest.index.stats()
+
+    return ApiJsonResponse(result)
 
 
 @login_required
@@ -316,12 +708,12 @@ def add_book(request: HttpRequest) -> JsonResponse:
     Adds a new book. Expects JSON data in the request body.
     """
     if request.method != "POST":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
 
     try:
         data = json.loads(request.body)
     except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
 
     title = data.get("title")
     author_id = data.get("author")
@@ -329,14 +721,14 @@ def add_book(request: HttpRequest) -> JsonResponse:
     allow_borrow = data.get("allowBorrow", "true") == "true"
 
     if not title:
-        return JsonResponse({"error": "Title is required"}, status=400)
+        return ApiJsonResponse({"error": "Title is required"}, status=400)
 
     author = None
     try:
         if author_id:
             author = Author.objects.get(pk=author_id)
     except Author.DoesNotExist:
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": f"Author with id {author_id} not found"}, status=404
         )
 
@@ -345,24 +737,39 @@ def add_book(request: HttpRequest) -> JsonResponse:
         genre_objects = Genre.objects.filter(pk__in=genre_ids)
 
         if len(genre_objects) != len(genre_ids):
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": "Invalid genre_ids provided"},
                 status=404,
             )
 
     else:
-        return JsonResponse({"error": "At least one genre is required"}, status=400)
+        return ApiJsonResponse({"error": "At least one genre is required"}, status=400)
 
     try:
-        # --- Create Book ---
-        book = Book(title=title, author=author, allow_borrow=allow_borrow)
-        book.save()
-        book.genres.set(genre_objects)
+        # --- Create Book, announced in the same transaction ---
+        with transaction.atomic():
+            book = Book(title=title, author=author, allow_borrow=allow_borrow)
+            book.save()
+            book.genres.set(genre_objects)
+            events.emit(events.BOOK_CREATED, book.id, {"book": events.book_data(book)})
     except Exception as e:
         print(f"Unexpected error in add_book: {e}")
-        return JsonResponse({"error": "Something went wrong"}, status=500)
+        return ApiJsonResponse({"error": "Something went wrong"}, status=500)
+
+    audit.record(
+        request,
+        "book.create",
+        book.id,
+        {
+            "title": book.title,
+            "authorId": author.id if author else None,
+            "genreIds": [genre.id for genre in genre_objects],
+            "allowBorrow": book.allow_borrow,
+        },
+        description=f"Added book '{book.title}'",
+    )
 
-    return JsonResponse(
+    return ApiJsonResponse(
         {"message": "Book added successfully!", "book_id": book.id}, status=201
     )
 
@@ -402,17 +809,17 @@ def add_author_genre(request: HttpRequest, type=None) -> JsonResponse:
 
     """
     if request.method != "POST":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
 
     try:
         data = json.loads(request.body)
     except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
 
     name = data.get("name")
 
     if not name:
-        return JsonResponse({"error": "Name is required"}, status=400)
+        return ApiJsonResponse({"error": "Name is required"}, status=400)
 
     models_choise = {
         "author": Author,
@@ -428,7 +835,7 @@ def add_author_genre(request: HttpRequest, type=None) -> JsonResponse:
         # Check if the object already exists
         existing_object = model.objects.filter(name__iexact=name.strip()).first()
         if existing_object:
-            return JsonResponse(
+            return ApiJsonResponse(
                 {
                     "message": f"{type.capitalize()} already exists!",
                     type: {"id": existing_object.id, "name": existing_object.name},
@@ -436,9 +843,22 @@ def add_author_genre(request: HttpRequest, type=None) -> JsonResponse:
                 status=200,
             )
 
-        new_object = model(name=name)
-        new_object.save()
-        return JsonResponse(
+        with transaction.atomic():
+            new_object = model(name=name)
+            new_object.save()
+            events.emit(
+                events.AUTHOR_CREATED if type == "author" else events.GENRE_CREATED,
+                data={"id": new_object.id, "name": new_object.name},
+            )
+
+        audit.record(
+            request,
+            f"{type}.create",
+            payload={"id": new_object.id, "name": new_object.name},
+            description=f"Added {type} '{new_object.name}'",
+        )
+
+        return ApiJsonResponse(
             {
                 "message": f"{type.capitalize()} added successfully!",
                 type: {"id": new_object.id, "name": new_object.name},
@@ -447,7 +867,7 @@ def add_author_genre(request: HttpRequest, type=None) -> JsonResponse:
         )
     except Exception as e:
         print(f"Unexpected error in add_author_genre: {e}")
-        return JsonResponse({"error": "Something went wrong"}, status=500)
+        return ApiJsonResponse({"error": "Something went wrong"}, status=500)
 
 
 @login_required
@@ -457,21 +877,33 @@ def delete_book(request: HttpRequest, book_id: int) -> JsonResponse:
     Requires book_id in the URL path.
     """
     if request.method != "DELETE":
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "Invalid request method. Use DELETE."}, status=405
         )
 
     try:
         book = get_object_or_404(Book, pk=book_id)  # Use get_object_or_404(pk=book_id)
-        book.delete()
+        with transaction.atomic():
+            book.delete()
+            events.emit(events.BOOK_DELETED, book_id)
+
+        audit.record(
+            request,
+            "book.delete",
+            book_id,
+            {"title": book.title},
+            description=f"Deleted book '{book.title}'",
+        )
     except Http404:
-        return JsonResponse({"error": f"Book with id {book_id} not found"}, status=404)
+        return ApiJsonResponse(
+            {"error": f"Book with id {book_id} not found"}, status=404
+        )
     except Exception as e:
         print(e)
         # Log the exception e
-        return JsonResponse({"error": "Something went wrong"}, status=500)
+        return ApiJsonResponse({"error": "Something went wrong"}, status=500)
 
-    return JsonResponse({"message": "Book deleted successfully!"}, status=200)
+    return ApiJsonResponse({"message": "Book deleted successfully!"}, status=200)
 
 
 @login_required
@@ -481,28 +913,30 @@ def borrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
     Expects JSON: {"borrowerName": str}
     """
     if request.method != "PUT":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
 
     try:
         data = json.loads(request.body)
         borrower_name = data.get("borrowerName")
     except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
 
     # --- Validate Input ---
     if not borrower_name:
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "Missing required field borrowerName"}, status=400
         )
 
     try:
         book = get_object_or_404(Book, pk=book_id)
     except Http404:
-        return JsonResponse({"error": f"Book with id {book_id} not found"}, status=404)
+        return ApiJsonResponse(
+            {"error": f"Book with id {book_id} not found"}, status=404
+        )
 
     if not book.allow_borrow:
         # 409 Conflict
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "This book is not allowed to be borrowed"}, status=409
         )
 
@@ -510,7 +944,7 @@ def borrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
         # Check if already borrowed (active borrow record exists)
         if Borrow.objects.filter(book=book, is_borrowed=True).exists():
             # 409 Conflict
-            return JsonResponse({"error": "Book is already borrowed"}, status=409)
+            return ApiJsonResponse({"error": "Book is already borrowed"}, status=409)
 
         # --- Create Borrow Record ---
         # borrowed_date is automatically set by the model
@@ -519,9 +953,27 @@ def borrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
             borrower_name=borrower_name,
             is_borrowed=True,
         )
-        borrow.save()
+        with transaction.atomic():
+            borrow.save()
+            Book.objects.filter(pk=book.pk).update(
+                times_borrowed=F("times_borrowed") + 1
+            )
+            analytics.record_loan(book.pk, borrow.borrowed_date)
+            events.emit(
+                events.BOOK_BORROWED,
+                book.pk,
+                {"borrowId": borrow.id, "borrowerName": borrow.borrower_name},
+            )
+
+        audit.record(
+            request,
+            "book.borrow",
+            book.id,
+            {"borrowId": borrow.id, "borrowerName": borrow.borrower_name},
+            description=f"'{book.title}' borrowed by {borrow.borrower_name}",
+        )
 
-        return JsonResponse(
+        return ApiJsonResponse(
             {
                 "message": "Book borrowed successfully!",
                 "borrowName": borrow.borrower_name,
@@ -532,7 +984,7 @@ def borrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
     except Exception as e:
         # Log the exception e
         print(f"Unexpected error in set_borrow: {e}")  # Basic logging
-        return JsonResponse({"error": "An unexpected error occurred"}, status=500)
+        return ApiJsonResponse({"error": "An unexpected error occurred"}, status=500)
 
 
 @login_required
@@ -543,7 +995,9 @@ def unborrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
     """
     # Note: Typically PUT or PATCH. Using PUT here for simplicity.
     if request.method != "PUT":
-        return JsonResponse({"error": "Invalid request method. Use PUT."}, status=405)
+        return ApiJsonResponse(
+            {"error": "Invalid request method. Use PUT."}, status=405
+        )
 
     try:
         # --- Find Borrow Record ---
@@ -551,42 +1005,73 @@ def unborrow_book(request: HttpRequest, book_id: int) -> JsonResponse:
 
         if not borrow:
             # book currently not borrowed
-            return JsonResponse({"error": "Book is not currently borrowed"}, status=404)
+            return ApiJsonResponse(
+                {"error": "Book is not currently borrowed"}, status=404
+            )
 
         returned_date = timezone.now()
 
         # --- Update Borrow Record ---
         if returned_date < borrow.borrowed_date:
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": "Returned date cannot be earlier than borrowed date"},
                 status=400,
             )
 
         borrow.is_borrowed = False
         borrow.returned_date = returned_date
-        borrow.save()
+        loan_seconds = (returned_date - borrow.borrowed_date).total_seconds()
+        with transaction.atomic():
+            borrow.save()
+            Book.objects.filter(pk=borrow.book_id).update(
+                times_returned=F("times_returned") + 1,
+                total_loan_seconds=F("total_loan_seconds") + loan_seconds,
+            )
+            analytics.record_return(
+                borrow.book_id, borrow.borrowed_date, borrow.returned_date
+            )
+            events.emit(events.BOOK_RETURNED, borrow.book_id, {"borrowId": borrow.id})
+
+        audit.record(
+            request,
+            "book.return",
+            borrow.book_id,
+            {"borrowId": borrow.id, "borrowerName": borrow.borrower_name},
+            description=f"Book {borrow.book_id} returned by {borrow.borrower_name}",
+        )
 
-        return JsonResponse(
+        return ApiJsonResponse(
             {"message": "Book returned successfully!", "borrow_id": borrow.id},
             status=200,
         )
 
     except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
     except Exception as e:
         print(e)
         # Log the exception e
-        return JsonResponse({"error": "An unexpected error occurred"}, status=500)
+        return ApiJsonResponse({"error": "An unexpected error occurred"}, status=500)
 
 
 # --- Helper Functions for edit_book ---
-def _update_basic_book_fields(book: Book, data: dict) -> JsonResponse | None:
-    """Updates basic fields like title and allow_borrow."""
+def _update_basic_book_fields(
+    book: Book, data: dict, changes: dict, is_borrowed: bool
+) -> JsonResponse | None:
+    """Collects changes to basic fields like title and allow_borrow."""
     if "title" in data:
         title = data["title"]
         if not title:  # Basic validation
-            return JsonResponse({"error": "Title cannot be empty"}, status=400)
-        book.title = title
+            return ApiJsonResponse({"error": "Title cannot be empty"}, status=400)
+        # The column's own validation, as full_clean() would run it
+        try:
+            title = Book._meta.get_field("title").clean(title, book)
+        except ValidationError as e:
+            raise ValidationError({"title": e.messages})
+        if title != book.title:
+            changes["title"] = title
+            # update() bypasses Book.save, which keeps the sort keys
+            changes["title_sort_key"] = sort_key(title)
+            changes["title_search"] = fold_text(title)
 
     if "allowBorrow" in data:
         # Ensure it's explicitly converted to bool
@@ -597,8 +1082,8 @@ def _update_basic_book_fields(book: Book, data: dict) -> JsonResponse | None:
 
         # Check if the book is borrowed, and if it is borrwed, then cannot set
         # allow_borrow to false
-        if not allow_borrow_value and book.borrow_set.filter(is_borrowed=True).exists():
-            return JsonResponse(
+        if not allow_borrow_value and is_borrowed:
+            return ApiJsonResponse(
                 {
                     "error": (
                         "Cannot set allow_borrow to false while the book is borrowed"
@@ -606,40 +1091,47 @@ def _update_basic_book_fields(book: Book, data: dict) -> JsonResponse | None:
                 },
                 status=400,
             )
-        else:
-            book.allow_borrow = allow_borrow_value
+        elif allow_borrow_value != book.allow_borrow:
+            changes["allow_borrow"] = allow_borrow_value
     return None  # Indicate success
 
 
-def _update_book_author(book: Book, data: dict) -> JsonResponse | None:
-    """Updates the book's author."""
+def _update_book_author(book: Book, data: dict, changes: dict) -> JsonResponse | None:
+    """Collects a change of the book's author."""
     if "author_id" in data:
         author_id = data["author_id"]
         if author_id is None:
-            book.author = None
+            if book.author_id is not None:
+                changes["author"] = None
+                changes["author_sort_key"] = ""
         else:
             try:
                 # Ensure author_id is an integer if it's not None
                 author_id_int = int(author_id)
-                author = Author.objects.get(pk=author_id_int)
-                book.author = author
+                if author_id_int != book.author_id:
+                    author = Author.objects.only("id", "name").get(pk=author_id_int)
+                    changes["author"] = author
+                    changes["author_sort_key"] = sort_key(author.name, articles=())
             except Author.DoesNotExist:
-                return JsonResponse(
+                return ApiJsonResponse(
                     {"error": f"Author with id {author_id} not found"}, status=404
                 )
             except (ValueError, TypeError):
-                return JsonResponse(
+                return ApiJsonResponse(
                     {"error": f"Invalid author_id format: {author_id}"}, status=400
                 )
     return None  # Indicate success
 
 
-def _update_book_genres(book: Book, data: dict) -> JsonResponse | None:
-    """Updates the book's genres."""
+def _update_book_genres(book: Book, data: dict, changes: dict) -> JsonResponse | None:
+    """
+    Collects a change of the book's genres, as the new list of genres under the
+    `genres` key.
+    """
     if "genre_ids" in data:
         genre_ids = data["genre_ids"]
         if not isinstance(genre_ids, list):
-            return JsonResponse({"error": "genre_ids must be a list"}, status=400)
+            return ApiJsonResponse({"error": "genre_ids must be a list"}, status=400)
 
         # Validate and fetch all genres at once
         valid_genre_ids = []
@@ -647,27 +1139,63 @@ def _update_book_genres(book: Book, data: dict) -> JsonResponse | None:
             try:
                 valid_genre_ids.append(int(gid))
             except (ValueError, TypeError):
-                return JsonResponse(
+                return ApiJsonResponse(
                     {"error": f"Invalid genre_id format in list: {gid}"}, status=400
                 )
 
         # Fetch genres matching the provided IDs
-        genres = list(Genre.objects.filter(pk__in=valid_genre_ids))
+        genres = list(Genre.objects.filter(pk__in=valid_genre_ids).only("id", "name"))
 
         # Check if all requested genres were found
         if len(genres) != len(valid_genre_ids):
             # Find which IDs were missing (more informative error)
             found_ids = {genre.id for genre in genres}
             missing_ids = [gid for gid in valid_genre_ids if gid not in found_ids]
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": f"Genres with the following ids not found: {missing_ids}"},
                 status=404,  # Or 400, arguably bad data provided by client
             )
 
-        book.genres.set(genres)  # .set() handles add/remove efficiently
+        # Genres are prefetched with the book
+        if {genre.id for genre in genres} != {genre.id for genre in book.genres.all()}:
+            changes["genres"] = genres
     return None  # Indicate success
 
 
+def _parse_expected_version(request: HttpRequest, data: dict) -> tuple[int, int] | None:
+    """
+    Reads the version the client expects the book to be at, from the `If-Match`
+    header or the `expectedVersion` body field.
+
+    Returns `(version, status)` where `status` is the one to answer with when the
+    book has moved on (412 for If-Match, 409 for expectedVersion), or None when
+    the client didn't ask for a check.
+
+    Raises:
+        ValueError: If the version is malformed.
+    """
+    if_match = request.headers.get("If-Match", "").strip()
+    if if_match and if_match != "*":
+        # ETags may have been weakened by the compression middleware on the way
+        # out, so both forms are accepted
+        return int(if_match.removeprefix("W/").strip('"')), 412
+    if data.get("expectedVersion") is not None:
+        return int(data["expectedVersion"]), 409
+    return None
+
+
+def _version_conflict(current_version: int, status: int) -> JsonResponse:
+    response = ApiJsonResponse(
+        {
+            "error": "The book was changed by someone else. Reload it and retry.",
+            "currentVersion": current_version,
+        },
+        status=status,
+    )
+    response["ETag"] = f'"{current_version}"'
+    return response
+
+
 @login_required
 def edit_book(request: HttpRequest, book_id: int) -> JsonResponse:
     """
@@ -692,6 +1220,13 @@ def edit_book(request: HttpRequest, book_id: int) -> JsonResponse:
         - `allowBorrow` (bool, optional): Set to `true` or `false` to update the
           borrowing permission for the book. Accepts boolean `true`/`false` or
           string representations like "true", "false", "1", "0".
+        - `expectedVersion` (int, optional): The version the edit is based on.
+          The `If-Match` header (with the book's ETag) can be used instead.
+
+    Concurrency:
+        The edit is applied with a single `UPDATE ... WHERE version = ?` touching
+        only the changed columns, so an edit based on an outdated version is
+        rejected instead of silently overwriting someone else's changes.
 
     Successful Response (200 OK):
         A JSON object containing:
@@ -703,6 +1238,7 @@ def edit_book(request: HttpRequest, book_id: int) -> JsonResponse:
             - `author` (str | None): The name of the updated author, or None.
             - `genres` (list[str]): A list of names of the updated associated genres.
             - `allowBorrow` (bool): The updated borrow status.
+            - `version` (int): The new version, also sent as the `ETag` header.
 
     Error Responses:
         - 400 Bad Request:
@@ -710,7 +1246,7 @@ def edit_book(request: HttpRequest, book_id: int) -> JsonResponse:
             - Request body is empty.
             - Invalid data types for fields (e.g., `genre_ids` not a list, `author_id`
               not integer/null).
-            - Validation error during `book.full_clean()` (e.g., empty title).
+            - Validation error of a submitted field (e.g., empty title).
             - Missing required data if a specific field requires it (though all are
               optional here for PUT partial updates).
         - 404 Not Found:
@@ -719,102 +1255,594 @@ def edit_book(request: HttpRequest, book_id: int) -> JsonResponse:
             - One or more `genre_ids` provided in the request body do not exist.
         - 405 Method Not Allowed:
             - Request method is not PUT.
+        - 409 Conflict / 412 Precondition Failed:
+            - The book changed since `expectedVersion` / `If-Match`. The response
+              contains `currentVersion`.
         - 500 Internal Server Error:
             - An unexpected error occurred on the server.
     """
     if request.method != "PUT":
-        return JsonResponse({"error": "Invalid request method. Use PUT."}, status=405)
+        return ApiJsonResponse(
+            {"error": "Invalid request method. Use PUT."}, status=405
+        )
 
     try:
-        book = Book.objects.get(pk=book_id)
+        book = (
+            Book.objects.select_related("author")
+            .prefetch_related(
+                Prefetch("genres", queryset=Genre.objects.only("id", "name"))
+            )
+            .get(pk=book_id)
+        )
     except Book.DoesNotExist:
-        return JsonResponse({"error": f"Book with id {book_id} not found"}, status=404)
+        return ApiJsonResponse(
+            {"error": f"Book with id {book_id} not found"}, status=404
+        )
 
     try:
         # Ensure request body is not empty before trying to parse
         if not request.body:
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": "Request body cannot be empty for PUT"}, status=400
             )
         data = json.loads(request.body)
         if not isinstance(data, dict):
-            return JsonResponse(
+            return ApiJsonResponse(
                 {"error": "Invalid JSON data: Expected an object"}, status=400
             )
 
-        # --- Call helper functions to update parts of the book ---
+        # --- Check the expected version before doing any work ---
+        try:
+            expected = _parse_expected_version(request, data)
+        except ValueError:
+            return ApiJsonResponse({"error": "Invalid version"}, status=400)
+        if expected is not None and expected[0] != book.version:
+            return _version_conflict(book.version, expected[1])
+
+        borrower_name = (
+            Borrow.objects.filter(book_id=book.id, is_borrowed=True)
+            .values_list("borrower_name", flat=True)
+            .first()
+        )
+
+        # --- Call helper functions to collect the changes ---
         # Each helper returns a JsonResponse on error, otherwise None
-        error_response = _update_basic_book_fields(book, data)
+        changes: dict = {}
+        error_response = _update_basic_book_fields(
+            book, data, changes, is_borrowed=borrower_name is not None
+        )
         if error_response:
             return error_response
 
-        error_response = _update_book_author(book, data)
+        error_response = _update_book_author(book, data, changes)
         if error_response:
             return error_response
 
-        error_response = _update_book_genres(book, data)
+        error_response = _update_book_genres(book, data, changes)
         if error_response:
             return error_response
 
-        # --- Save if all updates were successful ---
-        book.full_clean()  # Run model validation before saving
-        book.save()
+        # Not a column: applied to the book-genre table
+        genres: list[Genre] | None = changes.pop("genres", None)
+        changed = bool(changes) or genres is not None
+        version = book.version + 1 if changed else book.version
 
-        # --- Format and return success response ---
+        # --- Format the response from what is already known ---
+        author = changes.get("author", book.author)
         updated_book_data = {
             "id": book.id,
-            "title": book.title,
-            "author": (
-                {"id": book.author.id, "name": book.author.name}
-                if book.author
-                else None
-            ),
+            "title": changes.get("title", book.title),
+            "author": {"id": author.id, "name": author.name} if author else None,
             "dateAdded": book.date_added.isoformat(),
-            "genres": [genre for genre in book.genres.all().values("id", "name")],
-            "allowBorrow": book.allow_borrow,
+            "genres": [
+                {"id": genre.id, "name": genre.name}
+                for genre in (genres if genres is not None else book.genres.all())
+            ],
+            "allowBorrow": changes.get("allow_borrow", book.allow_borrow),
+            "version": version,
         }
-        return JsonResponse(
+
+        # --- Apply the changes, if any, as one conditional UPDATE ---
+        if changed:
+            with transaction.atomic():
+                # Only succeeds if nobody else edited the book since it was read
+                books = Book.objects.filter(pk=book.id, version=book.version)
+                if changes.get("allow_borrow") is False:
+                    # Borrowing doesn't change the version, so the UPDATE checks
+                    # for a loan made since the book was read itself
+                    books = books.exclude(borrow__is_borrowed=True)
+                updated = books.update(
+                    **changes, version=F("version") + 1, updated_at=timezone.now()
+                )
+                if not updated:
+                    current_version = (
+                        Book.objects.filter(pk=book.id)
+                        .values_list("version", flat=True)
+                        .first()
+                    )
+                    if current_version is None:
+                        return ApiJsonResponse(
+                            {"error": f"Book with id {book_id} not found"}, status=404
+                        )
+                    if current_version == book.version:
+                        # Not edited, so it was borrowed in the meantime
+                        return ApiJsonResponse(
+                            {
+                                "error": (
+                                    "Cannot set allow_borrow to false while the "
+                                    "book is borrowed"
+                                )
+                            },
+                            status=400,
+                        )
+                    return _version_conflict(
+                        current_version, expected[1] if expected else 409
+                    )
+
+                if "title" in changes:
+                    # update() sends no post_save, which keeps the index
+                    fuzzy.index(SearchTrigram.BOOK, book.id, changes["title"])
+
+                if genres is not None:
+                    through = Book.genres.through
+                    new_ids = {genre.id for genre in genres}
+                    old_ids = {genre.id for genre in book.genres.all()}
+                    if old_ids - new_ids:
+                        through.objects.filter(
+                            book_id=book.id, genre_id__in=old_ids - new_ids
+                        ).delete()
+                    if new_ids - old_ids:
+                        through.objects.bulk_create(
+                            [
+                                through(book_id=book.id, genre_id=genre_id)
+                                for genre_id in new_ids - old_ids
+                            ]
+                        )
+
+                events.emit(
+                    events.BOOK_UPDATED,
+                    book.id,
+                    {"book": {**updated_book_data, "borrowerName": borrower_name}},
+                )
+
+            audit.record(
+                request,
+                "book.update",
+                book.id,
+                data,
+                description=f"Edited book '{updated_book_data['title']}'",
+            )
+
+        response = ApiJsonResponse(
             {"message": "Book updated successfully!", "book": updated_book_data},
             status=200,
         )
+        response["ETag"] = f'"{version}"'
+        return response
 
     except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
     except ValidationError as ve:
         print(ve)
-        # Catches validation errors from book.full_clean() or potentially save()
-        return JsonResponse(
+        # Catches validation errors of the submitted fields
+        return ApiJsonResponse(
             {"error": f"Validation Error: {ve.message_dict}"}, status=400
         )
     except Exception as e:
         # Log the exception e for debugging
         print(f"Unexpected error in edit_book: {e}")  # Basic logging
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "An unexpected server error occurred"}, status=500
         )
 
 
-@login_required
-def add_books(request: HttpRequest) -> JsonResponse:
+def _select_book_ids(
+    data: dict, max_books: int
+) -> tuple[list[int], set[int]] | JsonResponse:
     """
-    Adds multiple books from an uploaded CSV file.
-    Expected CSV headers: title, author, genres, allowBorrow
+    Resolves the books targeted by a bulk request, given either as `ids` or as
+    `get_books` `filters`.
+
+    Returns the requested ids (in request order, or id order for filters) and
+    the set of those that exist, or a JsonResponse on error.
     """
-    if request.method != "POST":
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+    if "ids" in data:
+        try:
+            requested_ids = list(dict.fromkeys(int(book_id) for book_id in data["ids"]))
+        except (ValueError, TypeError):
+            return ApiJsonResponse(
+                {"error": "ids must be a list of integers"}, status=400
+            )
+        if len(requested_ids) > max_books:
+            return ApiJsonResponse(
+                {"error": f"Cannot change more than {max_books} books at once"},
+                status=400,
+            )
+        # In chunks, as SQLite limits the number of variables of a statement
+        chunk_size = settings.BULK_DELETE_CHUNK_SIZE
+        found_ids = set()
+        for start in range(0, len(requested_ids), chunk_size):
+            found_ids.update(
+                Book.objects.filter(
+                    pk__in=requested_ids[start : start + chunk_size]
+                ).values_list("id", flat=True)
+            )
+    elif "filters" in data:
+        try:
+            filters = parse_book_filters(book_filter_params(data["filters"]))
+        except ValueError as e:
+            return ApiJsonResponse({"error": str(e)}, status=400)
+        requested_ids = list(
+            filter_books(Book.objects.all(), filters)
+            .order_by("id")
+            .values_list("id", flat=True)[: max_books + 1]
+        )
+        if len(requested_ids) > max_books:
+            return ApiJsonResponse(
+                {"error": f"Cannot change more than {max_books} books at once"},
+                status=400,
+            )
+        found_ids = set(requested_ids)
+    else:
+        return ApiJsonResponse(
+            {"error": "Either ids or filters is required"}, status=400
+        )
 
-    if "file" in request.FILES:
+    return requested_ids, found_ids
+
+
+@login_required
+def edit_books(request: HttpRequest) -> JsonResponse:
+    """
+    Handles PUT requests to apply the same edit to many books at once.
+
+    The patch is validated once and applied with set-based updates of the book
+    table and bulk inserts/deletes in the book-genre table, in one transaction,
+    however many books are edited.
+
+    Request Body (JSON):
+        - `ids` (list[int]): The books to edit, or
+        - `filters` (dict): `get_books` filter parameters selecting the books
+          (e.g., {"filter_genre": [3], "filter_borrowed": "false"}).
+        - `patch` (dict): The changes to apply. All fields are optional.
+            - `allowBorrow` (bool): New borrowing permission. Books currently
+              borrowed can't be set to `false` and are reported as errors.
+            - `author_id` (int | None): New author, or `null` to remove it.
+            - `add_genre_ids` (list[int]): Genres to add to each book.
+            - `remove_genre_ids` (list[int]): Genres to remove from each book.
+
+    Successful Response (200 OK):
+        A JSON object containing:
+        - `results` (list): One `{"id", "status"}` object per requested book,
+          where `status` is 'updated', 'not_found' or 'error' (with `error`).
+        - `updated` (int): The number of books updated.
+    """
+    if request.method != "PUT":
+        return ApiJsonResponse(
+            {"error": "Invalid request method. Use PUT."}, status=405
+        )
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
+
+    if not isinstance(data, dict) or not isinstance(data.get("patch"), dict):
+        return ApiJsonResponse(
+            {"error": "Expected an object with a patch object"}, status=400
+        )
+
+    MAX_BOOKS = 10000
+    patch: dict = data["patch"]
+
+    # --- Select the books ---
+    selection = _select_book_ids(data, MAX_BOOKS)
+    if isinstance(selection, JsonResponse):
+        return selection
+    requested_ids, found_ids = selection
+
+    # --- Validate the patch once ---
+    updates: dict = {}
+
+    if "allowBorrow" in patch:
+        allow_borrow_value = patch["allowBorrow"]
+        if not isinstance(allow_borrow_value, bool):
+            allow_borrow_value = str(allow_borrow_value).lower() in ("true", "1", "yes")
+        updates["allow_borrow"] = allow_borrow_value
+
+    if "author_id" in patch:
+        author_id = patch["author_id"]
+        if author_id is None:
+            updates["author_id"] = None
+            updates["author_sort_key"] = ""
+        else:
+            try:
+                author_id = int(author_id)
+            except (ValueError, TypeError):
+                return ApiJsonResponse(
+                    {"error": f"Invalid author_id format: {author_id}"}, status=400
+                )
+            author_name = (
+                Author.objects.filter(pk=author_id)
+                .values_list("name", flat=True)
+                .first()
+            )
+            if author_name is None:
+                return ApiJsonResponse(
+                    {"error": f"Author with id {author_id} not found"}, status=404
+                )
+            updates["author_id"] = author_id
+            # update() bypasses Book.save, which keeps the sort keys
+            updates["author_sort_key"] = sort_key(author_name, articles=())
+
+    genre_changes: dict[str, list[int]] = {}
+    for key in ("add_genre_ids", "remove_genre_ids"):
+        genre_ids = patch.get(key, [])
+        if not isinstance(genre_ids, list):
+            return ApiJsonResponse({"error": f"{key} must be a list"}, status=400)
+        try:
+            genre_changes[key] = [int(gid) for gid in genre_ids]
+        except (ValueError, TypeError):
+            return ApiJsonResponse(
+                {"error": f"Invalid genre_id format in {key}"}, status=400
+            )
+
+    all_genre_ids = set(genre_changes["add_genre_ids"]) | set(
+        genre_changes["remove_genre_ids"]
+    )
+    found_genre_ids = set(
+        Genre.objects.filter(pk__in=all_genre_ids).values_list("id", flat=True)
+    )
+    if found_genre_ids != all_genre_ids:
+        missing_ids = sorted(all_genre_ids - found_genre_ids)
+        return ApiJsonResponse(
+            {"error": f"Genres with the following ids not found: {missing_ids}"},
+            status=404,
+        )
+
+    if not updates and not all_genre_ids:
+        return ApiJsonResponse({"error": "The patch is empty"}, status=400)
+
+    book_ids = [book_id for book_id in requested_ids if book_id in found_ids]
+    errors: dict[int, str] = {}
+
+    # --- Apply ---
+    try:
+        with transaction.atomic():
+            books = Book.objects.filter(pk__in=book_ids)
+            if updates.get("allow_borrow") is False:
+                # Checked by the UPDATE itself, so a book borrowed in the
+                # meantime can't be locked out of being returned
+                books = books.exclude(borrow__is_borrowed=True)
+            # `update()` skips auto_now, so mark the books changed for sync here
+            books.update(
+                updated_at=timezone.now(), version=F("version") + 1, **updates
+            )
+
+            if updates.get("allow_borrow") is False:
+                # This transaction holds the write lock since the UPDATE, so
+                # these are the borrows it saw
+                for book_id in Borrow.objects.filter(
+                    book_id__in=book_ids, is_borrowed=True
+                ).values_list("book_id", flat=True):
+                    errors[book_id] = (
+                        "Cannot set allow_borrow to false while the book is borrowed"
+                    )
+                book_ids = [book_id for book_id in book_ids if book_id not in errors]
+
+            through = Book.genres.through
+            if genre_changes["remove_genre_ids"]:
+                through.objects.filter(
+                    book_id__in=book_ids,
+                    genre_id__in=genre_changes["remove_genre_ids"],
+                ).delete()
+            if genre_changes["add_genre_ids"]:
+                through.objects.bulk_create(
+                    [
+                        through(book_id=book_id, genre_id=genre_id)
+                        for book_id in book_ids
+                        for genre_id in genre_changes["add_genre_ids"]
+                    ],
+                    batch_size=500,
+                    ignore_conflicts=True,
+                )
+
+            if book_ids:
+                events.emit(
+                    events.BOOKS_UPDATED, data={"ids": book_ids, "patch": patch}
+                )
+    except Exception as e:
+        print(f"Unexpected error in edit_books: {e}")
+        return ApiJsonResponse(
+            {"error": "An unexpected server error occurred"}, status=500
+        )
+
+    if book_ids:
+        audit.record(
+            request,
+            "book.bulk_update",
+            payload={"ids": book_ids, "patch": patch},
+            description=f"Edited {len(book_ids)} books",
+        )
+
+    results: list[dict] = []
+    for book_id in requested_ids:
+        if book_id not in found_ids:
+            results.append({"id": book_id, "status": "not_found"})
+        elif book_id in errors:
+            results.append({"id": book_id, "status": "error", "error": errors[book_id]})
+        else:
+            results.append({"id": book_id, "status": "updated"})
+
+    return ApiJsonResponse({"results": results, "updated": len(book_ids)})
+
+
+@login_required
+def delete_books(request: HttpRequest) -> JsonResponse:
+    """
+    Handles POST requests to delete many books at once.
+
+    Books are deleted in chunks, each in its own short transaction, with
+    set-based deletes of their borrows and genre links. Deletions of more than
+    `BULK_DELETE_SYNC_LIMIT` books (or with `background`) run in a background
+    job whose progress is available at `bulk-jobs/<job_id>/`.
+
+    Request Body (JSON):
+        - `ids` (list[int]): The books to delete, or
+        - `filters` (dict): `get_books` filter parameters selecting the books.
+        - `background` (bool, optional): Always run as a background job.
+
+    Successful Response:
+        - 200 OK: `results` (one `{"id", "status"}` per requested book, with
+          status 'deleted' or 'not_found') and `deleted` (count).
+        - 202 Accepted: `jobId`, `status`, `total`, `notFound` (requested ids
+          that don't exist) and `progressUrl`.
+    """
+    if request.method != "POST":
+        return ApiJsonResponse(
+            {"error": "Invalid request method. Use POST."}, status=405
+        )
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return ApiJsonResponse({"error": "Invalid JSON data"}, status=400)
+
+    if not isinstance(data, dict):
+        return ApiJsonResponse(
+            {"error": "Invalid JSON data: Expected an object"}, status=400
+        )
+
+    MAX_BOOKS = 1_000_000
+
+    selection = _select_book_ids(data, MAX_BOOKS)
+    if isinstance(selection, JsonResponse):
+        return selection
+    requested_ids, found_ids = selection
+    book_ids = [book_id for book_id in requested_ids if book_id in found_ids]
+
+    background = (
+        data.get("background") is True
+        or len(book_ids) > settings.BULK_DELETE_SYNC_LIMIT
+    )
+
+    if background:
+        job = BulkJob.objects.create(
+            action="book.bulk_delete",
+            actor=request.user.get_username(),
+            book_ids=book_ids,
+            total=len(book_ids),
+        )
+        # Start once the job row is visible to the job's own connection
+        transaction.on_commit(lambda: bulk.start_job(job.id))
+
+        audit.record(
+            request,
+            "book.bulk_delete",
+            payload={"jobId": job.id, "count": len(book_ids)},
+            description=f"Started deleting {len(book_ids)} books",
+        )
+
+        return ApiJsonResponse(
+            {
+                "jobId": job.id,
+                "status": job.status,
+                "total": job.total,
+                "notFound": [
+                    book_id for book_id in requested_ids if book_id not in found_ids
+                ],
+                "progressUrl": reverse("bulk_job", args=[job.id]),
+            },
+            status=202,
+        )
+
+    try:
+        deleted = bulk.delete_books(book_ids)
+    except Exception as e:
+        print(f"Unexpected error in delete_books: {e}")
+        return ApiJsonResponse(
+            {"error": "An unexpected server error occurred"}, status=500
+        )
+
+    if book_ids:
+        audit.record(
+            request,
+            "book.bulk_delete",
+            payload={"ids": book_ids},
+            description=f"Deleted {deleted} books",
+        )
+
+    return ApiJsonResponse(
+        {
+            "results": [
+                {
+                    "id": book_id,
+                    "status": "deleted" if book_id in found_ids else "not_found",
+                }
+                for book_id in requested_ids
+            ],
+            "deleted": deleted,
+        }
+    )
+
+
+@login_required
+def get_bulk_job(request: HttpRequest, job_id: int) -> JsonResponse:
+    """
+    Handle GET requests for the progress of a background bulk job. A job
+    left behind by a worker that exited is resumed.
+
+    Returns:
+        JsonResponse: A JSON object containing `id`, `action`, `status`
+        ('pending', 'running', 'done' or 'failed'), `total`, `processed`,
+        `error`, `createdAt` and `finishedAt`.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    job = BulkJob.objects.defer("book_ids").filter(pk=job_id).first()
+    if job is None:
+        return ApiJsonResponse({"error": f"Job with id {job_id} not found"}, status=404)
+
+    if bulk.is_resumable(job):
+        # Its process is gone (or it never started); the claim keeps it to one
+        bulk.start_job(job.id)
+
+    return ApiJsonResponse(
+        {
+            "id": job.id,
+            "action": job.action,
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "error": job.error or None,
+            "createdAt": job.created_at.isoformat(),
+            "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+        }
+    )
+
+
+@login_required
+def add_books(request: HttpRequest) -> JsonResponse:
+    """
+    Adds multiple books from an uploaded CSV file.
+    Expected CSV headers: title, author, genres, allowBorrow
+    """
+    if request.method != "POST":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    if "file" in request.FILES:
         file = request.FILES["file"]
 
         # Check if uploaded file is a CSV
         if file.content_type != "text/csv":
-            return JsonResponse({"error": "Uploaded file must be a CSV"}, status=400)
+            return ApiJsonResponse({"error": "Uploaded file must be a CSV"}, status=400)
 
         file = file.read()
     elif request.body:
         file = request.body
     else:
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": "No file provided (or file is empty)"}, status=400
         )
 
@@ -823,7 +1851,7 @@ def add_books(request: HttpRequest) -> JsonResponse:
         reader = csv.DictReader(decoded_file)
     except Exception as e:
         print(f"Error decoding file: {e}")
-        return JsonResponse({"error": "Invalid file format"}, status=400)
+        return ApiJsonResponse({"error": "Invalid file format"}, status=400)
 
     expected_headers = ["title", "author", "genres", "allowBorrow"]
 
@@ -831,11 +1859,13 @@ def add_books(request: HttpRequest) -> JsonResponse:
     header_map = {header.lower(): header for header in reader.fieldnames}
 
     if not all([header.lower() in header_map.keys() for header in expected_headers]):
-        return JsonResponse(
+        return ApiJsonResponse(
             {"error": f"CSV must have headers: {', '.join(expected_headers)}"},
             status=400,
         )
 
+    imported: list[Book] = []
+
     try:
         with transaction.atomic():
             for row in reader:
@@ -847,7 +1877,7 @@ def add_books(request: HttpRequest) -> JsonResponse:
                 )
 
                 if not title:
-                    return JsonResponse(
+                    return ApiJsonResponse(
                         {"error": "Title is required for each book"}, status=400
                     )
 
@@ -858,7 +1888,7 @@ def add_books(request: HttpRequest) -> JsonResponse:
                 elif allow_borrow_str in ["false", "0", "no"]:
                     allow_borrow = False
                 else:
-                    return JsonResponse(
+                    return ApiJsonResponse(
                         {
                             "error": (
                                 f"Invalid value for allowBorrow: {
@@ -876,9 +1906,9 @@ def add_books(request: HttpRequest) -> JsonResponse:
                     else None
                 )
 
-                book = Book.objects.get_or_create(
+                book, created = Book.objects.get_or_create(
                     title=title, author=author, title__iexact=title
-                )[0]
+                )
 
                 book.allow_borrow = allow_borrow
                 book.save()
@@ -892,11 +1922,310 @@ def add_books(request: HttpRequest) -> JsonResponse:
                 ]
 
                 book.genres.set(genres)
+                imported.append(book)
+                events.emit(
+                    events.BOOK_CREATED if created else events.BOOK_UPDATED,
+                    book.id,
+                    {"book": events.book_data(book)},
+                )
     except Exception as e:
         print(f"Unexpected error in add_books: {e}")
-        return JsonResponse({"error": "Something went wrong"}, status=500)
+        return ApiJsonResponse({"error": "Something went wrong"}, status=500)
+
+    for book in imported:
+        audit.record(
+            request,
+            "book.import",
+            book.id,
+            {
+                "title": book.title,
+                "authorId": book.author_id,
+                "allowBorrow": book.allow_borrow,
+            },
+            description=f"Imported book '{book.title}'",
+        )
+
+    return ApiJsonResponse({"message": "All books added successfully!"}, status=201)
 
-    return JsonResponse({"message": "All books added successfully!"}, status=201)
+
+@login_required
+def sync_catalog(request: HttpRequest) -> JsonResponse:
+    """
+    Handle GET requests for an incremental copy of the catalog.
+
+    Returns the books, authors, genres and borrows changed since the given token,
+    and the ids of the rows deleted since then, so mirrors only download what
+    changed. Without a token, the whole catalog is returned, page by page.
+
+    Query Parameters:
+        - `since` (str, optional): The `token` of the previous response.
+        - `limit` (int, optional): Rows per stream and page. Defaults to 500,
+          max 5000.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `books`, `authors`, `genres`, `borrows`: Changed rows. Books carry
+              `authorId` and `genreIds`.
+            - `deleted`: Ids of deleted rows per kind (`book`, `author`, `genre`),
+              to apply after the changed rows. Borrows go with their book.
+            - `token`: The token for the next request.
+            - `hasMore`: Whether there are more changes to fetch right away.
+
+    Rows changed in the last `sync.SYNC_OVERLAP` can be returned again by a
+    later call, so they are applied as upserts.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    MAX_LIMIT = 5000
+
+    try:
+        limit = int(request.GET.get("limit", "500"))
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {"error": f"limit must be an integer between 1 and {MAX_LIMIT}"},
+            status=400,
+        )
+
+    try:
+        result = sync.sync_page(request.GET.get("since"), limit)
+    except ValueError:
+        return ApiJsonResponse({"error": "Invalid sync token"}, status=400)
+
+    return ApiJsonResponse(result)
+
+
+@login_required
+async def change_feed(request: HttpRequest) -> HttpResponse:
+    """
+    Stream catalog changes as server-sent events.
+
+    Each event carries the change type (`book.created`, `book.updated`,
+    `book.deleted`, `book.borrowed`, `book.returned`, `books.updated`) as its
+    event name and a JSON object with `id`, `type`, `bookId`, `data` and
+    `datetime`. Created and updated events include the full book as `data.book`,
+    and `books.updated` (from `edit_books`) the edited `ids` and the `patch`, so
+    clients can patch their local state instead of refetching.
+
+    Reconnecting clients resume from the `Last-Event-ID` header (or the
+    `lastEventId` query parameter). Clients too far behind receive a `reset`
+    event and should refetch. New connections start from the latest event.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    last_event_id = request.headers.get(
+        "Last-Event-ID", request.GET.get("lastEventId")
+    )
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return ApiJsonResponse({"error": "Invalid Last-Event-ID"}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        content = events.astream(last_id)
+    else:
+        content = events.stream(last_id)
+
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Tell nginx not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required
+@cached_read
+def get_analytics(request: HttpRequest) -> JsonResponse:
+    """
+    Handle GET requests for circulation analytics.
+
+    Everything is answered from the daily rollups and the loan duration
+    histogram, which are maintained as books are borrowed and returned, so the
+    cost depends on the size of the window, never on the length of the history.
+
+    Query Parameters:
+        - `days` (int, optional): Size of the window ending today. Defaults to 30,
+          max 366.
+        - `limit` (int, optional): Entries in each top list. Defaults to 10,
+          max 50.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `loansPerDay`: `date`, `loans` and `returns` for each day in the
+              window that had any activity.
+            - `totals`: `loans`, `returns` and `averageLoanSeconds` for the window.
+            - `topBooks`, `topGenres`, `topAuthors`: The most borrowed in the
+              window, as `id`, `name` and `loans`.
+            - `loanDuration`: Estimated `p50`, `p90` and `p99` loan durations in
+              seconds over all returned loans.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    MAX_DAYS = 366
+    MAX_LIMIT = 50
+
+    try:
+        days = int(request.GET.get("days", "30"))
+        limit = int(request.GET.get("limit", "10"))
+        if not 1 <= days <= MAX_DAYS or not 1 <= limit <= MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {
+                "error": (
+                    f"days must be an integer between 1 and {MAX_DAYS} and limit "
+                    f"an integer between 1 and {MAX_LIMIT}"
+                )
+            },
+            status=400,
+        )
+
+    start = timezone.localdate() - timedelta(days=days - 1)
+    rollups: QuerySet = CirculationRollup.objects.filter(date__gte=start)
+
+    per_day = list(
+        rollups.filter(dimension=CirculationRollup.TOTAL)
+        .order_by("date")
+        .values("date", "loans", "returns", "loan_seconds")
+    )
+
+    def top(dimension: str, model, name_field: str) -> list[dict]:
+        rows = list(
+            rollups.filter(dimension=dimension)
+            .values("key")
+            .annotate(total_loans=Sum("loans"))
+            .filter(total_loans__gt=0)
+            .order_by("-total_loans", "key")[:limit]
+        )
+        names = dict(
+            model.objects.filter(pk__in=[row["key"] for row in rows]).values_list(
+                "id", name_field
+            )
+        )
+        return [
+            {
+                "id": row["key"],
+                "name": names.get(row["key"]),
+                "loans": row["total_loans"],
+            }
+            for row in rows
+        ]
+
+    total_returns = sum(day["returns"] for day in per_day)
+    total_loan_seconds = sum(day["loan_seconds"] for day in per_day)
+
+    return ApiJsonResponse(
+        {
+            "loansPerDay": [
+                {
+                    "date": day["date"].isoformat(),
+                    "loans": day["loans"],
+                    "returns": day["returns"],
+                }
+                for day in per_day
+            ],
+            "totals": {
+                "loans": sum(day["loans"] for day in per_day),
+                "returns": total_returns,
+                "averageLoanSeconds": (
+                    total_loan_seconds / total_returns if total_returns else None
+                ),
+            },
+            "topBooks": top(CirculationRollup.BOOK, Book, "title"),
+            "topGenres": top(CirculationRollup.GENRE, Genre, "name"),
+            "topAuthors": top(CirculationRollup.AUTHOR, Author, "name"),
+            "loanDuration": analytics.percentiles(
+                dict(LoanDurationBucket.objects.values_list("bucket", "count")),
+                [50, 90, 99],
+            ),
+        }
+    )
+
+
+@login_required
+def get_logs(request: HttpRequest) -> JsonResponse:
+    """
+    Handle GET requests to read the audit log, newest entries first.
+
+    Staff only. Results are paginated with an opaque cursor rather than page
+    numbers, so reading deep into the log costs the same as reading its head.
+
+    Query Parameters:
+        - `action` (str, optional): Only entries with this action
+          (e.g. 'book.borrow').
+        - `book_id` (int, optional): Only entries for this book.
+        - `actor` (str, optional): Only entries made by this username.
+        - `cursor` (str, optional): The `nextCursor` of the previous page.
+        - `limit` (int, optional): Entries per page. Defaults to 50, max 200.
+
+    Returns:
+        JsonResponse: A JSON object containing:
+            - `logs`: The entries of this page.
+            - `nextCursor`: Cursor for the next page, or null on the last page.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    if not request.user.is_staff:
+        return ApiJsonResponse({"error": "Staff access required"}, status=403)
+
+    MAX_LIMIT = 200
+
+    try:
+        limit = int(request.GET.get("limit", "50"))
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return ApiJsonResponse(
+            {"error": f"limit must be an integer between 1 and {MAX_LIMIT}"},
+            status=400,
+        )
+
+    logs: QuerySet = Log.objects.all()
+
+    action = request.GET.get("action")
+    if action:
+        logs = logs.filter(action=action)
+
+    actor = request.GET.get("actor")
+    if actor:
+        logs = logs.filter(actor=actor)
+
+    book_id = request.GET.get("book_id")
+    if book_id:
+        try:
+            logs = logs.filter(book_id=int(book_id))
+        except ValueError:
+            return ApiJsonResponse({"error": "book_id must be an integer"}, status=400)
+
+    try:
+        entries, next_cursor = cursor_paginate(
+            logs, "datetime", request.GET.get("cursor"), limit, desc=True
+        )
+    except ValueError:
+        return ApiJsonResponse({"error": "Invalid cursor"}, status=400)
+
+    return ApiJsonResponse(
+        {
+            "logs": [
+                {
+                    "id": entry.id,
+                    "datetime": entry.datetime.isoformat(),
+                    "actor": entry.actor,
+                    "action": entry.action,
+                    "bookId": entry.book_id,
+                    "payload": entry.payload,
+                    "description": entry.description,
+                }
+                for entry in entries
+            ],
+            "nextCursor": next_cursor,
+        }
+    )
 
 
 @staff_member_required
@@ -906,4 +2235,65 @@ def backup_sqlite(request):
     if not path.exists(db_path):
         raise Http404("Database file not found.")
 
+    # In WAL mode recent commits may only be in the -wal file; fold them in
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
     return FileResponse(open(db_path, "rb"), as_attachment=True, filename="db.sqlite3")
+
+
+@staff_member_required
+def cache_stats(request: HttpRequest) -> JsonResponse:
+    """
+    Report the size, hits and evictions of each cache that keeps statistics
+    (the tiered caches), and the current catalog version.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    return ApiJsonResponse(
+        {
+            "catalogVersion": events.latest_id(),
+            "readCacheTimeout": settings.READ_CACHE_TIMEOUT,
+            "caches": {
+                alias: caches[alias].stats()
+                for alias in settings.CACHES
+                if hasattr(caches[alias], "stats")
+            },
+        }
+    )
+
+
+@staff_member_required
+def slow_queries(request: HttpRequest) -> JsonResponse:
+    """
+    Summarize the slow query log, grouping entries by normalized SQL shape.
+
+    Query Parameters:
+        - `view` (str, optional): Only include queries run by this view
+          (e.g. `get_books`).
+        - `limit` (int, optional): Maximum number of shapes to return. Defaults
+          to 50.
+    """
+    if request.method != "GET":
+        return ApiJsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        limit = int(request.GET.get("limit", "50"))
+    except ValueError:
+        return ApiJsonResponse({"error": "limit must be an integer"}, status=400)
+
+    entries = get_slow_query_log().read()
+
+    view_name = request.GET.get("view")
+    if view_name:
+        entries = [entry for entry in entries if entry.get("view") == view_name]
+
+    return ApiJsonResponse(
+        {
+            "enabled": settings.SLOW_QUERY_LOG,
+            "thresholdMs": settings.SLOW_QUERY_THRESHOLD_MS,
+            "totalEntries": len(entries),
+            "shapes": summarize(entries)[:limit],
+        }
+    )
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.urls import get_resolver
+from django.utils import timezone
+
+from frontend import views as frontend_views
+
+from . import columnar, events, suggest
+from .models import Author, Book, Borrow, Genre
+
+_lock = threading.Lock()
+# What the last warmup of this process did; `finishedAt` is None until one ran
+state: dict = {"finishedAt": None, "durationMs": None, "steps": {}, "pid": None}
+
+
+def _urls() -> None:
+    # Imports every view module and builds the reverse lookup tables
+    get_resolver().reverse_dict
+
+
+def _database() -> dict:
+    # Opening the connection runs the SQLite pragmas of `init_command`; the
+    # journal mode is the one `prestart` stored in the database file
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        pragmas = {}
+        for pragma in ("journal_mode", "synchronous", "busy_timeout"):
+            cursor.execute(f"PRAGMA {pragma}")
+            pragmas[pragma] = cursor.fetchone()[0]
+
+    # Bring the pages of the hot tables into SQLite's cache
+    for model in (Book, Author, Genre, Borrow):
+        model.objects.only("id").last()
+    return pragmas
+
+
+def _caches() -> None:
+    events.latest_id()
+    suggest.index.refresh(force=True)
+    if settings.CATALOG_ENGINE == "columnar":
+        columnar.catalog.refresh()
+
+
+def _shells() -> None:
+    for name in frontend_views.SHELLS:
+        frontend_views.render_shell(name)
+
+
+STEPS = {
+    "urls": _urls,
+    "database": _database,
+    "caches": _caches,
+    "shells": _shells,
+}
+
+
+def warm_up() -> dict:
+    """
+    Do the work the first requests of a process would otherwise pay for: load
+    the URL resolver and the views, connect to the database (applying the
+    pragmas), build the in-memory indexes (suggestions, and the columnar
+    catalog when it is the engine) and render the pages of the React app.
+
+    Run by the server before a process takes traffic (see `gunicorn.conf.py`).
+    Run in a preloading master, the indexes are built once and shared with the
+    forked workers, which then only read the rows changed since.
+
+    Returns:
+        dict: The warmup `state`: when it finished, how long it took and what
+              each step returned.
+    """
+    with _lock:
+        started = time.perf_counter()
+        steps = {}
+        for name, step in STEPS.items():
+            step_started = time.perf_counter()
+            result = step()
+            steps[name] = {"durationMs": (time.perf_counter() - step_started) * 1000}
+            if result:
+                steps[name].update(result)
+
+        state.update(
+            finishedAt=timezone.now().isoformat(),
+            durationMs=(time.perf_counter() - started) * 1000,
+            steps=steps,
+            pid=os.getpid(),
+        )
+        return state
+
+
+def is_ready() -> bool:
+    """Whether this process was warmed up (in itself, not in a parent)."""
+    return state["finishedAt"] is not None and state["pid"] == os.getpid()
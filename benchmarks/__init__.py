@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for the API.
+
+Run all of them with `python -m benchmarks`, or a subset by name, e.g.
+`python -m benchmarks json`.
+"""
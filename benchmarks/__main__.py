@@ -0,0 +1,20 @@
+import sys
+
+from .common import setup_django
+
+BENCHMARKS = ["json", "compression", "suggest", "columnar", "startup"]
+
+
+def main(names: list[str]) -> None:
+    setup_django()
+
+    from importlib import import_module
+
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+        import_module(f"benchmarks.bench_{name}").run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
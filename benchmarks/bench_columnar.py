@@ -0,0 +1,76 @@
+"""Filter, sort and paginate time of the in-memory catalog, without the DB."""
+
+import random
+import time
+
+from api.columnar import CatalogSnapshot
+from api.text import fold_text, sort_key
+
+from .bench_suggest import sample_titles
+from .common import print_table, timeit
+
+AUTHORS = 2_000
+GENRES = 40
+
+QUERIES = {
+    "all books": ({}, "title"),
+    "title search": ({"query": "secret gar", "search_scope": "title"}, "title"),
+    "all-scope search": ({"query": "garden"}, "author"),
+    "genre + borrowed": ({"genres": ["7"], "borrowed": False}, "dateAdded"),
+}
+# Filters of the facet counts
+FACETED = {"genres": ["3", "7"], "authors": ["1", "2", "3"], "allowborrow": True}
+
+
+def sample_rows(count: int) -> dict[int, tuple]:
+    rng = random.Random(count)
+    rows = {}
+    for book_id, title in enumerate(sample_titles(count), start=1):
+        author_id = rng.randint(0, AUTHORS)
+        borrower_id = rng.randint(1, 1000) if rng.random() < 0.1 else 0
+        rows[book_id] = (
+            fold_text(title),
+            sort_key(title),
+            sort_key(f"Author Number {author_id}", articles=()) if author_id else "",
+            author_id,
+            rng.randrange(10**15, 2 * 10**15),
+            rng.random() < 0.9,
+            borrower_id != 0,
+            borrower_id,
+            (borrower_id,) if borrower_id else (),
+            frozenset(rng.sample(range(1, GENRES + 1), 2)),
+        )
+    return rows
+
+
+def run() -> None:
+    results = []
+    for count in [10_000, 100_000]:
+        rows = sample_rows(count)
+        catalog = CatalogSnapshot()
+        catalog.author_names = {i: f"author number {i}" for i in range(1, AUTHORS + 1)}
+        catalog.borrower_names = {i: f"reader {i}" for i in range(1, 1001)}
+
+        start = time.perf_counter()
+        catalog._load(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        timings = [
+            timeit(lambda f=f, s=s: catalog.page(f, s, False, 1, 20), repeat=5)
+            for f, s in QUERIES.values()
+        ]
+        # The middle page of all books
+        deep = count // 40
+        timings.append(
+            timeit(lambda: catalog.page({}, "title", False, deep, 20), repeat=5)
+        )
+        timings.append(timeit(lambda: catalog.facets(FACETED), repeat=5))
+        results.append(
+            [count, f"{build_ms:.0f}", *(f"{us / 1000:.2f}" for us in timings)]
+        )
+
+    print_table(
+        "Columnar catalog, first page of 20 (ms)",
+        ["books", "load ms", *QUERIES, "middle page", "facets"],
+        results,
+    )
@@ -0,0 +1,26 @@
+"""Size and compression time of a 50-book `get_books` page per content coding."""
+
+from api import compression
+from api.responses import dumps
+
+from .common import print_table, sample_books_page, timeit
+
+
+def run() -> None:
+    content = dumps(sample_books_page(50))
+
+    rows = [["identity", "-", len(content)]]
+    for encoding in ["gzip", "br"]:
+        if encoding not in compression.available_encodings():
+            rows.append([encoding, "not installed", "-"])
+            continue
+
+        microseconds = timeit(lambda: compression.compress(content, encoding))
+        size = len(compression.compress(content, encoding))
+        rows.append([encoding, f"{microseconds:.1f}", size])
+
+    print_table(
+        "Response compression, 50-book page",
+        ["coding", "us/page", "bytes/page"],
+        rows,
+    )
@@ -0,0 +1,36 @@
+"""Encode time and size of a 50-book `get_books` page per JSON encoder."""
+
+from django.http import JsonResponse
+from django.test import override_settings
+
+from api import responses
+from api.responses import ApiJsonResponse
+
+from .common import print_table, sample_books_page, timeit
+
+
+def run() -> None:
+    page = sample_books_page(50)
+
+    candidates = [
+        ("django JsonResponse", "stdlib", JsonResponse),
+        ("ApiJsonResponse (stdlib)", "stdlib", ApiJsonResponse),
+        ("ApiJsonResponse (orjson)", "orjson", ApiJsonResponse),
+    ]
+
+    rows = []
+    for name, encoder, response_class in candidates:
+        if encoder == "orjson" and responses.orjson is None:
+            rows.append([name, "not installed", "-"])
+            continue
+
+        with override_settings(API_JSON_ENCODER=encoder):
+            microseconds = timeit(lambda: response_class(page))
+            size = len(response_class(page).content)
+        rows.append([name, f"{microseconds:.1f}", size])
+
+    print_table(
+        "JSON encoding, 50-book page",
+        ["encoder", "us/page", "bytes/page"],
+        rows,
+    )
@@ -0,0 +1,62 @@
+"""
+Container start preparation time: the previous entrypoint (collectstatic,
+migrate and createsuperuser as separate commands) against `prestart`, on a
+fresh data directory (cold) and on one already prepared (restart).
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+
+from .common import print_table
+
+COMMANDS = {
+    "entrypoint": [
+        ["collectstatic", "--noinput"],
+        ["migrate", "--noinput"],
+        ["createsuperuser", "--username", "admin", "--email", "", "--noinput"],
+    ],
+    "prestart": [["prestart"]],
+}
+
+
+def start(commands: list[list[str]], bench_dir: str) -> tuple[float, str]:
+    """Run `commands` the way the entrypoint does; return ms and the output."""
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "benchmarks.startup_settings",
+        "BENCH_DIR": bench_dir,
+        "DJANGO_SUPERUSER_PASSWORD": "bench",
+    }
+    output = ""
+    started = time.perf_counter()
+    for command in commands:
+        # The old entrypoint ignored createsuperuser failing on later starts
+        result = subprocess.run(
+            [sys.executable, "manage.py", *command],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        output += result.stdout
+    return (time.perf_counter() - started) * 1000, output
+
+
+def run() -> None:
+    rows = []
+    steps = ""
+    for name, commands in COMMANDS.items():
+        with tempfile.TemporaryDirectory() as bench_dir:
+            cold, _ = start(commands, bench_dir)
+            restart, output = start(commands, bench_dir)
+        rows.append([name, f"{cold:.0f}", f"{restart:.0f}"])
+        if name == "prestart":
+            steps = output
+
+    print_table("Start preparation (ms)", ["", "cold", "restart"], rows)
+    print(f"\nprestart on restart:\n{steps.rstrip()}")
@@ -0,0 +1,65 @@
+"""Lookup time and memory of the suggestion prefix index, without the DB."""
+
+import random
+import time
+
+from api.suggest import PrefixIndex
+from api.text import fold_text
+
+from .common import print_table, timeit
+
+WORDS = [
+    "the", "lord", "of", "rings", "garden", "history", "night", "river",
+    "shadow", "winter", "secret", "empire", "ocean", "mountain", "letters",
+    "silence", "crónica", "mémoires", "forest", "glass", "kingdom", "storm",
+]  # fmt: skip
+
+
+def sample_titles(count: int) -> list[str]:
+    rng = random.Random(count)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title() + f" {i}"
+        for i in range(count)
+    ]
+
+
+def run() -> None:
+    rows = []
+    for count in [10_000, 100_000]:
+        titles = sample_titles(count)
+        index = PrefixIndex()
+
+        start = time.perf_counter()
+        index._load(
+            (f"t{i}", title, fold_text(title)) for i, title in enumerate(titles)
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+
+        stats = index.stats()
+        lookup = {
+            query: timeit(lambda query=query: index.suggest(query, 10), repeat=100)
+            for query in ["g", "secret gar", "memo"]
+        }
+        rows.append(
+            [
+                count,
+                stats["entries"],
+                f"{stats['bytes'] / 1_000_000:.1f}",
+                f"{build_ms:.0f}",
+                *(f"{us:.1f}" for us in lookup.values()),
+            ]
+        )
+
+    print_table(
+        "Suggestion index (titles only)",
+        [
+            "titles",
+            "entries",
+            "MB",
+            "build ms",
+            "'g' us",
+            "'secret gar' us",
+            "'memo' us",
+        ],
+        rows,
+    )
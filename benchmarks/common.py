@@ -0,0 +1,57 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def setup_django() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library.settings")
+
+    import django
+
+    django.setup()
+
+
+def timeit(func, repeat: int = 200) -> float:
+    """Return the best time per call of `func`, in microseconds."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1_000_000
+
+
+def sample_books_page(size: int = 50) -> dict:
+    """
+    Build a `get_books` response body with `size` books, shaped like the real
+    one (nested author, several genres, ISO dates), without touching the DB.
+    """
+    authors = [{"id": i, "name": f"Author Number {i}"} for i in range(1, 11)]
+    genres = [{"id": i, "name": f"Genre {i}"} for i in range(1, 8)]
+    added = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    books = [
+        {
+            "id": i,
+            "title": f"The Collected Works of Somebody, Volume {i}",
+            "author": authors[i % len(authors)],
+            "dateAdded": (added + timedelta(hours=i)).isoformat(),
+            "genres": [genres[(i + k) % len(genres)] for k in range(3)],
+            "borrowerName": "Jane Doe" if i % 3 == 0 else None,
+            "allowBorrow": i % 5 != 0,
+        }
+        for i in range(1, size + 1)
+    ]
+    return {"books": books, "currentPage": 1, "totalPages": 20, "totalItems": 1000}
+
+
+def print_table(title: str, headers: list[str], rows: list[list]) -> None:
+    widths = [
+        max(len(str(cell)) for cell in [header, *[row[i] for row in rows]])
+        for i, header in enumerate(headers)
+    ]
+    print(f"\n{title}")
+    for cells in [headers, ["-" * width for width in widths], *rows]:
+        line = "  ".join(str(cell).ljust(width) for cell, width in zip(cells, widths))
+        print(line.rstrip())
@@ -0,0 +1,12 @@
+"""Project settings with the database and static files in `BENCH_DIR`."""
+
+from os import environ
+from pathlib import Path
+
+from library.settings import *  # noqa: F403
+
+BENCH_DIR = Path(environ["BENCH_DIR"])
+
+DATABASES["default"]["NAME"] = BENCH_DIR / "db.sqlite3"  # noqa: F405
+
+STATIC_ROOT = BENCH_DIR / "static"
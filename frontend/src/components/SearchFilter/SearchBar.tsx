@@ -1,6 +1,14 @@
+import { useEffect, useState } from "react";
 import { SearchIcon } from "lucide-react";
 import { GenericSelect } from "@/components/UI";
 import { useOptions } from "@/contexts";
+import { fetchApi } from "@/utils";
+
+type Suggestion = {
+    type: "title" | "author" | "genre";
+    id: number;
+    text: string;
+};
 
 type SearchBarProps = {};
 
@@ -18,6 +26,30 @@ function SearchBar({}: SearchBarProps) {
         });
     };
 
+    const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+    useEffect(() => {
+        if (!value.trim()) {
+            setSuggestions([]);
+            return;
+        }
+
+        // Wait for a pause in typing before asking for suggestions
+        const timeout = setTimeout(() => {
+            fetchApi(
+                `/api/suggest/?${new URLSearchParams({ q: value })}`,
+                {},
+                {
+                    dataCallback: (data) => {
+                        setSuggestions(data.suggestions ?? []);
+                    },
+                },
+            );
+        }, 150);
+
+        return () => clearTimeout(timeout);
+    }, [value]);
+
     const searchFilter = options.search_in ?? "all";
     const setSearchFilter = (value: string) => {
         setOptions((prev) => {
@@ -46,6 +78,8 @@ function SearchBar({}: SearchBarProps) {
                     value={value}
                     onChange={(e) => setValue(e.target.value)}
                     placeholder="Search books..."
+                    list="search-suggestions"
+                    autoComplete="off"
                     className="w-full pl-10 pr-4 py-2 rounded-lg
                         focus:outline-none focus:ring-2
                         focus:ring-primary-400 dark:focus:ring-primary-500
@@ -54,6 +88,14 @@ function SearchBar({}: SearchBarProps) {
                         border border-primary-700 dark:border-primary-600
                     "
                 />
+                <datalist id="search-suggestions">
+                    {suggestions.map((suggestion) => (
+                        <option
+                            key={`${suggestion.type}-${suggestion.id}`}
+                            value={suggestion.text}
+                        />
+                    ))}
+                </datalist>
                 <SearchIcon className="absolute left-3 top-2.5 w-5 h-5" />
             </div>
             <GenericSelect
@@ -1,18 +1,71 @@
+import hashlib
 from os import getenv
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponseRedirect, JsonResponse
-from django.shortcuts import redirect, render
+from django.http import (HttpRequest, HttpResponse, HttpResponseRedirect,
+                         JsonResponse)
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 
 app_name = getenv("APP_NAME")
 
+# The pages of the React app: their template and the assets they load first
+SHELLS = {
+    "index": ("frontend/index.html", ["frontend/main.css", "frontend/main.js"]),
+    "login": ("frontend/login.html", ["frontend/login.css", "frontend/login.js"]),
+}
+
+# Rendered shells by name: (content, ETag, Link header)
+_shells: dict[str, tuple[bytes, str, str]] = {}
+
+
+def _preload(url: str) -> str:
+    if url.endswith(".css"):
+        return f"<{url}>; rel=preload; as=style"
+    return f"<{url}>; rel=modulepreload"
+
+
+def render_shell(name: str) -> tuple[bytes, str, str]:
+    """
+    Render a page of `SHELLS` once per process. The templates only depend on
+    the app name and the (hashed) URLs of the built assets, which don't change
+    while the process runs; in DEBUG they are rendered on every request.
+    """
+    shell = _shells.get(name)
+    if shell is None or settings.DEBUG:
+        template_name, assets = SHELLS[name]
+        content = render_to_string(template_name, {"app_name": app_name}).encode()
+        shell = _shells[name] = (
+            content,
+            f'"{hashlib.sha1(content).hexdigest()}"',
+            ", ".join(_preload(static(asset)) for asset in assets),
+        )
+    return shell
+
+
+def shell_response(request: HttpRequest, name: str) -> HttpResponse:
+    """
+    Serve a rendered shell, or a 304 when the client has it already. Browsers
+    revalidate it each time (no-cache), so a deploy takes effect right away,
+    and the Link header lets them fetch the assets before parsing the page.
+    """
+    content, etag, link = render_shell(name)
+    response = get_conditional_response(request, etag=etag) or HttpResponse(content)
+    response["ETag"] = etag
+    response["Link"] = link
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 
 @login_required(login_url="/login/")
 def index(request):
 
-    return render(request, "frontend/index.html", {"app_name": app_name})
+    return shell_response(request, "index")
 
 
 @csrf_exempt
@@ -42,7 +95,7 @@ def login_view(request: HttpRequest):
                 {"message": "Invalid username or password."}, status=401
             )
 
-    return render(request, "frontend/login.html", {"app_name": app_name})
+    return shell_response(request, "login")
 
 
 @csrf_exempt
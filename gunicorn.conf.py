@@ -0,0 +1,120 @@
+"""
+Gunicorn configuration for the library project.
+
+Workers and threads are sized from the cores and memory available to the
+container; every value can be overridden with a `GUNICORN_*` environment
+variable. The app is loaded once in the master and warmed up (URL resolver,
+database, in-memory indexes) before the workers are forked, so they start
+warm and share those pages copy-on-write. Each worker then warms up its own
+database connection before it accepts requests; `/api/ready/` reports when it
+has. Background bulk jobs are handed back when a worker exits and resumed by
+the next one to start, and the worker writes its buffered audit entries.
+"""
+
+import os
+from pathlib import Path
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name) or default)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not on Linux
+        return os.cpu_count() or 1
+
+
+def _memory_limit() -> int | None:
+    """The memory available to the container in bytes, None if unknown."""
+    for limit_file in (
+        "/sys/fs/cgroup/memory.max",  # cgroup v2
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+    ):
+        try:
+            limit = Path(limit_file).read_text().strip()
+        except OSError:
+            continue
+        # Unlimited is "max" in v2 and a huge number in v1
+        if limit.isdigit() and int(limit) < 1 << 60:
+            return int(limit)
+
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _workers() -> int:
+    # The usual 2 per core + 1, as long as that many fit in memory
+    workers = 2 * _cpu_count() + 1
+    memory = _memory_limit()
+    if memory:
+        worker_memory = _env_int("GUNICORN_WORKER_MEMORY_MB", 150) * 1024 * 1024
+        workers = min(workers, memory // worker_memory)
+    return max(workers, 1)
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT') or 8000}"
+
+workers = _env_int("GUNICORN_WORKERS", _workers())
+# Threads keep a worker serving while some of its requests wait on SQLite
+# locks or hold a change feed connection open
+threads = _env_int("GUNICORN_THREADS", 4)
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = True
+
+# Recycle workers to bound slow memory growth, at staggered times so they don't
+# all restart (and warm up) at once
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = 30
+keepalive = 5
+
+# Worker heartbeats in memory rather than on the container's overlay disk
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+
+
+def when_ready(server):
+    """In the master, after the app was preloaded and before any fork."""
+    from django.db import connections
+
+    from api import warmup
+
+    state = warmup.warm_up()
+    server.log.info("Warmed up in %.0f ms", state["durationMs"])
+
+    # Workers must not inherit (and share) the master's SQLite connection
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    """In each worker, before it accepts requests."""
+    from api import bulk, warmup
+
+    state = warmup.warm_up()
+    worker.log.info("Worker ready in %.0f ms", state["durationMs"])
+
+    # Bulk jobs left behind by a worker that was recycled or died
+    for job_id in bulk.resume_jobs():
+        worker.log.info("Resuming bulk job %s", job_id)
+
+
+def worker_exit(server, worker):
+    """
+    In each worker as it exits: hand its bulk jobs back as pending and write
+    the audit entries still buffered.
+    """
+    from api import audit, bulk
+
+    bulk.stop_jobs(timeout=graceful_timeout / 2)
+    written = audit.flush()
+    if written:
+        worker.log.info("Wrote %d buffered audit log entries", written)
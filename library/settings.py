@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from os import getenv
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -57,12 +58,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "api.middleware.ApiCompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.SlowQueryLogMiddleware",
 ]
 
 ROOT_URLCONF = "library.urls"
@@ -99,13 +102,196 @@ else:
     # Fallback for local dev (keeps db.sqlite3 in root, no extra folder needed)
     DB_FILE = BASE_DIR / "db.sqlite3"
 
+# WAL lets readers run while a write is in progress. The journal mode is stored
+# in the database file, so `manage.py prestart` sets it once
+SQLITE_JOURNAL_MODE = "WAL"
+
+# Every connection sets these SQLite pragmas: synchronous=NORMAL only syncs at
+# checkpoints (safe with WAL), and the page cache (in KiB, negative) and memory
+# map keep hot pages off disk
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": DB_FILE,
+        "OPTIONS": {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # Seconds a write waits for another worker's write to finish
+            "timeout": 20,
+        },
     }
 }
 
+# Caches
+# "shared" lives on local disk so every worker on the host sees it; "tiered"
+# puts a short-lived in-process tier in front of it
+
+CACHE_DIR = DB_FILE.parent / "cache"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "library",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR,
+    },
+    "tiered": {
+        "BACKEND": "api.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {"LOCAL_TIMEOUT": 5, "LOCAL_MAX_ENTRIES": 1000},
+    },
+}
+
+
+# Sessions
+# SESSION_MODE picks the session store:
+#   - "db": Django's default, one session table read per request
+#   - "cached_db": sessions read from the shared cache, written through to the DB
+#   - "signed_cookies": no server-side storage at all
+
+SESSION_MODE = getenv("SESSION_MODE", "db")
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"SESSION_MODE must be one of {', '.join(SESSION_ENGINES)}, "
+        f"not {SESSION_MODE!r}"
+    )
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+# Sessions and cached users skip the in-process tier: a logout, deactivation or
+# permission change must be seen by every worker at once, not within the
+# tier's LOCAL_TIMEOUT
+SESSION_CACHE_ALIAS = "shared"
+
+# The authenticated user is cached per user id and dropped on logout, password
+# change or any other save of the user
+AUTH_USER_CACHE_ALIAS = "shared"
+
+AUTH_USER_CACHE_TIMEOUT = 300
+
+
+# API responses
+# JSON encoder for API responses: "auto" uses orjson when it is installed,
+# falling back to the stdlib encoder; "orjson" or "stdlib" force one of them
+
+API_JSON_ENCODER = getenv("API_JSON_ENCODER", "auto")
+
+# Dynamic API responses are compressed (brotli when installed, else gzip) when
+# the client accepts it and they are at least this many bytes
+API_COMPRESSION_PATH_PREFIX = "/api/"
+
+API_COMPRESSION_MIN_SIZE = int(getenv("API_COMPRESSION_MIN_SIZE", "512"))
+
+# `get_books?mode=count` results are cached for this many seconds unless the
+# client asks for an exact count
+BOOK_COUNT_CACHE_ALIAS = "tiered"
+
+BOOK_COUNT_CACHE_TIMEOUT = 30
+
+# GET responses of the catalog read endpoints (get_books, get_book, ...) can be
+# cached for READ_CACHE_TIMEOUT seconds (0 turns it off) under the catalog
+# version, which every write through the API bumps, so no worker serves a
+# response from before a write it can see (see api/read_cache.py)
+READ_CACHE_ALIAS = "tiered"
+
+READ_CACHE_TIMEOUT = int(getenv("READ_CACHE_TIMEOUT", "0"))
+
+
+# Change feed
+# Write views publish events to the ChangeEvent table; every worker polls it
+# and pushes new events to its open /api/events/ connections
+
+CHANGE_FEED_POLL_INTERVAL = float(getenv("CHANGE_FEED_POLL_INTERVAL", "0.5"))
+
+# Seconds without events before a keepalive comment is sent
+CHANGE_FEED_KEEPALIVE = 15
+
+# Reconnection delay suggested to EventSource clients
+CHANGE_FEED_RETRY_MS = 3000
+
+# Clients further behind than this get a "reset" event and should refetch
+CHANGE_FEED_REPLAY_LIMIT = 1000
+
+CHANGE_FEED_QUEUE_SIZE = 1000
+
+# Under WSGI each connection holds a worker, so it is closed after this many
+# seconds and the client resumes from its Last-Event-ID
+CHANGE_FEED_MAX_DURATION = 300
+
+
+# Bulk deletes
+# Books are deleted this many per transaction, pausing between chunks so other
+# writers get the SQLite write lock; larger deletions run in the background
+
+BULK_DELETE_CHUNK_SIZE = 500
+
+BULK_DELETE_PAUSE = 0.05
+
+BULK_DELETE_SYNC_LIMIT = 1000
+
+# A running job that hasn't reported progress for this many seconds was left
+# behind by a dead process, and is resumed by the next worker that starts (or
+# by `manage.py run_bulk_jobs`)
+BULK_JOB_STALE_AFTER = 60
+
+
+# Search suggestions
+# Each worker keeps an in-memory prefix index for /api/suggest/, and checks the
+# catalog for changes at most this often (in seconds)
+
+SUGGEST_REFRESH_INTERVAL = float(getenv("SUGGEST_REFRESH_INTERVAL", "1"))
+
+
+# Catalog engine
+# "orm" answers get_books from the database; "columnar" keeps an in-memory copy
+# of the catalog per worker (see api/columnar.py) and only reads the page's books.
+# Only "columnar" filters and counts with bitmaps; "orm" leaves them to SQLite's
+# indexes. The copy applies the changes made by other workers at most this often
+# (in seconds)
+
+CATALOG_ENGINE = getenv("CATALOG_ENGINE", "orm")
+
+CATALOG_REFRESH_INTERVAL = float(getenv("CATALOG_REFRESH_INTERVAL", "1"))
+
+
+# Slow query log
+# Opt-in: queries slower than the threshold are written (with their query plan)
+# to a rotating JSON-lines file next to the database
+
+SLOW_QUERY_LOG = getenv("SLOW_QUERY_LOG", "False") == "True"
+
+SLOW_QUERY_THRESHOLD_MS = float(getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+
+SLOW_QUERY_LOG_FILE = DB_FILE.parent / "slow_queries.log"
+
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+SLOW_QUERY_LOG_BACKUP_COUNT = 3
+
+# Audit log
+# Writes are buffered in-process and flushed to the Log table in batches
+
+AUDIT_LOG_BATCH_SIZE = int(getenv("AUDIT_LOG_BATCH_SIZE", "50"))
+
+AUDIT_LOG_FLUSH_INTERVAL = float(getenv("AUDIT_LOG_FLUSH_INTERVAL", "5"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -149,8 +335,18 @@ STATICFILES_DIRS = [
     BASE_DIR / "frontend/dist",
 ]
 
-# Enable WhiteNoise compression and caching
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Enable WhiteNoise compression and caching: collected files get a content
+# hash in their name (STATICFILES_STORAGE is no longer read since Django 5.1)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
+
+# Files whose name changes with their content are cached by browsers for good:
+# the ones the storage hashed, and the chunks Vite names with their own hash
+WHITENOISE_IMMUTABLE_FILE_TEST = r"(\.[0-9a-f]{12}\.\w+|/frontend/chunk-[^/]+\.js)$"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -22,6 +22,8 @@ from api import views as api_views
 
 urlpatterns = [
     path("admin/backup-sqlite/", api_views.backup_sqlite, name="backup_sqlite"),
+    path("admin/slow-queries/", api_views.slow_queries, name="slow_queries"),
+    path("admin/cache-stats/", api_views.cache_stats, name="cache_stats"),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("", include("frontend.urls")),